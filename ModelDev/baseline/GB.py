@@ -1,5 +1,6 @@
 import sys
 import textTuningLib as tl
+import htTuningLib
 import sklearnHelperLib as skHelper
 from sklearn.pipeline import Pipeline
 from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
@@ -49,6 +50,9 @@ parameters={
 #	'classifier__subsample': [0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0,],
         }
 note='\n'.join([ "baseline GB, feature transforms + stemming", ]) + '\n'
+htTuningLib.setSearchMode(tl, parameters,     # SEARCH_MODE in tuning.cfg
+                        randomSeed=randomSeeds['randForClassifier'])
+htTuningLib.memoizePipeline(pipeline, parameters) # fit vectorizer once/fold
 p = tl.TextPipelineTuningHelper( pipeline, parameters, randomSeeds=randomSeeds,
                 note=note,).fit()
 print(p.getReports())
@@ -1,5 +1,6 @@
 import sys
 import textTuningLib as tl
+import htTuningLib
 import sklearnHelperLib as skHelper
 from sklearn.pipeline import Pipeline
 from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
@@ -38,6 +39,9 @@ parameters={'vectorizer__ngram_range':[(1,2),],
        'classifier__n_estimators': [100,],
         }
 note='\n'.join(["baseline RF, feature transforms + stemming", ]) + '\n'
+htTuningLib.setSearchMode(tl, parameters,     # SEARCH_MODE in tuning.cfg
+                        randomSeed=randomSeeds['randForClassifier'])
+htTuningLib.memoizePipeline(pipeline, parameters) # fit vectorizer once/fold
 p = tl.TextPipelineTuningHelper( pipeline, parameters,
                     randomSeeds=randomSeeds, note=note,).fit()
 print(p.getReports())
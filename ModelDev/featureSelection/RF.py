@@ -0,0 +1,46 @@
+import sys
+import textTuningLib as tl
+import htTuningLib
+import sklearnHelperLib as skHelper
+from sklearn.pipeline import Pipeline
+from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
+from sklearn.ensemble import RandomForestClassifier
+from htFeatureSelection import BinaryFeatureSelector
+#-----------------------
+args = tl.args
+randomSeeds = tl.getRandomSeeds( { 	# None means generate a random seed
+                'randForSplit'      : args.randForSplit,
+                'randForClassifier' : args.randForClassifier,
+                } )
+pipeline = Pipeline( [
+('vectorizer', CountVectorizer(
+                stop_words='english',
+                binary=True,
+                token_pattern=r'\b([a-z_]\w+)\b',
+                #min_df=0.02,
+                #max_df=0.75,
+                ),),
+# keeps the k features w/ the highest chi2 (or mutual_info) w/ the class.
+# The classifier's feature_importances_ are for the selected features, so
+#  no featureEvaluator / --features report here.
+('featureSelector', BinaryFeatureSelector()),
+('classifier', RandomForestClassifier(verbose=1, class_weight='balanced',
+                random_state=randomSeeds['randForClassifier'], n_jobs=-1) ),
+] )
+parameters={'vectorizer__ngram_range':[(1,2),],
+	'vectorizer__min_df':[0.02, ],
+	'vectorizer__max_df':[0.75, ],
+
+	'featureSelector__score_func': ['chi2', ],   # or 'mutual_info'
+	'featureSelector__k': [100, 200, 400, 'all'],
+
+	'classifier__min_samples_split': [100],
+       'classifier__n_estimators': [100,],
+        }
+note='\n'.join(["RF w/ chi2 feature selection, tuning k", ]) + '\n'
+htTuningLib.setSearchMode(tl, parameters,     # SEARCH_MODE in tuning.cfg
+                        randomSeed=randomSeeds['randForClassifier'])
+htTuningLib.memoizePipeline(pipeline, parameters) # fit vectorizer once/fold
+p = tl.TextPipelineTuningHelper( pipeline, parameters,
+                    randomSeeds=randomSeeds, note=note,).fit()
+print(p.getReports())
@@ -4,12 +4,33 @@
 # Updated March 2024 for https://mgi-jira.atlassian.net/browse/WTS2-1397
 #   Anaconda 0.11.1  Python 3.10.9  Sklearn 1.2.1
 #
+# The vectorizer caches its vocabulary and feature matrices in the directory
+#   named by $GXDHT_FEATURE_CACHE, if set. See htFeatureCache.py
+# To bit-pack the binary features between the vectorizer and the classifier,
+#   uncomment the 'packer' step below and use PackedRandomForestClassifier
+#   as the classifier. See htBinaryFeatures.py
+# To pickle the "-p standard" preprocessing with the model, uncomment the
+#   'preprocessor' step below and drop "-p standard" from the train/test
+#   scripts, so the model is trained and run on raw documents.
+#   See htPipelineSteps.py
+# To train on only the k features w/ the highest chi2 w/ the class, uncomment
+#   the 'featureSelector' step below. See htFeatureSelection.py and
+#   ModelDev/featureSelection for tuning k.
+#
 from sklearn.pipeline import Pipeline
-from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.ensemble import RandomForestClassifier
+#from htPipelineSteps import SamplePreprocessor
+#from htFeatureSelection import BinaryFeatureSelector
+#from htBinaryFeatures import BinaryFeaturePacker, PackedRandomForestClassifier
+from htFeatureCache import CachedCountVectorizer
 
 pipeline = Pipeline( [
-('vectorizer', CountVectorizer(
+#('preprocessor', SamplePreprocessor(
+#                preprocessors=('standard',),
+#                n_jobs=1,
+#                batchSize=500,
+#                ),),
+('vectorizer', CachedCountVectorizer(
                 strip_accents=None,
                 stop_words='english',
                 binary=True,
@@ -26,6 +47,11 @@ pipeline = Pipeline( [
                 tokenizer=None,
                 vocabulary=None,
                 ),),
+#('featureSelector', BinaryFeatureSelector(
+#                score_func='chi2',
+#                k=200,
+#                ),),
+#('packer', BinaryFeaturePacker()),
 ('classifier', RandomForestClassifier(
                 class_weight='balanced',
                 n_jobs=-1,
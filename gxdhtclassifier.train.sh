@@ -6,7 +6,7 @@ function Usage() {
 #######################################
     cat - <<ENDTEXT
 
-$0 --data name [--model basename]
+$0 --data name [--model basename] [--cache dir]
 
     Train a model on specified training data.
     Create .pkl, .features.txt files based on the model source filename.
@@ -16,6 +16,9 @@ $0 --data name [--model basename]
                 We assume these are *preprocessed* sample files.
 
     --model     filename of the model source. Default: gxdhtclassifier.py
+
+    --cache     directory to cache vectorizer feature matrices in.
+                Default: \$GXDHT_FEATURE_CACHE if set, else no caching.
 ENDTEXT
     exit 5
 }
@@ -38,6 +41,7 @@ while [ $# -gt 0 ]; do
     -h|--help)   Usage ;;
     --data)     dataDir="$2"; shift; shift; ;;
     --model)    modelSource="$2"; shift; shift; ;;
+    --cache)    export GXDHT_FEATURE_CACHE="$2"; shift; shift; ;;
     -*|--*) echo "invalid option $1"; Usage ;;
     *) break; ;;
     esac
@@ -0,0 +1,55 @@
+#
+# GXD HT relevance classifier for GEO experiments, hashed feature space
+#   The classifier step is the same as in gxdhtclassifier.py. The vectorizer
+#   differs: HashingDfVectorizer hashes unigrams + bigrams into n_features
+#   buckets and prunes the buckets by document frequency (same min_df/max_df),
+#   so fitting it never holds the full vocabulary in memory.
+#   See htVectorizers.py
+#   Unlike gxdhtclassifier.py's CachedCountVectorizer, it does not cache
+#   feature matrices in $GXDHT_FEATURE_CACHE, and there are no commented-out
+#   preprocessor, featureSelector or packer steps here.
+#   Train with:  gxdhtclassifier.train.sh --model gxdhtclassifier_hashing.py
+#
+from sklearn.pipeline import Pipeline
+from sklearn.ensemble import RandomForestClassifier
+from htVectorizers import HashingDfVectorizer
+
+pipeline = Pipeline( [
+('vectorizer', HashingDfVectorizer(
+                strip_accents=None,
+                stop_words='english',
+                binary=True,
+                min_df=0.02,
+                max_df=0.75,
+                ngram_range=(1,2),
+                token_pattern=r'\b([a-z_]\w+)\b',
+                analyzer='word',
+                decode_error='strict',
+                encoding='utf-8',
+                input='content',
+                lowercase=True,
+                tokenizer=None,
+                n_features=2**20,
+                chunkSize=2000,
+                ),),
+('classifier', RandomForestClassifier(
+                class_weight='balanced',
+                n_jobs=-1,
+                verbose=1,
+                max_depth=None,
+                max_features='sqrt',
+                max_leaf_nodes=None,
+                max_samples=None,
+                min_impurity_decrease=0.0,
+                min_samples_leaf=1,
+                min_samples_split=100,
+                min_weight_fraction_leaf=0.0,
+                n_estimators=100,
+                bootstrap=True,
+                ccp_alpha=0.0,
+                criterion='gini',
+                oob_score=False,
+                warm_start=False,
+                #random_state=198,
+                ),),
+] )
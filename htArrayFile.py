@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           A simple file format for a collection of named NumPy arrays plus a
+           dict of meta data, designed to be memory-mapped.
+
+           Reading an array does not read the file. It returns a read-only
+           array backed by the memory-mapped file, so you only touch the pages
+           of the arrays you use. Processes that map the same file share its
+           pages through the OS page cache.
+
+  File layout:
+           MAGIC line                           b'HTARRAYS 1\n'
+           header length                        8 byte little-endian uint
+           header                               utf-8 JSON:
+                {"meta": {...},
+                 "arrays": {name: {"dtype":..., "shape":[...], "offset": n}}}
+           padding to ALIGN bytes
+           the arrays, each starting on an ALIGN byte boundary.
+                offsets are relative to the end of the header padding.
+
+  Only needs numpy.
+'''
+import json
+import mmap
+import struct
+import numpy as np
+#-----------------------------------
+
+MAGIC = b'HTARRAYS 1\n'
+ALIGN = 64                  # byte alignment of each array in the file
+
+def _align(n):
+    return (n + ALIGN -1) // ALIGN * ALIGN
+#-----------------------------------
+
+def writeArrayFile(fileName,
+                   arrays,      # dict {name: np array}
+                   meta={},     # dict, must be JSON serializable
+    ):
+    """
+    Write the arrays and meta dict to fileName
+    """
+    arrays = { name: np.ascontiguousarray(a) for name, a in arrays.items() }
+    directory = {}
+    offset = 0
+    for name, a in arrays.items():
+        directory[name] = { 'dtype' : a.dtype.str,
+                            'shape' : list(a.shape),
+                            'offset': offset,
+                            }
+        offset = _align(offset + a.nbytes)
+
+    header = json.dumps({'meta': meta, 'arrays': directory}).encode('utf-8')
+    headerEnd = len(MAGIC) + 8 + len(header)
+
+    with open(fileName, 'wb') as fp:
+        fp.write(MAGIC)
+        fp.write(struct.pack('<Q', len(header)))
+        fp.write(header)
+        fp.write(b'\0' * (_align(headerEnd) - headerEnd))
+        pos = 0
+        for name, a in arrays.items():
+            fp.write(b'\0' * (directory[name]['offset'] - pos))
+            fp.write(a.tobytes())
+            pos = directory[name]['offset'] + a.nbytes
+#-----------------------------------
+
+class ArrayFile (object):
+    """
+    IS:   a read-only, memory-mapped file written by writeArrayFile()
+    HAS:  meta dict, named arrays
+    DOES: getMeta(), getArrayNames(), getArray(name), close()
+    """
+    def __init__(self, fileName):
+        self.fileName = fileName
+        with open(fileName, 'rb') as fp:
+            self.mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.mm[:len(MAGIC)] != MAGIC:
+            raise ValueError("%s: not an array file" % fileName)
+        start = len(MAGIC) + 8
+        headerLen = struct.unpack('<Q', self.mm[len(MAGIC):start])[0]
+        header = json.loads(self.mm[start:start+headerLen].decode('utf-8'))
+
+        self.meta = header['meta']
+        self.directory = header['arrays']
+        self.dataStart = _align(start + headerLen)
+    #-----------------------------------
+
+    def getMeta(self):       return self.meta
+    def getArrayNames(self): return list(self.directory.keys())
+    def hasArray(self, name):return name in self.directory
+
+    def getArray(self, name):
+        """ Return the named array as a read-only view on the mapped file
+        """
+        d = self.directory[name]
+        dtype = np.dtype(d['dtype'])
+        count = int(np.prod(d['shape'], dtype=np.int64))
+        a = np.frombuffer(self.mm, dtype=dtype, count=count,
+                                        offset=self.dataStart + d['offset'])
+        return a.reshape(d['shape'])
+    #-----------------------------------
+
+    def close(self):
+        """ Close the mapping. Arrays from getArray() must not be used after.
+        """
+        self.mm.close()
+# end class ArrayFile -----------------------------------
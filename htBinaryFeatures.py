@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Bit-packed binary feature matrices.
+
+           The vectorizer runs with binary=True, so every feature value is
+           0 or 1. A CSR matrix still stores an int64 (or float) data value
+           plus an int32 index for every nonzero. For our ~1-2k features,
+           a packed bitset per document (1 bit per feature) is several times
+           smaller.
+
+           PackedBinaryMatrix - documents x features bitsets, np.packbits()
+                rows. Converts to CSC float32 (for training) and CSR float32
+                row batches (for prediction) straight from the bits, a few
+                rows at a time, never to a dense float matrix. Conversion
+                needs about as much memory as the CSR/CSC result.
+
+           BinaryFeaturePacker - Pipeline step after the vectorizer that
+                turns its output into a PackedBinaryMatrix.
+
+           PackedRandomForestClassifier - a RandomForestClassifier that
+                takes PackedBinaryMatrix input (or anything else a
+                RandomForestClassifier takes).
+                fit():  unpacks to CSC float32, what the trees train on.
+                predict(), predict_proba(): convert PREDICT_BATCH_SIZE rows
+                    at a time to CSR float32. Results are identical to
+                    predicting on the CSR matrix.
+
+  If you run this module as a script, it compares memory, CSC conversion and
+  predict speed of CSR vs. packed feature matrices on a sample file:
+        htBinaryFeatures.py sampleFile [--replicate n]
+'''
+import sys
+import time
+import argparse
+import numpy as np
+import scipy.sparse
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.ensemble import RandomForestClassifier
+#-----------------------------------
+
+PACK_BATCH_SIZE    = 1024       # rows to unpack at a time to CSR/CSC
+PREDICT_BATCH_SIZE = 4096       # rows to convert at a time in predict
+
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+class PackedBinaryMatrix (object):
+    """
+    IS:   a binary documents x features matrix, each row a packed bitset
+    HAS:  bits  - uint8 array, (numRows, ceil(numFeatures/8))
+          shape - (numRows, numFeatures)
+    DOES: fromSparse(X), toCsc(), getCsrRows(start, end),
+            getDenseRows(start, end), nbytes, slicing
+    """
+    def __init__(self, bits, numFeatures):
+        self.bits = bits
+        self.shape = (bits.shape[0], numFeatures)
+    #-----------------------------------
+
+    @classmethod
+    def fromSparse(cls, X):
+        """ Return a PackedBinaryMatrix w/ a 1 for each nonzero of X.
+            Sets the bits straight from X's CSR indptr/indices, X is never
+            densified.
+        """
+        X = scipy.sparse.csr_matrix(X)
+        numRows, numFeatures = X.shape
+        numBytes = (numFeatures + 7) // 8
+        bits = np.zeros(numRows * numBytes, dtype=np.uint8)
+        nonzero = X.data != 0               # skip explicit zeros
+        rows = np.repeat(np.arange(numRows, dtype=np.int64),
+                                                np.diff(X.indptr))[nonzero]
+        cols = X.indices[nonzero].astype(np.int64)
+        # np.packbits() order: feature 0 is the high bit of byte 0
+        np.bitwise_or.at(bits, rows * numBytes + (cols >> 3),
+                        (128 >> (cols & 7)).astype(np.uint8))
+        return cls(bits.reshape(numRows, numBytes), numFeatures)
+    #-----------------------------------
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        """ Return a PackedBinaryMatrix of the selected rows """
+        return PackedBinaryMatrix(self.bits[rows], self.shape[1])
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def getDenseRows(self, start=0, end=None, dtype=np.float32):
+        """ Return rows [start:end] unpacked to a dense 0/1 array """
+        return np.unpackbits(self.bits[start:end], axis=1,
+                                        count=self.shape[1]).astype(dtype)
+
+    def getCsrRows(self, start=0, end=None, dtype=np.float32):
+        """ Return rows [start:end] as a CSR sparse matrix w/ sorted indices.
+            indptr comes from the popcounts of the rows. The indices are
+            filled PACK_BATCH_SIZE rows at a time: a block is unpacked to
+            0/1 bytes and the column numbers of its 1s are copied out.
+        """
+        bits = self.bits[start:end]
+        numRows, numFeatures = bits.shape[0], self.shape[1]
+        indptr = np.zeros(numRows + 1, dtype=np.int32)
+        np.cumsum(POPCOUNT[bits].sum(axis=1, dtype=np.int32), out=indptr[1:])
+        indices = np.empty(indptr[-1], dtype=np.int32)
+        columns = np.arange(numFeatures, dtype=np.int32)
+        for blockStart in range(0, numRows, PACK_BATCH_SIZE):
+            blockEnd = min(blockStart + PACK_BATCH_SIZE, numRows)
+            ones = np.unpackbits(bits[blockStart:blockEnd], axis=1,
+                                        count=numFeatures).view(np.bool_)
+            indices[indptr[blockStart]:indptr[blockEnd]] = \
+                                    np.broadcast_to(columns, ones.shape)[ones]
+        X = scipy.sparse.csr_matrix((np.ones(indices.shape[0], dtype=dtype),
+                            indices, indptr), shape=(numRows, numFeatures))
+        X.has_sorted_indices = True
+        return X
+
+    def toCsc(self, dtype=np.float32):
+        """ Return the matrix as a CSC sparse matrix w/ sorted indices """
+        X = self.getCsrRows(dtype=dtype).tocsc()
+        X.sort_indices()
+        return X
+# end class PackedBinaryMatrix -----------------------------------
+
+class BinaryFeaturePacker (BaseEstimator, TransformerMixin):
+    """
+    Pipeline step: vectorizer output -> PackedBinaryMatrix
+    """
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X):
+        if isinstance(X, PackedBinaryMatrix):
+            return X
+        return PackedBinaryMatrix.fromSparse(X)
+# end class BinaryFeaturePacker -----------------------------------
+
+class PackedRandomForestClassifier (RandomForestClassifier):
+    """
+    IS:   a RandomForestClassifier that also takes PackedBinaryMatrix input
+    """
+    def fit(self, X, y, sample_weight=None):
+        if isinstance(X, PackedBinaryMatrix):
+            X = X.toCsc()
+        return super().fit(X, y, sample_weight=sample_weight)
+
+    def predict_proba(self, X):
+        if not isinstance(X, PackedBinaryMatrix):
+            return super().predict_proba(X)
+        if X.shape[0] == 0:
+            return np.zeros((0, len(self.classes_)))
+        return np.vstack([super(PackedRandomForestClassifier, self)
+                .predict_proba(X.getCsrRows(start, start+PREDICT_BATCH_SIZE))
+                for start in range(0, X.shape[0], PREDICT_BATCH_SIZE)])
+    # predict() and predict_log_proba() call predict_proba()
+# end class PackedRandomForestClassifier -----------------------------------
+
+def getCsrBytes(X):
+    return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+#-----------------------------------
+
+def timeAndTrace(func, nTimes):
+    """ Run func() nTimes. Return (result, best seconds, peak MB allocated
+        (numpy arrays included) during a run)
+    """
+    import tracemalloc
+    times = []
+    peak = 0
+    for i in range(nTimes):
+        tracemalloc.start()
+        startTime = time.time()
+        result = func()
+        times.append(time.time() - startTime)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return result, min(times), peak/1024.0**2
+#-----------------------------------
+
+def benchmark(sampleFile, replicate=1, nTimes=3):
+    """ Compare memory and speed of CSR vs. packed features, converting to
+        CSC for fit() and in predict_proba().
+        Return report text.
+    """
+    import htMLsample
+    from sklearn.base import clone
+    import gxdhtclassifier
+
+    sampleSet = htMLsample.readSampleFile(sampleFile, columnar=True)
+    docs = sampleSet.getDocuments() * replicate
+    y = sampleSet.getKnownYvalues() * replicate
+
+    vectorizer = clone(gxdhtclassifier.pipeline.named_steps['vectorizer'])
+    X = vectorizer.fit_transform(docs)
+    startTime = time.time()
+    packed = BinaryFeaturePacker().transform(X)
+    packTime = time.time() - startTime
+
+    text = "%d documents, %d features, %d nonzeros\n" % \
+                                            (X.shape[0], X.shape[1], X.nnz)
+    text += "Memory:   CSR %s %7.2f MB   CSR float32 %7.2f MB   " % \
+                (X.dtype, getCsrBytes(X)/1024.0**2,
+                    getCsrBytes(X.astype(np.float32))/1024.0**2) + \
+            "packed %7.2f MB   (pack time %.2f seconds)\n" % \
+                                        (packed.nbytes/1024.0**2, packTime)
+
+    text += "%-22s %10s %10s\n" % ('best of %d' % nTimes, 'seconds',
+                                                                'peak MB')
+    csr32 = X.astype(np.float32)
+    for name, func in [('CSR float32 -> CSC', lambda: csr32.tocsc()),
+                       ('packed -> CSC', lambda: packed.toCsc())]:
+        result, seconds, peak = timeAndTrace(func, nTimes)
+        text += "%-22s %10.3f %10.2f\n" % (name, seconds, peak)
+
+    rf = PackedRandomForestClassifier(class_weight='balanced', n_jobs=-1,
+                    min_samples_split=100, n_estimators=100, random_state=1)
+    rf.fit(packed, y)
+    for name, data in [('CSR', X), ('packed', packed)]:
+        proba, seconds, peak = timeAndTrace(lambda: rf.predict_proba(data),
+                                                                    nTimes)
+        if name == 'CSR':
+            csrProba = proba
+        text += "%-22s %10.3f %10.2f  identical: %s\n" % \
+                    ('predict_proba ' + name, seconds, peak,
+                                            np.array_equal(proba, csrProba))
+    return text
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Compare memory and predict speed of CSR vs. packed ' +
+                    'binary feature matrices')
+
+    parser.add_argument('sampleFile', help='preprocessed sample file')
+
+    parser.add_argument('--replicate', dest='replicate', type=int, default=1,
+        help='repeat the samples n times for a bigger corpus')
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    print(benchmark(args.sampleFile, args.replicate))
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           A compiled, numpy only, RandomForestClassifier evaluator for low
+           latency scoring of small batches.
+
+           RandomForestClassifier.predict_proba() dispatches each tree to
+           joblib and walks it separately. For a handful of new GEO
+           experiments, that overhead is most of the time.
+
+           CompiledForest flattens all the trees of a trained forest into
+           contiguous arrays:
+                feature, threshold, left, right     one entry per node, node
+                                                    numbers are global across
+                                                    the trees
+                leafProba                           class probabilities of
+                                                    each node
+                roots                               root node of each tree
+           Leaves point to themselves with threshold +inf. Predicting a
+           batch walks all the (tree, document) pairs down one level at a
+           time with a few vectorized gathers, dropping the pairs that have
+           reached a leaf, until none are left.
+
+           Results are identical to RandomForestClassifier.predict_proba():
+           the same per-tree probabilities, summed in tree order and divided
+           by the number of trees. (When sklearn predicts with several
+           threads its sums can be in a different order, and so differ in the
+           last bit.)
+
+           Inputs can be dense arrays, sparse matrices, or
+           htBinaryFeatures.PackedBinaryMatrix. For our 0/1 features we
+           densify batches as uint8, a compare of 0 or 1 to the threshold
+           gives the same branch as sklearn's float32 compare. Sparse input
+           with any other values (e.g., counts from a non-binary vectorizer)
+           is densified as float32, like sklearn does.
+
+           Compiled forests can be saved and memory-mapped with htArrayFile.
+           Only needs numpy (see htScoringRuntime.py).
+
+  If you run this module as a script, it compiles the classifier of a
+  trained pipeline pkl, or measures sklearn vs. compiled predict_proba()
+  latency at different batch sizes:
+        htCompiledForest.py compile   model.pkl forestFile
+        htCompiledForest.py benchmark sampleFile [--model model.pkl]
+'''
+import sys
+import time
+import pickle
+import argparse
+import numpy as np
+from htArrayFile import writeArrayFile, ArrayFile
+#-----------------------------------
+
+DENSE_BATCH_SIZE = 4096     # rows of sparse input to densify at a time
+
+def isBinary(X):
+    """ Return True if the sparse matrix X has only 0/1 integer values,
+        so it can be densified as uint8
+    """
+    if X.dtype.kind == 'b':
+        return True
+    if X.dtype.kind not in 'iu':
+        return False
+    return X.nnz == 0 or (X.data.min() >= 0 and X.data.max() <= 1)
+#-----------------------------------
+
+class CompiledForest (object):
+    """
+    IS:   the trees of a trained RandomForestClassifier as flat numpy arrays
+    HAS:  feature, threshold, left, right, leafProba, roots, classes_,
+            maxDepth, n_features_in_
+    DOES: predict_proba(X), predict(X), save(fileName), load(fileName)
+    """
+    def __init__(self, arrays, meta):
+        self.feature   = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left      = arrays['left']
+        self.right     = arrays['right']
+        self.leafProba = arrays['leafProba']
+        self.roots     = arrays['roots']
+        self.classes_  = np.array(meta['classes'])
+        self.maxDepth  = meta['maxDepth']
+        self.n_features_in_ = meta['numFeatures']
+        self.isLeaf    = self.left == np.arange(self.left.shape[0])
+    #-----------------------------------
+
+    @classmethod
+    def fromForest(cls, forest):
+        """ Return CompiledForest of a trained RandomForestClassifier """
+        if forest.n_outputs_ != 1:
+            raise ValueError("only single output forests can be compiled")
+        features, thresholds, lefts, rights, probas, roots = [],[],[],[],[],[]
+        maxDepth = 0
+        offset = 0
+        for est in forest.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            isLeaf = tree.children_left == -1
+            nodes = np.arange(offset, offset + n)
+
+            features.append(np.where(isLeaf, 0, tree.feature))
+            thresholds.append(np.where(isLeaf, np.inf, tree.threshold))
+            lefts.append(np.where(isLeaf, nodes, tree.children_left + offset))
+            rights.append(np.where(isLeaf, nodes, tree.children_right+offset))
+
+            # same normalization as DecisionTreeClassifier.predict_proba()
+            proba = tree.value[:, 0, :forest.n_classes_].copy()
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba /= normalizer
+            probas.append(proba)
+
+            roots.append(offset)
+            maxDepth = max(maxDepth, tree.max_depth)
+            offset += n
+
+        arrays = {'feature'  : np.concatenate(features).astype(np.int32),
+                  'threshold': np.concatenate(thresholds).astype(np.float64),
+                  'left'     : np.concatenate(lefts).astype(np.int32),
+                  'right'    : np.concatenate(rights).astype(np.int32),
+                  'leafProba': np.concatenate(probas).astype(np.float64),
+                  'roots'    : np.array(roots, dtype=np.int32),
+                  }
+        meta = {'classes'    : forest.classes_.tolist(),
+                'maxDepth'   : int(maxDepth),
+                'numFeatures': int(forest.n_features_in_),
+                }
+        return cls(arrays, meta)
+    #-----------------------------------
+
+    def _getDenseBatches(self, X):
+        """ Yield dense row batches of X """
+        if hasattr(X, 'getDenseRows'):              # PackedBinaryMatrix
+            for start in range(0, X.shape[0], DENSE_BATCH_SIZE):
+                yield X.getDenseRows(start, start+DENSE_BATCH_SIZE,
+                                                            dtype=np.uint8)
+        elif hasattr(X, 'tocsr'):                   # scipy sparse matrix
+            X = X.tocsr()
+            dtype = np.uint8 if isBinary(X) else np.float32
+            for start in range(0, X.shape[0], DENSE_BATCH_SIZE):
+                yield X[start:start+DENSE_BATCH_SIZE].toarray().astype(dtype)
+        else:
+            X = np.asarray(X)
+            if X.dtype.kind == 'f':
+                X = X.astype(np.float32, copy=False)    # sklearn's compare
+            yield X
+
+    def _predictBatch(self, X):
+        numRows = X.shape[0]
+        # node[t, i] = current node of document i in tree t
+        node = np.repeat(self.roots[:, np.newaxis], numRows, axis=1)
+        flatNode = node.reshape(-1)
+        flatX = np.ascontiguousarray(X).reshape(-1)
+        rowStarts = np.tile(np.arange(numRows, dtype=np.intp) * X.shape[1],
+                                                            len(self.roots))
+        active = np.flatnonzero(~self.isLeaf[flatNode]) # (tree,doc)s to walk
+        while active.shape[0]:
+            n = flatNode[active]
+            goLeft = flatX[rowStarts[active] + self.feature[n]] \
+                                                        <= self.threshold[n]
+            nextNode = np.where(goLeft, self.left[n], self.right[n])
+            flatNode[active] = nextNode
+            active = active[~self.isLeaf[nextNode]]
+
+        proba = np.zeros((numRows, len(self.classes_)), dtype=np.float64)
+        for t in range(len(self.roots)):        # sum in tree order
+            proba += self.leafProba[node[t]]
+        proba /= len(self.roots)
+        return proba
+
+    def predict_proba(self, X):
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError("X has %d features, the forest expects %d" % \
+                                            (X.shape[1], self.n_features_in_))
+        batches = [self._predictBatch(b) for b in self._getDenseBatches(X)]
+        if not batches:
+            return np.zeros((0, len(self.classes_)), dtype=np.float64)
+        return np.vstack(batches)
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+    #-----------------------------------
+
+    def save(self, fileName):
+        arrays = {'feature': self.feature, 'threshold': self.threshold,
+                  'left': self.left, 'right': self.right,
+                  'leafProba': self.leafProba, 'roots': self.roots}
+        meta = {'classes': self.classes_.tolist(), 'maxDepth': self.maxDepth,
+                'numFeatures': self.n_features_in_}
+        writeArrayFile(fileName, arrays, meta)
+
+    @classmethod
+    def load(cls, fileName):
+        """ Return CompiledForest memory-mapped from the file """
+        arrayFile = ArrayFile(fileName)
+        arrays = {name: arrayFile.getArray(name) \
+                                        for name in arrayFile.getArrayNames()}
+        return cls(arrays, arrayFile.getMeta())
+# end class CompiledForest -----------------------------------
+
+def getForest(pipeline):
+    """ Return the RandomForestClassifier of a pipeline (or the forest) """
+    if hasattr(pipeline, 'steps'):
+        return pipeline.steps[-1][1]
+    return pipeline
+#-----------------------------------
+
+def benchmark(sampleFile, modelFile=None, batchSizes=[1, 10, 1000, 10000],
+                                                                nTimes=5):
+    """ Time sklearn vs. compiled predict_proba() on feature matrix batches.
+        Return report text.
+    """
+    import htMLsample
+    from sklearn.base import clone
+    from sklearn.pipeline import Pipeline
+
+    sampleSet = htMLsample.readSampleFile(sampleFile, columnar=True)
+    docs = sampleSet.getDocuments()
+    if modelFile:
+        with open(modelFile, 'rb') as fp:
+            pipeline = pickle.load(fp)
+    else:
+        import gxdhtclassifier
+        pipeline = clone(gxdhtclassifier.pipeline)
+        pipeline.set_params(classifier__verbose=0, classifier__random_state=1)
+        pipeline.fit(docs, sampleSet.getKnownYvalues())
+    forest = getForest(pipeline)
+    forest.set_params(verbose=0)
+    compiled = CompiledForest.fromForest(forest)
+
+    X = Pipeline(pipeline.steps[:-1]).transform(docs)
+    X = X[np.arange(max(batchSizes)) % X.shape[0]]      # enough rows
+
+    text = "predict_proba latency, %d trees, max depth %d, best of %d\n" % \
+                            (len(compiled.roots), compiled.maxDepth, nTimes)
+    text += "%10s %12s %12s %8s %10s\n" % \
+                        ('batch', 'sklearn ms', 'compiled ms', 'speedup', 'same')
+    for n in batchSizes:
+        batch = X[:n]
+        times = {}
+        for name, model in [('sklearn', forest), ('compiled', compiled)]:
+            best = None
+            for i in range(nTimes):
+                startTime = time.time()
+                proba = model.predict_proba(batch)
+                elapsed = time.time() - startTime
+                best = elapsed if best is None else min(best, elapsed)
+            times[name] = (best, proba)
+        same = np.array_equal(times['sklearn'][1], times['compiled'][1])
+        text += "%10d %12.3f %12.3f %8.1f %10s\n" % (n,
+                    1000*times['sklearn'][0], 1000*times['compiled'][0],
+                    times['sklearn'][0]/times['compiled'][0], same)
+    return text
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Compile a trained random forest to flat arrays, or ' +
+                    'benchmark compiled vs. sklearn predictions')
+
+    parser.add_argument('command', choices=['compile', 'benchmark'],
+        help='compile: model.pkl -> forestFile. ' +
+             'benchmark: latency at batch sizes 1, 10, 1000, 10000')
+
+    parser.add_argument('files', nargs='+',
+        help='compile: model.pkl forestFile. benchmark: sampleFile')
+
+    parser.add_argument('--model', dest='modelFile', default=None,
+        help='benchmark: trained model pkl. Default: train ' +
+             'gxdhtclassifier.py on the sample file')
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    if args.command == 'compile':
+        with open(args.files[0], 'rb') as fp:
+            forest = getForest(pickle.load(fp))
+        CompiledForest.fromForest(forest).save(args.files[1])
+    elif args.command == 'benchmark':
+        print(benchmark(args.files[0], args.modelFile))
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Shared code of the scripts that build samples straight from the
+           database (sdGetKnownSamples.py, sdPredictUnevaluated.py):
+                addDbArgs(), setDbArgs() - the -s/--server, -d/--database
+                        options and the server shortcuts
+                connectDb()              - set the db module's connection
+                sqlRecord2ClassifiedSample(), cleanUpTextField() - a
+                        gxd_htexperiment tmp table record -> sample
+'''
+import os
+import htMLsample as mlSampleLib
+import htRawSampleTextManager
+from utilsLib import removeNonAscii
+#-----------------------------------
+
+sampleObjType = mlSampleLib.ClassifiedHtSample
+
+DB_SERVERS = {  # server shortcut: (host, db)
+    'adhoc' : ('mgi-adhoc.jax.org',    'mgd'),
+    'prod'  : ('bhmgidb01.jax.org',    'prod'),
+    'dev'   : ('mgi-testdb4.jax.org',  'jak'),
+    'test'  : ('bhmgidevdb01.jax.org', 'prod'),
+    }
+
+def addDbArgs(parser):
+    """ Add the -s/--server and -d/--database options to an argparser """
+    defaultHost = os.environ.get('PG_DBSERVER', 'bhmgidevdb01')
+    defaultDatabase = os.environ.get('PG_DBNAME', 'prod')
+
+    parser.add_argument('-s', '--server', dest='server', action='store',
+        required=False, default=defaultHost,
+        help='db server. Shortcuts:  adhoc, prod, dev, test. (Default %s)' %
+                defaultHost)
+
+    parser.add_argument('-d', '--database', dest='database', action='store',
+        required=False, default=defaultDatabase,
+        help='which database. Example: mgd (Default %s)' % defaultDatabase)
+#-----------------------------------
+
+def setDbArgs(args):
+    """ Set args.host and args.db from args.server (or its shortcut) and
+        args.database. Return args.
+    """
+    if args.server in DB_SERVERS:
+        args.host, args.db = DB_SERVERS[args.server]
+    else:
+        args.host = args.server
+        args.db = args.database
+    return args
+#-----------------------------------
+
+def connectDb(db, args):
+    """ Set the db module's connection params from args, as mgd_public """
+    db.set_sqlServer  (args.host)
+    db.set_sqlDatabase(args.db)
+    db.set_sqlUser    ("mgd_public")
+    db.set_sqlPassword("mgdpub")
+#-----------------------------------
+
+def sqlRecord2ClassifiedSample(r,               # sql Result record
+                               rawSampleText,   # text from raw sample metadata
+                               knownClassName=None, # None: r's knownclassname
+                               maxTextLength=None,  # only 1st n chars of text
+    ):
+    """
+    Encapsulates knowledge of ClassifiedSample.setFields() field names
+    """
+    newR = {}
+    newSample = sampleObjType()
+
+    if len(rawSampleText) > 0:          # add separator to mark beginning
+        rawSampleText = " .. " + rawSampleText
+
+    if knownClassName is None:
+        knownClassName = str(r['knownclassname'])
+
+    ## populate the Sample fields
+    newR['knownClassName']    = knownClassName
+    newR['ID']                = str(r['id'])
+    newR['curationState']     = str(r['curationstate'])
+    newR['studytype']         = str(r['studytype'])
+    newR['experimenttype']    = str(r['experimenttype'])
+    newR['modification_date'] = str(r['modification_date'])
+    newR['titleLength']       = str(r['titlelength'])
+    newR['descriptionLength'] = str(r['descriptionlength'])
+    newR['title']       = cleanUpTextField(r, 'title', maxTextLength)
+    newR['description'] = cleanUpTextField(r, 'description', maxTextLength) \
+                                                                + rawSampleText
+    return newSample.setFields(newR)
+#-----------------------------------
+
+def cleanUpTextField(rcd,
+                    textFieldName,
+                    maxTextLength=None,     # only 1st n chars, for debugging
+    ):
+    text = rcd[textFieldName]
+    if text == None:
+        text = ''
+
+    if maxTextLength:	# handy for debugging
+        text = text[:maxTextLength]
+        text = text.replace('\n', ' ')
+
+    text = removeNonAscii(htRawSampleTextManager.cleanDelimiters(text))
+    return text
+#-----------------------------------
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Distill a trained gxdhtclassifier model into a compact student
+           model for low latency, one experiment at a time scoring.
+
+           The 100 tree forest (min_samples_split=100, unbounded depth) is
+           the teacher. A student is trained on the teacher's soft
+           predictions (predict_proba of the positive class) over the
+           training corpus, w/ the same features: the student pipeline
+           reuses the teacher's trained steps through the vectorizer (e.g.,
+           a SamplePreprocessor and the vectorizer) and its
+           BinaryFeatureSelector, if it has one.
+           Students:
+                linear  - LogisticRegression on the sparse features. Each
+                          document is fit as a positive row weighted by the
+                          teacher's probability and a negative row weighted
+                          by 1 - probability (cross entropy on soft labels)
+                forest  - a small, depth limited RandomForestRegressor fit to
+                          the teacher's probability
+
+           Students predict the positive class when their probability is
+           > 0.5, as the teacher does.
+
+  If you run this module as a script:
+        htDistill.py distill   model.pkl sampleFile ... -o student.pkl
+                                                [--student linear|forest]
+                (sampleFiles: the preprocessed training set)
+        htDistill.py benchmark sampleFile [--model model.pkl]
+                (train the teacher on 80% of the samples unless --model,
+                 distill each student on those, and report F2/P/R/NPV on
+                 the other 20%, latency and pkl size)
+'''
+import sys
+import time
+import copy
+import pickle
+import argparse
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.pipeline import Pipeline
+import htMLsample as mlSampleLib
+#-----------------------------------
+
+class DistilledClassifier (BaseEstimator, ClassifierMixin):
+    """
+    IS:   a binary student classifier fit to a teacher's soft predictions
+    HAS:  classes_ = [0, 1]
+    DOES: fit(X, softY) - softY is the teacher's probability of class 1,
+          predict_proba(X), predict(X).
+          Subclasses implement _fit(X, softY) and _getPositiveProba(X)
+    """
+    def fit(self, X, softY):
+        softY = np.asarray(softY, dtype=np.float64)
+        if softY.min() < 0 or softY.max() > 1:
+            raise ValueError("soft targets must be probabilities in [0, 1]")
+        self.classes_ = np.array([0, 1])
+        self._fit(X, softY)
+        return self
+
+    def predict_proba(self, X):
+        p = np.clip(self._getPositiveProba(X), 0.0, 1.0)
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return self.classes_.take((self._getPositiveProba(X) > 0.5)
+                                                            .astype(np.intp))
+# end class DistilledClassifier -----------------------------------
+
+class DistilledLinearClassifier (DistilledClassifier):
+    """
+    IS:   a LogisticRegression student fit to soft labels
+    HAS:  C, max_iter - LogisticRegression params
+    DOES: see DistilledClassifier
+    """
+    def __init__(self, C=1.0, max_iter=1000):
+        self.C = C
+        self.max_iter = max_iter
+
+    def _fit(self, X, softY):
+        import scipy.sparse
+        from sklearn.linear_model import LogisticRegression
+        n = softY.shape[0]
+        stack = scipy.sparse.vstack if scipy.sparse.issparse(X) else np.vstack
+        self.model_ = LogisticRegression(C=self.C, max_iter=self.max_iter)
+        self.model_.fit(stack([X, X]),
+                        np.concatenate([np.ones(n), np.zeros(n)]),
+                        sample_weight=np.concatenate([softY, 1.0 - softY]))
+
+    def _getPositiveProba(self, X):
+        return self.model_.predict_proba(X)[:, 1]
+# end class DistilledLinearClassifier -----------------------------------
+
+class DistilledForestClassifier (DistilledClassifier):
+    """
+    IS:   a small depth limited RandomForestRegressor student
+    HAS:  n_estimators, max_depth, min_samples_leaf, random_state
+    DOES: see DistilledClassifier
+    """
+    def __init__(self, n_estimators=20, max_depth=12, min_samples_leaf=5,
+                                                            random_state=None):
+        self.n_estimators = n_estimators
+        self.max_depth = max_depth
+        self.min_samples_leaf = min_samples_leaf
+        self.random_state = random_state
+
+    def _fit(self, X, softY):
+        from sklearn.ensemble import RandomForestRegressor
+        self.model_ = RandomForestRegressor(n_estimators=self.n_estimators,
+                                max_depth=self.max_depth,
+                                min_samples_leaf=self.min_samples_leaf,
+                                random_state=self.random_state)
+        self.model_.fit(X, softY)
+
+    def _getPositiveProba(self, X):
+        return self.model_.predict(X)
+# end class DistilledForestClassifier -----------------------------------
+
+STUDENTS = {'linear': DistilledLinearClassifier,
+            'forest': DistilledForestClassifier,
+            }
+
+def distill(teacher,            # trained pipeline: ..., vectorizer, ..., forest
+            docs,               # training documents, as the teacher takes them
+            student='linear',   # STUDENTS name or a DistilledClassifier
+    ):
+    """ Return a trained student pipeline: copies of the teacher's steps
+        through the vectorizer (vectorizer w/o stop_words_) and of its
+        BinaryFeatureSelector if any, and the student fit to the teacher's
+        probabilities on the docs.
+    """
+    from htFeatureSelection import BinaryFeatureSelector
+    if isinstance(student, str):
+        student = STUDENTS[student]()
+    classes = list(teacher.steps[-1][1].classes_)
+    softY = teacher.predict_proba(docs)[:, classes.index(1)]
+
+    names = [name for name, step in teacher.steps]
+    vectorizerIndex = names.index('vectorizer')
+    steps = copy.deepcopy(teacher.steps[:vectorizerIndex+1] + \
+                    [(name, step) for name, step in teacher.steps[:-1] \
+                                    if isinstance(step, BinaryFeatureSelector)])
+    vectorizer = steps[vectorizerIndex][1]
+    if hasattr(vectorizer, 'stop_words_'):  # only kept for introspection
+        del vectorizer.stop_words_
+    features = Pipeline(steps)
+    student.fit(features.transform(docs), softY)
+    return Pipeline(steps + [('classifier', student)])
+#-----------------------------------
+
+def getMetricsText(name, y, pred):
+    """ Return F2/P/R/NPV line formatted as in the ModelDev logs """
+    from sklearn.metrics import fbeta_score, precision_score, recall_score
+    return "%s (Yes) F2: %5.4f    P: %5.4f    R: %5.4f    NPV: %5.4f" % \
+                    (name, fbeta_score(y, pred, beta=2, zero_division=0),
+                     precision_score(y, pred, zero_division=0),
+                     recall_score(y, pred, zero_division=0),
+                     precision_score(y, pred, pos_label=0, zero_division=0))
+#-----------------------------------
+
+def getLatency(pipeline, docs, nDocs=200):
+    """ Return (median ms to score one doc, ms per doc in one batch) """
+    single = []
+    for doc in docs[:nDocs]:
+        startTime = time.time()
+        pipeline.predict_proba([doc])
+        single.append(time.time() - startTime)
+    startTime = time.time()
+    pipeline.predict_proba(docs)
+    batch = (time.time() - startTime) / max(1, len(docs))
+    return 1000*np.median(single), 1000*batch
+#-----------------------------------
+
+def benchmark(sampleFile, modelFile=None, randomSeed=1):
+    """ Distill each student, report metrics, latency and size.
+        Return report text.
+    """
+    from sklearn.base import clone
+    from sklearn.model_selection import train_test_split
+
+    cols = mlSampleLib.readSampleFile(sampleFile, columnar=True)
+    docs = cols.getDocuments()
+    y = np.array(cols.getKnownYvalues())
+    if modelFile:
+        with open(modelFile, 'rb') as fp:
+            teacher = pickle.load(fp)
+        trainDocs, evalDocs, evalY = docs, docs, y
+        text = "teacher %s, all %d samples are training and eval\n" % \
+                                                        (modelFile, len(docs))
+    else:
+        import gxdhtclassifier
+        trainDocs, evalDocs, trainY, evalY = train_test_split(docs, y,
+                    test_size=0.2, stratify=y, random_state=randomSeed)
+        teacher = clone(gxdhtclassifier.pipeline)
+        teacher.set_params(classifier__random_state=randomSeed)
+        if hasattr(teacher.named_steps['vectorizer'], 'cacheDir'):
+            teacher.set_params(vectorizer__cacheDir=None)
+        teacher.steps[-1][1].set_params(verbose=0)
+        teacher.fit(trainDocs, trainY)
+        text = "%d training, %d eval samples\n" % (len(trainDocs),
+                                                            len(evalDocs))
+    teacher.steps[-1][1].set_params(verbose=0, n_jobs=1)
+
+    models = [('teacher', teacher, 0.0)]
+    for name in STUDENTS:
+        student = STUDENTS[name]()
+        if 'random_state' in student.get_params():
+            student.set_params(random_state=randomSeed)
+        startTime = time.time()
+        models.append((name, distill(teacher, trainDocs, student),
+                                                    time.time() - startTime))
+
+    teacherPred = teacher.predict(evalDocs)
+    metrics = ''
+    text += "%-8s %10s %12s %10s %12s %12s %9s\n" % ('model', 'pkl bytes',
+        'classif bytes', 'fit sec', '1 doc ms', 'batch ms/doc', 'agree')
+    for name, pipeline, fitTime in models:
+        pred = pipeline.predict(evalDocs)
+        single, batch = getLatency(pipeline, evalDocs)
+        text += "%-8s %10d %12d %10.2f %12.2f %12.3f %9.4f\n" % (name,
+                len(pickle.dumps(pipeline)),
+                len(pickle.dumps(pipeline.steps[-1][1])), fitTime, single,
+                batch, np.mean(pred == teacherPred))
+        metrics += getMetricsText('%-7s' % name, evalY, pred) + '\n'
+    return text + '\n' + metrics
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Distill a trained model into a compact student model')
+
+    parser.add_argument('command', choices=['distill', 'benchmark'],
+        help='distill: model.pkl sampleFile ... -> student pkl. ' +
+             'benchmark: compare the teacher and students')
+
+    parser.add_argument('files', nargs='+',
+        help='distill: model.pkl sampleFile ... benchmark: sampleFile')
+
+    parser.add_argument('-o', '--output', dest='outputFile', default=None,
+        help='distill: student model pkl. Required for distill')
+
+    parser.add_argument('--student', dest='student', default='linear',
+        choices=sorted(STUDENTS.keys()),
+        help='distill: student model. Default: linear')
+
+    parser.add_argument('--model', dest='modelFile', default=None,
+        help='benchmark: trained teacher pkl. Default: train ' +
+             'gxdhtclassifier.py on 80%% of the sample file')
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    if args.command == 'distill':
+        if len(args.files) < 2 or not args.outputFile:
+            sys.stderr.write("distill needs model.pkl sampleFile ... " +
+                                                    "-o student.pkl\n")
+            exit(5)
+        with open(args.files[0], 'rb') as fp:
+            teacher = pickle.load(fp)
+        teacher.steps[-1][1].set_params(verbose=0)
+        docs = []
+        for fileName in args.files[1:]:
+            docs += mlSampleLib.readSampleFile(fileName, columnar=True) \
+                                                            .getDocuments()
+        student = distill(teacher, docs, args.student)
+        with open(args.outputFile, 'wb') as fp:
+            pickle.dump(student, fp)
+        sys.stderr.write("%s student distilled on %d documents\n" % \
+                                                    (args.student, len(docs)))
+    elif args.command == 'benchmark':
+        print(benchmark(args.files[0], args.modelFile))
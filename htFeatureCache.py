@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Cache vectorizer output (fitted vocabulary + sparse document-term
+           matrix) on disk so that training and tuning runs on the same
+           documents with the same vectorizer params do not re-tokenize and
+           re-vectorize them.
+
+           FeatureMatrixCache - a directory of cached vocabularies and
+                compressed CSR matrices (.npz), keyed by a hash of the
+                documents and the vectorizer params. When the cache grows
+                past maxBytes, the least recently used entries are deleted.
+
+           CachedCountVectorizer - a CountVectorizer that uses a
+                FeatureMatrixCache in fit_transform() and transform().
+                It is a drop in replacement in a Pipeline: it is a
+                CountVectorizer with the same params and results.
+
+           The cache directory is the cacheDir param or, if that is None,
+           the GXDHT_FEATURE_CACHE environment variable. If neither is set,
+           CachedCountVectorizer is just a CountVectorizer.
+           So trained models (pkl files) do not depend on the cache directory.
+'''
+import os
+import json
+import time
+import hashlib
+import numpy as np
+import scipy.sparse
+import sklearn
+from sklearn.feature_extraction.text import CountVectorizer
+#-----------------------------------
+
+CACHE_DIR_ENV      = 'GXDHT_FEATURE_CACHE'      # env var w/ cache dir
+DEFAULT_MAX_BYTES  = 2 * 1024**3                # 2 GB
+TMP_MAX_AGE        = 3600       # seconds: older .tmp files are leftovers of
+                                #  interrupted writes, delete them
+
+class FeatureMatrixCache (object):
+    """
+    IS:   a directory of cached vectorizer results
+    HAS:  for each key:  key.npz        - the CSR matrix
+                         key.vocab.json - feature names in index order (if any)
+    DOES: getKey(), load(key), save(key, X, featureNames)
+    """
+    def __init__(self, cacheDir, maxBytes=DEFAULT_MAX_BYTES):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        os.makedirs(cacheDir, exist_ok=True)
+    #-----------------------------------
+
+    @staticmethod
+    def getKey(kind,        # 'fit' or 'transform' or whatever
+               params,      # dict of vectorizer params
+               documents,   # list of str
+               vocabulary=None, # list of feature names for transform keys
+        ):
+        """ Return hash of everything that determines the vectorizer output
+            (including the sklearn version)
+        """
+        h = hashlib.sha1()
+        h.update(('sklearn %s\0' % sklearn.__version__).encode('utf-8'))
+        h.update(kind.encode('utf-8'))
+        h.update(repr(sorted(params.items())).encode('utf-8'))
+        if vocabulary is not None:
+            h.update('\0'.join(vocabulary).encode('utf-8'))
+        for doc in documents:
+            h.update(b'\0')
+            h.update(doc.encode('utf-8'))
+        return h.hexdigest()
+    #-----------------------------------
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cacheDir, key + suffix)
+
+    def load(self, key):
+        """ Return (X, featureNames) or None if key is not in the cache.
+            featureNames is None if it was not saved.
+        """
+        npzFile = self._path(key, '.npz')
+        vocabFile = self._path(key, '.vocab.json')
+        try:
+            X = scipy.sparse.load_npz(npzFile)
+            featureNames = None
+            if os.path.exists(vocabFile):
+                with open(vocabFile, 'r') as fp:
+                    featureNames = json.load(fp)
+                os.utime(vocabFile)
+            os.utime(npzFile)           # mark as recently used
+        except (OSError, ValueError):   # missing or partially written
+            return None
+        return X, featureNames
+    #-----------------------------------
+
+    def save(self, key, X, featureNames=None):
+        """ Save the matrix and feature names, then trim the cache.
+            A cache we cannot write to is not an error, just not a cache.
+        """
+        try:
+            if featureNames is not None:
+                tmp = self._path(key, '.vocab.json.tmp')
+                with open(tmp, 'w') as fp:
+                    json.dump(list(featureNames), fp)
+                os.replace(tmp, self._path(key, '.vocab.json'))
+            tmp = self._path(key, '.tmp.npz')
+            scipy.sparse.save_npz(tmp, scipy.sparse.csr_matrix(X),
+                                                        compressed=True)
+            os.replace(tmp, self._path(key, '.npz'))
+            self.evict()
+        except OSError:
+            pass
+    #-----------------------------------
+
+    def evict(self):
+        """ Delete least recently used entries until under maxBytes.
+            Delete .tmp files older than TMP_MAX_AGE, do not count newer
+            ones (they may be being written by another process).
+        """
+        entries = {}        # entries[key] = [mtime, size]
+        now = time.time()
+        for fn in os.listdir(self.cacheDir):
+            path = os.path.join(self.cacheDir, fn)
+            if fn.endswith('.tmp.npz') or fn.endswith('.tmp'):
+                try:
+                    if now - os.stat(path).st_mtime > TMP_MAX_AGE:
+                        os.remove(path)
+                except OSError:         # another process replaced it
+                    pass
+            elif fn.endswith('.npz') or fn.endswith('.vocab.json'):
+                key = fn.split('.')[0]
+                st = os.stat(path)
+                e = entries.setdefault(key, [st.st_mtime, 0])
+                e[0] = max(e[0], st.st_mtime)
+                e[1] += st.st_size
+        total = sum([e[1] for e in entries.values()])
+        for key in sorted(entries.keys(), key=lambda k: entries[k][0]):
+            if total <= self.maxBytes:
+                break
+            for suffix in ['.npz', '.vocab.json']:
+                if os.path.exists(self._path(key, suffix)):
+                    os.remove(self._path(key, suffix))
+            total -= entries[key][1]
+# end class FeatureMatrixCache -----------------------------------
+
+class CachedCountVectorizer (CountVectorizer):
+    """
+    IS:   a CountVectorizer that caches its fitted vocabulary and output
+            matrices in a FeatureMatrixCache.
+    HAS:  the CountVectorizer params +
+            cacheDir - cache directory. None means use $GXDHT_FEATURE_CACHE
+            cacheMaxBytes
+    Note: on a cache hit in fit_transform(), stop_words_ (the terms removed
+            by min_df/max_df, only kept for introspection) is empty.
+    """
+    def __init__(self, *, input='content', encoding='utf-8',
+                decode_error='strict', strip_accents=None, lowercase=True,
+                preprocessor=None, tokenizer=None, stop_words=None,
+                token_pattern=r'(?u)\b\w\w+\b', ngram_range=(1, 1),
+                analyzer='word', max_df=1.0, min_df=1, max_features=None,
+                vocabulary=None, binary=False, dtype=np.int64,
+                cacheDir=None, cacheMaxBytes=DEFAULT_MAX_BYTES,
+                ):
+        super().__init__(input=input, encoding=encoding,
+                decode_error=decode_error, strip_accents=strip_accents,
+                lowercase=lowercase, preprocessor=preprocessor,
+                tokenizer=tokenizer, stop_words=stop_words,
+                token_pattern=token_pattern, ngram_range=ngram_range,
+                analyzer=analyzer, max_df=max_df, min_df=min_df,
+                max_features=max_features, vocabulary=vocabulary,
+                binary=binary, dtype=dtype)
+        self.cacheDir = cacheDir
+        self.cacheMaxBytes = cacheMaxBytes
+    #-----------------------------------
+
+    def _getCache(self):
+        """ Return the FeatureMatrixCache to use or None """
+        cacheDir = self.cacheDir or os.environ.get(CACHE_DIR_ENV)
+        if not cacheDir:
+            return None
+        return FeatureMatrixCache(cacheDir, self.cacheMaxBytes)
+
+    def _getVectorizerParams(self):
+        params = self.get_params()
+        del params['cacheDir']
+        del params['cacheMaxBytes']
+        return params
+    #-----------------------------------
+
+    def fit_transform(self, raw_documents, y=None):
+        cache = self._getCache()
+        if cache is None or self.vocabulary is not None \
+                                            or self.input != 'content':
+            return super().fit_transform(raw_documents, y)
+
+        raw_documents = list(raw_documents)
+        key = cache.getKey('fit', self._getVectorizerParams(), raw_documents)
+        hit = cache.load(key)
+        if hit is not None and hit[1] is not None:
+            X, featureNames = hit
+            self.vocabulary_ = { f: i for i, f in enumerate(featureNames) }
+            self.fixed_vocabulary_ = False
+            self.stop_words_ = set()
+            return X.astype(self.dtype, copy=False)
+
+        X = super().fit_transform(raw_documents, y)
+        cache.save(key, X, self.get_feature_names_out())
+        return X
+    #-----------------------------------
+
+    def transform(self, raw_documents):
+        cache = self._getCache()
+        if cache is None or self.input != 'content':
+            return super().transform(raw_documents)
+
+        raw_documents = list(raw_documents)
+        key = cache.getKey('transform', self._getVectorizerParams(),
+                    raw_documents, list(self.get_feature_names_out()))
+        hit = cache.load(key)
+        if hit is not None:
+            return hit[0].astype(self.dtype, copy=False)
+
+        X = super().transform(raw_documents)
+        cache.save(key, X)
+        return X
+# end class CachedCountVectorizer -----------------------------------
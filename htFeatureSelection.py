@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Supervised feature selection on the binary vectorizer features.
+
+           With min_df=0.02 and (1,2)-grams the vectorizer keeps ~800-2000
+           features, many of which no tree ever uses (the +0.0000 rows in
+           the *_features.txt files), but training and CV time grow with
+           the number of features.
+
+           getBinaryFeatureScores() scores every feature at once from one
+           sparse product: the documents x features matrix transposed times
+           the one-hot y values gives, for each feature and class, the
+           number of documents of the class that have the feature. From
+           those counts:
+                chi2        - same values as sklearn chi2()
+                mutual_info - mutual information (nats) of feature presence
+                              and class, exact for binary features (sklearn
+                              mutual_info_classif() is per feature, slow)
+
+           BinaryFeatureSelector - Pipeline step after the vectorizer that
+                keeps the k best scoring features (k and score_func can be
+                grid searched). Kept features stay in vocabulary order.
+
+           foldFeatureSelector() returns a copy of a trained pipeline w/o
+                the selector step and w/ the vectorizer vocabulary_ cut to
+                the kept features. Same predictions, and tools that expect
+                the vectorizer to feed the forest directly (htPruneModel,
+                htModelArtifact) work on it.
+
+  If you run this module as a script, it reports cross validated training
+  time and F2/P/R/NPV of the production pipeline across k:
+        htFeatureSelection.py sampleFile [--k 100 200 400 all]
+                                         [--score chi2 mutual_info]
+'''
+import sys
+import copy
+import time
+import argparse
+import numpy as np
+import scipy.sparse
+from sklearn.base import BaseEstimator, TransformerMixin
+#-----------------------------------
+
+SCORE_FUNCS = ['chi2', 'mutual_info']
+
+def getBinaryFeatureScores(X,           # documents x features, 0/1 values
+                           y,           # class of each document
+                           scoreFunc='chi2', # SCORE_FUNCS name
+    ):
+    """ Return array of the score of each feature """
+    if scoreFunc not in SCORE_FUNCS:
+        raise ValueError("unknown score_func '%s'" % scoreFunc)
+    X = scipy.sparse.csr_matrix(X)
+    classes, yIndex = np.unique(np.asarray(y), return_inverse=True)
+    Y = scipy.sparse.csr_matrix((np.ones(yIndex.shape[0]),
+                                (np.arange(yIndex.shape[0]), yIndex)),
+                                shape=(yIndex.shape[0], len(classes)))
+    present = np.asarray((X.T @ Y).todense())  # features x classes counts
+    classCounts = np.bincount(yIndex).astype(np.float64)
+    numDocs = classCounts.sum()
+    featureCounts = present.sum(axis=1, keepdims=True)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if scoreFunc == 'chi2':
+            expected = featureCounts * classCounts / numDocs
+            scores = ((present - expected)**2 / expected).sum(axis=1)
+        else:
+            # 2 x classes contingency table per feature: present, absent
+            mi = np.zeros(present.shape[0])
+            for counts, xCounts in [(present, featureCounts),
+                                    (classCounts - present,
+                                                numDocs - featureCounts)]:
+                terms = counts / numDocs * \
+                            np.log(counts * numDocs / (xCounts * classCounts))
+                mi += np.where(counts > 0, terms, 0.0).sum(axis=1)
+            scores = mi
+    return np.nan_to_num(scores)
+#-----------------------------------
+
+class BinaryFeatureSelector (BaseEstimator, TransformerMixin):
+    """
+    IS:   a Pipeline step that keeps the k best scoring binary features
+    HAS:  score_func - SCORE_FUNCS name
+          k          - number of features to keep, or 'all'
+    DOES: fit(X, y) - sets scores_ and selected_ (kept feature indexes, in
+                        ascending order)
+          transform(X) -> CSR matrix of the selected columns
+    """
+    def __init__(self, score_func='chi2', k='all'):
+        self.score_func = score_func
+        self.k = k
+
+    def fit(self, X, y):
+        self.scores_ = getBinaryFeatureScores(X, y, self.score_func)
+        self.n_features_in_ = self.scores_.shape[0]
+        if self.k == 'all' or self.k >= self.n_features_in_:
+            self.selected_ = np.arange(self.n_features_in_)
+        else:   # stable: ties go to the lower feature index
+            best = np.argsort(-self.scores_, kind='stable')[:self.k]
+            self.selected_ = np.sort(best)
+        return self
+
+    def transform(self, X):
+        X = scipy.sparse.csr_matrix(X)
+        if self.selected_.shape[0] == self.n_features_in_:
+            return X
+        return X[:, self.selected_]
+
+    def get_support(self, indices=False):
+        if indices:
+            return self.selected_
+        mask = np.zeros(self.n_features_in_, dtype=bool)
+        mask[self.selected_] = True
+        return mask
+# end class BinaryFeatureSelector -----------------------------------
+
+def foldFeatureSelector(pipeline):
+    """
+    Return a copy of a trained pipeline w/o its BinaryFeatureSelector step
+        and w/ the vectorizer vocabulary_ reduced to the selected features.
+    Return the pipeline itself if it has no selector.
+    """
+    names = [name for name, step in pipeline.steps \
+                                if isinstance(step, BinaryFeatureSelector)]
+    if not names:
+        return pipeline
+    pipeline = copy.deepcopy(pipeline)
+    selector = pipeline.named_steps[names[0]]
+    vectorizer = pipeline.named_steps['vectorizer']
+
+    oldToNew = np.full(selector.n_features_in_, -1, dtype=np.intp)
+    oldToNew[selector.selected_] = np.arange(selector.selected_.shape[0])
+    vectorizer.vocabulary_ = { term: int(oldToNew[i]) \
+                for term, i in vectorizer.vocabulary_.items() if oldToNew[i]>=0}
+    pipeline.steps = [(name, step) for name, step in pipeline.steps \
+                                                        if name != names[0]]
+    return pipeline
+#-----------------------------------
+
+def splitAtVectorizer(pipeline):
+    """
+    Return (Pipeline of the steps through the 'vectorizer' step (e.g., a
+        preprocessor and the vectorizer), list of the (name, step)s after
+        it w/o any BinaryFeatureSelector)
+    """
+    from sklearn.pipeline import Pipeline
+    names = [name for name, step in pipeline.steps]
+    vectorizerIndex = names.index('vectorizer')
+    rest = [(name, step) for name, step in pipeline.steps[vectorizerIndex+1:] \
+                        if not isinstance(step, BinaryFeatureSelector)]
+    return Pipeline(pipeline.steps[:vectorizerIndex+1]), rest
+#-----------------------------------
+
+def benchmark(sampleFile, ks=[100, 200, 400, 'all'], scoreFuncs=['chi2'],
+                                                        numCV=5, randomSeed=1):
+    """ Report CV training time and F2/P/R/NPV across k. Return report text.
+    """
+    import htMLsample
+    from sklearn.base import clone
+    from sklearn.pipeline import Pipeline
+    from sklearn.model_selection import StratifiedKFold
+    from sklearn.metrics import fbeta_score, precision_score, recall_score
+    import gxdhtclassifier
+
+    sampleSet = htMLsample.readSampleFile(sampleFile, columnar=True)
+    docs = np.array(sampleSet.getDocuments(), dtype=object)
+    y = np.array(sampleSet.getKnownYvalues())
+
+    base = clone(gxdhtclassifier.pipeline)
+    base.set_params(classifier__verbose=0, classifier__random_state=randomSeed)
+    if hasattr(base.named_steps['vectorizer'], 'cacheDir'):
+        base.set_params(vectorizer__cacheDir=None)
+    featurizer, rest = splitAtVectorizer(base)
+
+    # vectorize each training fold once, as memoized grid searches do
+    folds = []
+    for trainIdx, testIdx in StratifiedKFold(n_splits=numCV, shuffle=True,
+                                random_state=randomSeed).split(docs, y):
+        vec = clone(featurizer)
+        folds.append((vec.fit_transform(list(docs[trainIdx])), y[trainIdx],
+                        vec.transform(list(docs[testIdx])), testIdx))
+
+    numFeatures = [f[0].shape[1] for f in folds]
+    text = "%d documents, %d fold CV, %d-%d vectorizer features per fold\n" % \
+                        (len(docs), numCV, min(numFeatures), max(numFeatures))
+    text += "training time: selector + forest fit, summed over folds\n"
+    text += "features: in the last fold's model\n"
+    text += "%-12s %5s %8s %10s %7s %7s %7s %7s\n" % ('score', 'k',
+            'features', 'train sec', 'F2', 'P', 'R', 'NPV')
+    for scoreFunc in scoreFuncs:
+        for k in ks:
+            if k == 'all' and scoreFunc != scoreFuncs[0]:
+                continue
+            pred = np.zeros_like(y)
+            trainTime = 0.0
+            for trainX, trainY, testX, testIdx in folds:
+                model = Pipeline([('featureSelector',
+                        BinaryFeatureSelector(score_func=scoreFunc, k=k))] +
+                        [(name, clone(step)) for name, step in rest])
+                startTime = time.time()
+                model.fit(trainX, trainY)
+                trainTime += time.time() - startTime
+                pred[testIdx] = model.predict(testX)
+            numFeatures = model.named_steps['featureSelector'] \
+                                                        .selected_.shape[0]
+            text += "%-12s %5s %8d %10.2f %7.4f %7.4f %7.4f %7.4f\n" % \
+                    (scoreFunc if k != 'all' else '-', k, numFeatures,
+                     trainTime, fbeta_score(y, pred, beta=2),
+                     precision_score(y, pred), recall_score(y, pred),
+                     precision_score(y, pred, pos_label=0))
+    return text
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Report CV training time and F2 across numbers of ' +
+                    'selected features')
+
+    parser.add_argument('sampleFile', help='preprocessed sample file')
+
+    parser.add_argument('--k', dest='ks', nargs='+',
+        default=['100', '200', '400', 'all'],
+        help="numbers of features to keep, or 'all'. Default: 100 200 400 all")
+
+    parser.add_argument('--score', dest='scoreFuncs', nargs='+',
+        choices=SCORE_FUNCS, default=['chi2'],
+        help='feature scores. Default: chi2')
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    ks = [k if k == 'all' else int(k) for k in args.ks]
+    print(benchmark(args.sampleFile, ks, args.scoreFuncs))
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Go from raw sample title/description text straight to the binary
+           feature vectors of a trained gxdhtclassifier model in one pass.
+
+           At predict time each sample normally goes through
+           HtSample.standard() (remove URLs + lower case, text transformations,
+           stem) to build a stemmed document string, and then the model's
+           CountVectorizer re-tokenizes that string w/ its token_pattern,
+           drops stop words, builds every unigram and bigram string, and looks
+           them up in its vocabulary.
+
+           Featurizer does the same in one pass per sample:
+                removeURLsLower + text transformations  (regex substitutions,
+                                                            as in standard())
+                token_re tokens, and for each distinct raw token (cached):
+                    stem, lower case, vectorizer token_pattern, stop word
+                    filter -> interned token ids
+                unigram and bigram lookups by (id) and (id, id)
+           No stemmed document strings or bigram strings are built.
+           As in the two stage output, title and description are one token
+           sequence, so a bigram can span the end of the title and the start
+           of the description, and stop words are removed before bigrams are
+           formed.
+           The output matrix is identical to the two stage output.
+
+  If you run this module as a script, it times the two stage and fused
+  featurization on a sample file and checks they are identical:
+        htFeaturizer.py sampleFile [--model model.pkl]
+'''
+import sys
+import re
+import time
+import pickle
+import argparse
+import numpy as np
+import scipy.sparse
+import utilsLib
+import htMLsample as mlSampleLib
+#-----------------------------------
+
+MAX_TOKEN_CACHE = 2**18     # max raw tokens to remember the token ids of
+
+class Featurizer (object):
+    """
+    IS:   a fused preprocess + vectorize step for a trained model's
+            vectorizer (CountVectorizer, ngram_range (1,1) or (1,2))
+    HAS:  vectorizer, token ids, unigram and bigram feature lookups,
+            a cache of raw token -> token ids
+    DOES: featurize(titles, descriptions) -> CSR matrix
+          featurizeSamples(samples)
+    """
+    def __init__(self, vectorizer):
+        minN, maxN = vectorizer.ngram_range
+        if minN != 1 or maxN > 2 or vectorizer.analyzer != 'word' \
+                or vectorizer.tokenizer is not None \
+                or vectorizer.preprocessor is not None \
+                or vectorizer.strip_accents is not None:
+            raise ValueError("Featurizer only supports word unigram/bigram " +
+                    "vectorizers w/o custom tokenizer/preprocessor/accents")
+        self.vectorizer  = vectorizer
+        self.lowercase   = vectorizer.lowercase
+        self.useBigrams  = maxN == 2
+        self.tokenRe     = re.compile(vectorizer.token_pattern)
+        self.stopWords   = vectorizer.get_stop_words() or frozenset()
+        self.numFeatures = len(vectorizer.vocabulary_)
+        self.dtype       = vectorizer.dtype
+        self.binary      = vectorizer.binary
+
+        # intern the tokens in the vocabulary, other tokens get id -1
+        self.tokenIds = {}              # tokenIds[token] = id
+        self.unigrams = {}              # unigrams[id] = feature index
+        self.bigrams  = {}              # bigrams[(id1, id2)] = feature index
+        for term, f in vectorizer.vocabulary_.items():
+            ids = tuple([self.tokenIds.setdefault(t, len(self.tokenIds)) \
+                                                        for t in term.split(' ')])
+            if len(ids) == 1:
+                self.unigrams[ids[0]] = f
+            else:
+                self.bigrams[ids] = f
+
+        self.tokenCache = {}            # tokenCache[raw token] = (id, ...)
+        self.transformer = mlSampleLib.textTransformer_allButTreatment
+        mlSampleLib.HtSample.addPreprocessorToReport(self.transformer)
+    #-----------------------------------
+
+    def _getStemmer(self):
+        if not mlSampleLib.stemmer:
+            import nltk.stem.snowball as nltk
+            mlSampleLib.stemmer = nltk.EnglishStemmer()
+        return mlSampleLib.stemmer
+
+    def _getTokenIds(self, rawToken, stemmer):
+        """ Return tuple of token ids for a raw token, -1 for a token that is
+            not in the vocabulary. Stop words have no id, they are dropped.
+        """
+        ids = self.tokenCache.get(rawToken)
+        if ids is None:
+            stemmed = stemmer.stem(rawToken)
+            if self.lowercase:
+                stemmed = stemmed.lower()
+            ids = tuple([self.tokenIds.get(t, -1) \
+                    for t in self.tokenRe.findall(stemmed) \
+                                                if t not in self.stopWords])
+            if len(self.tokenCache) >= MAX_TOKEN_CACHE:
+                self.tokenCache.clear()
+            self.tokenCache[rawToken] = ids
+        return ids
+
+    def getFeatureCounts(self, title, description):
+        """ Return {feature index: count} for one sample """
+        stemmer = self._getStemmer()
+        sequence = []               # token ids of the doc, stop words dropped
+        for text in (title, description):
+            text = self.transformer.transformText(
+                                            utilsLib.removeURLsLower(text))
+            for m in mlSampleLib.token_re.finditer(text):
+                sequence.extend(self._getTokenIds(m.group(), stemmer))
+
+        counts = {}
+        unigrams = self.unigrams
+        for i in sequence:
+            f = unigrams.get(i)
+            if f is not None:
+                counts[f] = counts.get(f, 0) + 1
+        if self.useBigrams:
+            bigrams = self.bigrams
+            for pair in zip(sequence, sequence[1:]):
+                f = bigrams.get(pair)
+                if f is not None:
+                    counts[f] = counts.get(f, 0) + 1
+        return counts
+    #-----------------------------------
+
+    def featurize(self, titles, descriptions):
+        """ Return CSR matrix of the (unpreprocessed) titles + descriptions,
+            same as the vectorizer output for the standard() docs.
+        """
+        indices = []
+        data = []
+        indptr = [0]
+        for title, description in zip(titles, descriptions):
+            counts = self.getFeatureCounts(title, description)
+            keys = sorted(counts.keys())
+            indices.extend(keys)
+            data.extend([1 if self.binary else counts[k] for k in keys])
+            indptr.append(len(indices))
+        return scipy.sparse.csr_matrix((np.array(data, dtype=self.dtype),
+                    np.array(indices, dtype=np.int32),
+                    np.array(indptr, dtype=np.int64)),
+                    shape=(len(indptr)-1, self.numFeatures))
+
+    def featurizeSamples(self, samples):
+        return self.featurize([s.getTitle() for s in samples],
+                              [s.getDescription() for s in samples])
+# end class Featurizer -----------------------------------
+
+def benchmark(sampleFile, modelFile=None):
+    """ Time two stage (standard() + vectorizer.transform()) and fused
+        featurization. Return report text.
+    """
+    from sklearn.base import clone
+
+    cols = mlSampleLib.readSampleFile(sampleFile, columnar=True)
+    titles = list(cols.getTitles())
+    descriptions = list(cols.getDescriptions())
+    if modelFile:
+        with open(modelFile, 'rb') as fp:
+            vectorizer = pickle.load(fp).named_steps['vectorizer']
+    else:
+        import gxdhtclassifier
+        vectorizer = clone(gxdhtclassifier.pipeline.named_steps['vectorizer'])
+        train = mlSampleLib.readSampleFile(sampleFile, columnar=True)
+        vectorizer.fit(train.preprocess(['standard']).getDocuments())
+    if hasattr(vectorizer, 'cacheDir'):         # time it, not the cache
+        vectorizer.set_params(cacheDir=None)
+
+    startTime = time.time()
+    twoStage = mlSampleLib.readSampleFile(sampleFile, columnar=True)
+    docs = twoStage.preprocess(['standard']).getDocuments()
+    X = vectorizer.transform(docs)
+    twoStageTime = time.time() - startTime
+
+    startTime = time.time()
+    featurizer = Featurizer(vectorizer)
+    initTime = time.time() - startTime
+    startTime = time.time()
+    Xf = featurizer.featurize(titles, descriptions)
+    fusedTime = time.time() - startTime
+
+    text = "%d samples, %d features\n" % (X.shape[0], X.shape[1])
+    text += "two stage  %8.3f seconds\n" % twoStageTime
+    text += "fused      %8.3f seconds  (+ %.3f seconds setup)\n" % \
+                                                        (fusedTime, initTime)
+    text += "identical: %s\n" % (X.shape == Xf.shape and (X != Xf).nnz == 0)
+    return text
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Compare two stage and fused featurization of a ' +
+                    '(unpreprocessed) sample file')
+
+    parser.add_argument('sampleFile', help='unpreprocessed sample file')
+
+    parser.add_argument('--model', dest='modelFile', default=None,
+        help='trained model pkl. Default: fit the gxdhtclassifier.py ' +
+             'vectorizer on the sample file')
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    print(benchmark(args.sampleFile, args.modelFile))
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Incremental retraining of a trained gxdhtclassifier model when a
+           few hundred newly curated experiments are added, instead of
+           re-vectorizing everything and refitting all the trees.
+
+           The vectorizer vocabulary is frozen: new documents are only
+           transformed w/ the trained vectorizer (after any steps before it,
+           e.g., a SamplePreprocessor).
+
+           The training feature matrix (vectorizer output, CSR) is kept in
+           a training matrix file, w/ the y values and sample IDs of its rows.
+           An update transforms only the new samples and appends their rows.
+           A new sample whose ID is already in the matrix (re-curated)
+           replaces the old row.
+
+           The forest then replaces a share (--replace) of its trees: the
+           oldest trees are dropped (estimators_ are kept oldest first), and
+           RandomForestClassifier warm_start fits the same number of new
+           trees on the whole updated matrix, so new trees see old and new
+           data. Other trees, the vectorizer and all other params are kept.
+           Steps between the vectorizer and the forest (e.g., a
+           BinaryFeatureSelector or BinaryFeaturePacker) are kept as trained
+           and only transform the matrix for the new trees.
+
+  If you run this module as a script:
+        htIncrementalTrain.py init   model.pkl matrixFile sampleFile ...
+                (build the training matrix of the files the model was
+                 trained on)
+        htIncrementalTrain.py update model.pkl matrixFile newSampleFile ...
+                                     -o newModel.pkl [--replace 0.5]
+                (the matrix file is updated in place)
+        htIncrementalTrain.py benchmark sampleFile [--replace 0.2 0.5]
+                (train on 60% of the samples, add 20%, compare incremental
+                 vs. full retrain on the last 20%)
+  All sample files are preprocessed sample files.
+'''
+import sys
+import time
+import copy
+import warnings
+import pickle
+import argparse
+import numpy as np
+import scipy.sparse
+from sklearn.pipeline import Pipeline
+import htMLsample as mlSampleLib
+#-----------------------------------
+
+DEFAULT_REPLACE = 0.5       # share of trees to replace in an update
+
+class TrainingMatrix (object):
+    """
+    IS:   the vectorized training samples of a model
+    HAS:  X - CSR vectorizer output, y - y values, ids - sample IDs
+    DOES: fromSamples(), append(), save(), load()
+    """
+    def __init__(self, X, y, ids):
+        self.X = scipy.sparse.csr_matrix(X)
+        self.y = np.asarray(y)
+        self.ids = np.asarray(ids, dtype=str)
+    #-----------------------------------
+
+    @classmethod
+    def fromSamples(cls, featurizer, sampleColumns):
+        """ Return TrainingMatrix of htMLsample.SampleColumns.
+            featurizer: getFeaturizer() of the model, or its vectorizer
+        """
+        return cls(featurizer.transform(sampleColumns.getDocuments()),
+                    sampleColumns.getKnownYvalues(),
+                    sampleColumns.getSampleIDs())
+
+    def append(self, other):
+        """ Append the rows of another TrainingMatrix. Rows w/ IDs that are
+            in other are replaced. Return number of replaced rows.
+        """
+        keep = ~np.isin(self.ids, other.ids)
+        self.X = scipy.sparse.vstack([self.X[np.flatnonzero(keep)], other.X],
+                                                                format='csr')
+        self.y = np.concatenate([self.y[keep], other.y])
+        self.ids = np.concatenate([self.ids[keep], other.ids])
+        return int((~keep).sum())
+    #-----------------------------------
+
+    def save(self, fileName):
+        with open(fileName, 'wb') as fp:       # so np doesn't add .npz
+            np.savez_compressed(fp, data=self.X.data, indices=self.X.indices,
+                    indptr=self.X.indptr, shape=np.array(self.X.shape),
+                    y=self.y, ids=self.ids)
+
+    @classmethod
+    def load(cls, fileName):
+        with np.load(fileName) as f:
+            X = scipy.sparse.csr_matrix((f['data'], f['indices'],f['indptr']),
+                                                    shape=tuple(f['shape']))
+            return cls(X, f['y'], f['ids'])
+# end class TrainingMatrix -----------------------------------
+
+def readSampleFiles(sampleFiles):
+    """ Return one SampleColumns of all the sample files """
+    columns = None
+    for fileName in sampleFiles:
+        cols = mlSampleLib.readSampleFile(fileName, columnar=True)
+        if columns is None:
+            columns = cols
+        else:
+            for fn in cols.fieldNames:
+                columns.columns[fn] += cols.getColumn(fn)
+    return columns
+#-----------------------------------
+
+def getFeaturizer(pipeline):
+    """ Return Pipeline of the trained steps through the 'vectorizer' step:
+        documents -> training matrix rows
+    """
+    names = [name for name, step in pipeline.steps]
+    return Pipeline(pipeline.steps[:names.index('vectorizer')+1])
+
+def getForestInputSteps(pipeline):
+    """ Return list of the (name, step)s between the vectorizer and the
+        forest
+    """
+    names = [name for name, step in pipeline.steps]
+    return pipeline.steps[names.index('vectorizer')+1:-1]
+#-----------------------------------
+
+def incrementalFit(pipeline,        # trained pipeline, updated in place
+                   matrix,          # TrainingMatrix, all training rows
+                   replace=DEFAULT_REPLACE, # share of the trees to replace
+    ):
+    """ Replace the oldest share of the forest's trees w/ trees fit on the
+        whole training matrix. Return the pipeline.
+    """
+    forest = pipeline.steps[-1][1]
+    numTrees = len(forest.estimators_)
+    numReplace = int(round(replace * numTrees))
+    if numReplace == 0:
+        return pipeline
+
+    X = matrix.X
+    steps = getForestInputSteps(pipeline)
+    if steps:                       # e.g., BinaryFeaturePacker
+        X = Pipeline(steps).transform(X)
+    forest.estimators_ = forest.estimators_[numReplace:]
+    params = forest.get_params()
+
+    # warm_start seeds the new trees by skipping len(estimators_) seeds of
+    #  random_state, so an int random_state would reuse the seeds of kept
+    #  trees. Seed each update differently, but reproducibly.
+    forest.numUpdates_ = getattr(forest, 'numUpdates_', 0) +1
+    randomState = params['random_state']
+    if isinstance(randomState, (int, np.integer)):
+        randomState = np.random.RandomState([randomState,forest.numUpdates_])
+    forest.set_params(warm_start=True, n_estimators=numTrees,
+                                                    random_state=randomState)
+    with warnings.catch_warnings():
+        # class_weight='balanced' warns about warm_start fits on partial
+        #  data, but the new trees are fit on all the training rows
+        warnings.filterwarnings('ignore', message='class_weight presets')
+        forest.fit(X, matrix.y)
+    forest.set_params(warm_start=params['warm_start'],
+                                        random_state=params['random_state'])
+    return pipeline
+#-----------------------------------
+
+def getScores(pipeline, docs, y, beta=2):
+    """ Return dict of F2, precision, recall, NPV """
+    from sklearn.metrics import fbeta_score, precision_score, recall_score
+    pred = pipeline.predict(docs)
+    y = np.asarray(y)
+    trueNeg = ((pred == 0) & (y == 0)).sum()
+    return {'F%d' % beta: fbeta_score(y, pred, beta=beta, pos_label=1),
+            'P': precision_score(y, pred, pos_label=1),
+            'R': recall_score(y, pred, pos_label=1),
+            'NPV': trueNeg / max(1, (pred == 0).sum()),
+            }
+#-----------------------------------
+
+def benchmark(sampleFile, replaces=[0.2, 0.5], randomSeed=1):
+    """ Train on 60% of the samples, add the next 20% incrementally vs. by a
+        full retrain, score on the last 20%. Return report text.
+    """
+    from sklearn.base import clone
+    import gxdhtclassifier
+
+    cols = mlSampleLib.readSampleFile(sampleFile, columnar=True)
+    order = np.random.RandomState(randomSeed).permutation(cols.getNumSamples())
+    n = len(order)
+    parts = {'old': order[:int(0.6*n)], 'new': order[int(0.6*n):int(0.8*n)],
+             'eval': order[int(0.8*n):]}
+    docs = np.array(cols.getDocuments(), dtype=object)
+    y = np.array(cols.getKnownYvalues())
+    ids = np.array(cols.getSampleIDs())
+
+    def getPipeline():
+        pipeline = clone(gxdhtclassifier.pipeline)
+        pipeline.set_params(classifier__verbose=0,
+                            classifier__random_state=randomSeed)
+        if hasattr(pipeline.named_steps['vectorizer'], 'cacheDir'):
+            pipeline.set_params(vectorizer__cacheDir=None)
+        return pipeline
+
+    evalDocs, evalY = list(docs[parts['eval']]), y[parts['eval']]
+    base = getPipeline().fit(list(docs[parts['old']]), y[parts['old']])
+    baseMatrix = TrainingMatrix(getFeaturizer(base).transform(
+            list(docs[parts['old']])), y[parts['old']], ids[parts['old']])
+
+    results = [('original (60%)', 0.0, getScores(base, evalDocs, evalY))]
+    for replace in replaces:
+        pipeline = copy.deepcopy(base)
+        matrix = copy.deepcopy(baseMatrix)
+        startTime = time.time()
+        matrix.append(TrainingMatrix(getFeaturizer(pipeline).transform(
+                list(docs[parts['new']])), y[parts['new']], ids[parts['new']]))
+        incrementalFit(pipeline, matrix, replace)
+        results.append(('incremental, replace %d%%' % (100*replace),
+                time.time() - startTime, getScores(pipeline, evalDocs, evalY)))
+
+    oldNew = np.concatenate([parts['old'], parts['new']])
+    startTime = time.time()
+    full = getPipeline().fit(list(docs[oldNew]), y[oldNew])
+    results.append(('full retrain (80%)', time.time() - startTime,
+                                        getScores(full, evalDocs, evalY)))
+
+    text = "%d old + %d new training samples, %d eval samples\n" % \
+                (len(parts['old']), len(parts['new']), len(parts['eval']))
+    text += "%-26s %10s %7s %7s %7s %7s\n" % ('model', 'train sec',
+                                                'F2', 'P', 'R', 'NPV')
+    for name, seconds, scores in results:
+        text += "%-26s %10.2f %7.4f %7.4f %7.4f %7.4f\n" % (name, seconds,
+                scores['F2'], scores['P'], scores['R'], scores['NPV'])
+    return text
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Incrementally retrain a trained model on new samples')
+
+    parser.add_argument('command', choices=['init', 'update', 'benchmark'],
+        help='init: build the training matrix of a model. ' +
+             'update: add new samples, replace some trees. ' +
+             'benchmark: incremental vs. full retrain')
+
+    parser.add_argument('files', nargs='+',
+        help='init, update: model.pkl matrixFile sampleFile ... ' +
+             'benchmark: sampleFile')
+
+    parser.add_argument('-o', '--output', dest='outputFile', default=None,
+        help='update: updated model pkl. Required for update')
+
+    parser.add_argument('--replace', dest='replaces', type=float, nargs='+',
+        default=None,
+        help='share of the trees to replace. Default: %.1f ' % DEFAULT_REPLACE+
+             '(benchmark default: 0.2 0.5)')
+
+    parser.add_argument('--seed', dest='randomSeed', type=int, default=None,
+        help='update: random_state for the new trees. Default: the ' +
+             "model's random_state (benchmark default: 1)")
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    if args.command == 'benchmark':
+        print(benchmark(args.files[0], args.replaces or [0.2, 0.5],
+                    1 if args.randomSeed is None else args.randomSeed))
+        exit(0)
+    if len(args.files) < 3:
+        sys.stderr.write("%s needs model.pkl matrixFile sampleFile ...\n" % \
+                                                                args.command)
+        exit(5)
+    modelFile, matrixFile, sampleFiles = args.files[0], args.files[1], \
+                                                                args.files[2:]
+    with open(modelFile, 'rb') as fp:
+        pipeline = pickle.load(fp)
+    featurizer = getFeaturizer(pipeline)
+    startTime = time.time()
+    if args.command == 'init':
+        matrix = TrainingMatrix.fromSamples(featurizer,
+                                                readSampleFiles(sampleFiles))
+        matrix.save(matrixFile)
+        sys.stderr.write("%d rows, %d features, %.2f seconds\n" % \
+                    (matrix.X.shape[0], matrix.X.shape[1],
+                                                    time.time() - startTime))
+    elif args.command == 'update':
+        if not args.outputFile:
+            sys.stderr.write("update needs -o newModel.pkl\n")
+            exit(5)
+        matrix = TrainingMatrix.load(matrixFile)
+        numReplaced = matrix.append(TrainingMatrix.fromSamples(featurizer,
+                                                readSampleFiles(sampleFiles)))
+        if args.randomSeed is not None:
+            pipeline.steps[-1][1].set_params(random_state=args.randomSeed)
+        replace = args.replaces[0] if args.replaces else DEFAULT_REPLACE
+        incrementalFit(pipeline, matrix, replace)
+        with open(args.outputFile, 'wb') as fp:
+            pickle.dump(pipeline, fp)
+        matrix.save(matrixFile)
+        sys.stderr.write("%d rows (%d replaced), %d%% of trees refit, " % \
+                    (matrix.X.shape[0], numReplaced, 100*replace) +
+                    "%.2f seconds\n" % (time.time() - startTime))
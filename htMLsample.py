@@ -5,11 +5,17 @@
 #   an experiment record with some text to classify
 # NOT a biological sample in a high throughput experiment.
 #
-# There are automated unit tests for this module: JIM NOT YET
+# There are automated unit tests for this module:
 #   cd test
 #   python test_htMLsample.py -v
 #
+# To time the sample file readers and measure memory per sample on a
+#   sample file:
+#   python htMLsample.py sampleFile
+#
 import re
+import time
+from collections.abc import MutableMapping
 from baseSampleDataLib import *
 import utilsLib
 from htTextTransform import TextTransformer, AllMappings, \
@@ -23,8 +29,11 @@ RECORDEND    = '\n'     # record ending str when reading/writing sample files
 # Regex's used in sample preprocessors
 urls_re      = re.compile(r'\b(?:https?://|www[.]|doi)\S*',re.IGNORECASE)
 token_re     = re.compile(r'\b([a-z_]\w+)\b',re.IGNORECASE)
+# the gxdhtclassifier.py vectorizer token_pattern, applied to lower case text
+vectorizer_token_re = re.compile(r'\b([a-z_]\w+)\b')
 
 stemmer = None		# see preprocessor below
+vectorizer_stop_words = None	# see compactNgrams() below
 
 # Instantiate TextTransformers used by various preprocessors
 textTransformer_all = TextTransformer(AllMappings)
@@ -144,6 +153,61 @@ class HtSample (BaseSample):
         return self
     # ---------------------------
 
+    def compactNgrams(self):		# preprocessor
+        """
+        Shorten the description to a walk over its vectorizer tokens that
+        gives the same set of unigrams and bigrams as the whole document.
+        For the gxdhtclassifier.py vectorizer (stop_words='english',
+        binary=True, ngram_range (1,2), its token_pattern), the binary
+        feature vector of the document is unchanged, but repeated text
+        (e.g., raw sample text appended to descriptions) mostly goes away.
+        Run after the other preprocessors. The title is kept as is.
+        """
+        global vectorizer_stop_words
+        if vectorizer_stop_words is None:
+            from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+            vectorizer_stop_words = ENGLISH_STOP_WORDS
+        def _tokens(text):
+            return [t for t in vectorizer_token_re.findall(text.lower()) \
+                                        if t not in vectorizer_stop_words]
+        titleTokens = _tokens(self.getTitle())
+        descTokens  = _tokens(self.getDescription())
+
+        allTokens = titleTokens + descTokens
+        bigrams   = set(zip(allTokens, allTokens[1:]))    # all the doc has
+        seen = set(titleTokens) | set(zip(titleTokens, titleTokens[1:]))
+
+        # Walk the description tokens. Skip tokens whose unigram and bigram
+        # we have already seen. Before emitting a token w/ a new unigram or
+        # bigram, emit the shortest tail of the skipped tokens that the last
+        # emitted token forms a known bigram with, so every bigram in the
+        # output is one the document has.
+        last = titleTokens[-1] if titleTokens else None
+        numTitle = len(titleTokens)
+        emitted = []
+        skipped = []
+        for i, t in enumerate(descTokens):
+            prev = allTokens[numTitle + i -1] if numTitle + i else None
+            if t in seen and (prev is None or (prev, t) in seen):
+                skipped.append(t)
+                continue
+            tail = skipped
+            if skipped and last is not None:
+                j = len(skipped) -1
+                while (last, skipped[j]) not in bigrams:
+                    j -= 1
+                tail = skipped[j:]
+            for w in tail + [t]:
+                emitted.append(w)
+                seen.add(w)
+                if last is not None:
+                    seen.add((last, w))
+                last = w
+            skipped = []
+        self.setDescription(' '.join(emitted))
+        return self
+    # ---------------------------
+
     def truncateText(self):		# preprocessor
         """ for debugging, so you can see a sample record easily"""
         
@@ -215,5 +279,289 @@ class ClassifiedHtSample (HtSample, ClassifiedSample):
     #----------------------
 # end class ClassifiedHtSample ------------------------
 
+def preprocessDocs(docs, preprocessors):
+    """ Return list of the docs after running the HtSample preprocessors.
+        Each doc is title + '\n' + description.
+        Here, not in htPipelineSteps.py, so scoring w/o sklearn can run it.
+    """
+    sample = HtSample()
+    results = []
+    for doc in docs:
+        title, sep, description = doc.partition('\n')
+        sample.setFields({'ID': '', 'title': title,
+                                    'description': description})
+        for p in preprocessors:
+            getattr(sample, p)()
+        results.append(sample.constructDoc())
+    return results
+
+#-----------------------------------
+# Fast bulk reading of sample files.
+#  The MLtextTools SampleSet.read() builds each sample record by record.
+#  These read the whole file buffer and split it all at once.
+#-----------------------------------
+
+class SampleColumns (object):
+    """
+    IS:   a set of samples read from a sample file, held as one list per field
+            (columns) instead of one Sample object per record.
+            This is a compact representation: there is no values dict (or
+            extraInfo dict) per sample, and repeated values in the short
+            fields (knownClassName, curationState, studytype, ...) are shared.
+    HAS:  sampleObjType, the #meta items, one list of field values per field
+    DOES: getSampleIDs(), getKnownClassNames(), getKnownYvalues(),
+          getTitles(), getDescriptions(), getDocuments()
+            - lists that can go straight to a vectorizer
+          getColumn(fieldName)
+          getSample(i), getSamples() - lightweight row views that are
+            sampleObjType objects, so the getters/setters and preprocessors
+            all work, and they read/write the columns.
+          preprocess(preprocessorNames) - run preprocessors on all samples
+    """
+    textFieldNames = ['ID', 'title', 'description']   # unique per sample,
+                                                        #  not worth sharing
+    def __init__(self,
+                sampleObjType,  # Sample class whose fieldNames match columns
+                columns,        # list of lists, one list per fieldName
+                meta={},        # dict of #meta items
+                ):
+        self.sampleObjType = sampleObjType
+        self.fieldNames = sampleObjType.fieldNames
+        self.columns = dict(zip(self.fieldNames, columns))
+        self.meta = dict(meta)
+
+        for fn in self.fieldNames:      # share repeated values
+            if fn not in self.textFieldNames:
+                shared = {}
+                self.columns[fn] = [shared.setdefault(v,v) \
+                                                for v in self.columns[fn]]
+    #----------------------
+
+    def getNumSamples(self):  return len(self.columns[self.fieldNames[0]])
+    def getColumn(self, fieldName): return self.columns[fieldName]
+    def getSampleIDs(self):   return self.columns['ID']
+    def getTitles(self):      return self.columns['title']
+    def getDescriptions(self):return self.columns['description']
+    def getMetaItem(self, k): return self.meta.get(k)
+
+    def getKnownClassNames(self): return self.columns['knownClassName']
+
+    def getKnownYvalues(self):
+        yValues = { n: y for y, n in \
+                        enumerate(self.sampleObjType.sampleClassNames) }
+        return [yValues[n] for n in self.columns['knownClassName']]
+
+    def getDocuments(self):
+        """ Same text as HtSample.constructDoc() for each sample """
+        return ['\n'.join(td) for td in zip(self.getTitles(),
+                                            self.getDescriptions())]
+    #----------------------
+
+    def getSample(self, i):
+        """ Return a row view of sample i """
+        return getRowViewClass(self.sampleObjType)(self, i)
+
+    def getSamples(self):
+        rowViewClass = getRowViewClass(self.sampleObjType)
+        return [rowViewClass(self, i) for i in range(self.getNumSamples())]
+
+    def preprocess(self, preprocessorNames):
+        """ Run the named preprocessor methods on each sample, in place """
+        for sample in self.getSamples():
+            for p in preprocessorNames:
+                getattr(sample, p)()
+        return self
+# end class SampleColumns ------------------------
+
+class RowFields (MutableMapping):
+    """
+    IS:   a dict-like view of some fields of one row of a SampleColumns.
+          Used as a row view's "values" and "extraInfo" dicts.
+          Setting a field sets the value in the SampleColumns.
+    """
+    __slots__ = ('columns', 'fieldNames', 'row')
+
+    def __init__(self, columns, fieldNames, row):
+        self.columns = columns
+        self.fieldNames = fieldNames
+        self.row = row
+
+    def __getitem__(self, k):
+        if k not in self.fieldNames: raise KeyError(k)
+        return self.columns[k][self.row]
+
+    def __setitem__(self, k, v):
+        if k not in self.fieldNames: raise KeyError(k)
+        self.columns[k][self.row] = v
+
+    def __delitem__(self, k):
+        raise TypeError("cannot delete sample fields")
+
+    def __iter__(self): return iter(self.fieldNames)
+    def __len__(self):  return len(self.fieldNames)
+# end class RowFields ------------------------
+
+class SampleRowView (object):
+    """
+    IS:   mixin that makes a Sample class a view of one row of a SampleColumns.
+          Instances have no values or extraInfo dict of their own. These are
+          RowFields views of the columns. See getRowViewClass().
+          The __slots__ keep sampleColumns and row out of the instance dict,
+          but BaseSample has no __slots__, so instances still have a
+          __dict__ (empty unless something sets other attributes).
+    """
+    __slots__ = ('sampleColumns', 'row')
+
+    def __init__(self, sampleColumns, row):
+        self.sampleColumns = sampleColumns
+        self.row = row
+
+    def _getValues(self):
+        return RowFields(self.sampleColumns.columns, self.fieldNames, self.row)
+
+    def _setValues(self, values):
+        for k, v in values.items():
+            self.sampleColumns.columns[k][self.row] = v
+
+    def _getExtraInfo(self):
+        return RowFields(self.sampleColumns.columns,
+                    getattr(self, 'extraInfoFieldNames', []), self.row)
+
+    values    = property(_getValues, _setValues)
+    extraInfo = property(_getExtraInfo, _setValues)
+# end class SampleRowView ------------------------
+
+rowViewClasses = {}     # rowViewClasses[sampleObjType] = its row view class
+
+def getRowViewClass(sampleObjType):
+    """ Return the row view class for a Sample class.
+        Its empty __slots__ add no per-instance fields, it does not remove
+        the __dict__ the Sample classes have.
+    """
+    if sampleObjType not in rowViewClasses:
+        rowViewClasses[sampleObjType] = type(sampleObjType.__name__ + 'Row',
+                                (SampleRowView, sampleObjType), {'__slots__':()})
+    return rowViewClasses[sampleObjType]
+#-----------------------------------
+
+def readSampleFile(inFile,          # filename or open file
+                   sampleObjType=ClassifiedHtSample,
+                   columnar=False,  # True: return SampleColumns
+    ):
+    """
+    Read a sample file in one bulk read & split.
+    Validate the header line and the number of fields in every record
+        against sampleObjType.fieldNames.
+    Return a SampleColumns if columnar, else a (Classified)SampleSet of
+        sampleObjType samples, same as SampleSet.read()
+    """
+    if type(inFile) == type(''):
+        with open(inFile, 'r') as fp:
+            text = fp.read()
+        fileName = inFile
+    else:
+        text = inFile.read()
+        fileName = getattr(inFile, 'name', 'input')
+
+    fieldNames = sampleObjType.getFieldNames()
+    fieldSep   = sampleObjType.getFieldSep()
+
+    # #meta line always ends in '\n' (whatever the recordEnd is)
+    meta = {}
+    if text.startswith('#meta'):
+        metaLine, text = text.split('\n', 1)
+        for item in metaLine.split()[1:]:
+            k, v = item.split('=', 1)
+            meta[k] = v
+
+    records = text.split(sampleObjType.getRecordEnd())
+    if records and records[-1] == '':
+        records.pop()               # text after the last recordEnd
+    if not records or records[0] != fieldSep.join(fieldNames):
+        raise ValueError("%s: header line does not match %s fieldNames" % \
+                                    (fileName, sampleObjType.__name__))
+    rows = [r.split(fieldSep) for r in records[1:]]
+
+    numFields = len(fieldNames)
+    if rows and set(map(len, rows)) != {numFields}:
+        for i, row in enumerate(rows):
+            if len(row) != numFields:
+                raise ValueError("%s: record %d has %d fields, expected %d" % \
+                                    (fileName, i+1, len(row), numFields))
+
+    if columnar:
+        columns = [list(c) for c in zip(*rows)] if rows else \
+                                            [[] for fn in fieldNames]
+        return SampleColumns(sampleObjType, columns, meta)
+
+    if issubclass(sampleObjType, ClassifiedSample):
+        sampleSet = ClassifiedSampleSet(sampleObjType=sampleObjType)
+    else:
+        sampleSet = SampleSet(sampleObjType=sampleObjType)
+    for k, v in meta.items():
+        sampleSet.setMetaItem(k, v)
+    for row in rows:
+        sampleSet.addSample(sampleObjType().setFields(dict(zip(fieldNames,row))))
+    return sampleSet
+#-----------------------------------
+
+def timeReaders(fileName, nTimes=5):
+    """
+    Time SampleSet.read() vs. readSampleFile() on a sample file.
+    Return report text.
+    """
+    timings = [
+        ('SampleSet.read()', lambda: ClassifiedSampleSet( \
+                        sampleObjType=ClassifiedHtSample).read(fileName)),
+        ('readSampleFile()', lambda: readSampleFile(fileName)),
+        ('readSampleFile(columnar=True)',
+                        lambda: readSampleFile(fileName, columnar=True)),
+        ]
+    text = "Read times for '%s', best of %d\n" % (fileName, nTimes)
+    for name, f in timings:
+        best = None
+        for i in range(nTimes):
+            startTime = time.time()
+            f()
+            t = time.time() - startTime
+            if best is None or t < best: best = t
+        text += "%-32s %8.4f seconds\n" % (name, best)
+    return text
+#-----------------------------------
+
+def measureMemory(fileName):
+    """
+    Measure memory per sample of Sample objects vs. SampleColumns from
+        reading a sample file.
+    Return report text.
+    """
+    import gc
+    import tracemalloc
+    text = "Memory for samples from '%s'\n" % fileName
+    for name, columnar in [('Sample objects', False), ('SampleColumns', True)]:
+        gc.collect()
+        tracemalloc.start()
+        samples = readSampleFile(fileName, columnar=columnar)
+        gc.collect()
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        n = samples.getNumSamples()
+        if n == 0:
+            text += "%-16s no samples\n" % name
+            del samples
+            continue
+        textSize = sum([len(t) + len(d) for t, d in \
+                    [(s.getTitle(), s.getDescription()) \
+                    for s in samples.getSamples()]])
+        text += "%-16s %10d bytes %8.0f bytes/sample " % (name, size, size/n)
+        text += "%8.0f bytes/sample w/o title & description text\n" % \
+                                                        ((size - textSize)/n)
+        del samples
+    return text
+#-----------------------------------
+
 if __name__ == "__main__":
-    pass
+    import sys
+    if len(sys.argv) > 1:       # time the sample file readers on a file
+        print(timeReaders(sys.argv[1]))
+        print(measureMemory(sys.argv[1]))
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           A memory-mapped model artifact for multi-process scoring.
+
+           When scoring is fanned out across processes, each worker
+           unpickles its own copy of gxdhtclassifier.pkl: the vectorizer
+           vocabulary dict and the 100 trees' node arrays, each built in the
+           worker's private memory.
+
+           A model artifact is an htArrayFile holding the large parts of a
+           trained pipeline as flat arrays that workers memory-map read-only,
+           so the OS shares one copy of their pages between all the workers:
+                vocab.terms     fixed width, utf-8 terms in sorted order
+                vocab.index     feature index of each term in vocab.terms
+                forest.*        CompiledForest arrays (htCompiledForest.py)
+           and in the meta: the vectorizer settings needed to tokenize
+           (lowercase, token_pattern, stop words, ngram_range, binary), the
+           forest meta, the sample class names, and the preprocessor names if
+           the pipeline starts w/ a SamplePreprocessor step.
+
+           ModelArtifact.load() maps the file. predict_proba(docs) tokenizes
+           the documents the same way as CountVectorizer, looks all their
+           terms up at once with np.searchsorted() on vocab.terms, and runs
+           the CompiledForest. Predictions are identical to the pipeline.
+           (The loading and scoring is htScoringRuntime.ScoringRuntime, which
+           only needs numpy. ModelArtifact adds a scipy CSR transform().)
+
+           The pipeline must be a (SamplePreprocessor), CountVectorizer (or
+           subclass), (BinaryFeatureSelector), (BinaryFeaturePacker),
+           RandomForestClassifier. A BinaryFeatureSelector is folded into the
+           vocabulary (see htFeatureSelection.py).
+
+  If you run this module as a script, it writes an artifact for a trained
+  model pkl, or measures load time and RSS/PSS of N concurrent worker
+  processes loading the pkl vs. the artifact:
+        htModelArtifact.py write     model.pkl artifactFile
+        htModelArtifact.py benchmark sampleFile [--model model.pkl]
+                                     [--workers 1 16]
+'''
+import sys
+import os
+import time
+import pickle
+import argparse
+import numpy as np
+import scipy.sparse
+from htArrayFile import writeArrayFile
+from htCompiledForest import CompiledForest
+from htScoringRuntime import ScoringRuntime, FOREST_PREFIX
+#-----------------------------------
+
+def getVectorizerMeta(vectorizer):
+    """ Return dict of the settings needed to tokenize like the vectorizer """
+    if vectorizer.analyzer != 'word' or vectorizer.tokenizer is not None \
+            or vectorizer.preprocessor is not None \
+            or vectorizer.strip_accents is not None:
+        raise ValueError("only word analyzers w/o custom tokenizer/" +
+                            "preprocessor/accents can be written")
+    stopWords = vectorizer.get_stop_words() or []
+    return {'lowercase'   : bool(vectorizer.lowercase),
+            'tokenPattern': vectorizer.token_pattern,
+            'stopWords'   : sorted(stopWords),
+            'ngramRange'  : list(vectorizer.ngram_range),
+            'binary'      : bool(vectorizer.binary),
+            'numFeatures' : len(vectorizer.vocabulary_),
+            }
+#-----------------------------------
+
+def writeModelArtifact(pipeline, fileName,
+                       sampleObjType=None,  # default ClassifiedHtSample
+    ):
+    """ Write the artifact of a trained pipeline to fileName """
+    if sampleObjType is None:
+        import htMLsample
+        sampleObjType = htMLsample.ClassifiedHtSample
+    if [s for n, s in pipeline.steps \
+                        if type(s).__name__ == 'BinaryFeatureSelector']:
+        from htFeatureSelection import foldFeatureSelector
+        pipeline = foldFeatureSelector(pipeline)
+    steps = list(pipeline.steps)
+    preprocessors = []
+    if type(steps[0][1]).__name__ == 'SamplePreprocessor':
+        preprocessors = list(steps.pop(0)[1].preprocessors)
+    vectorizer = steps[0][1]
+    forest = steps[-1][1]
+    for name, step in steps[1:-1]:
+        if type(step).__name__ != 'BinaryFeaturePacker':
+            raise ValueError("can't write pipeline step '%s'" % name)
+
+    terms = sorted([(t.encode('utf-8'), i) \
+                                for t, i in vectorizer.vocabulary_.items()])
+    width = max([len(t) for t, i in terms] + [1])
+    arrays = {'vocab.terms': np.array([t for t, i in terms],
+                                                    dtype='S%d' % width),
+              'vocab.index': np.array([i for t, i in terms], dtype=np.int32),
+              }
+    compiled = CompiledForest.fromForest(forest)
+    forestArrays = {'feature': compiled.feature,
+                    'threshold': compiled.threshold,
+                    'left': compiled.left, 'right': compiled.right,
+                    'leafProba': compiled.leafProba, 'roots': compiled.roots}
+    for name, a in forestArrays.items():
+        arrays[FOREST_PREFIX + name] = a
+    meta = {'vectorizer'   : getVectorizerMeta(vectorizer),
+            'forest'       : {'classes': compiled.classes_.tolist(),
+                              'maxDepth': compiled.maxDepth,
+                              'numFeatures': compiled.n_features_in_},
+            'preprocessors': preprocessors,
+            'classNames'   : list(sampleObjType.sampleClassNames),
+            'yPositive'    : int(sampleObjType.y_positive),
+            }
+    writeArrayFile(fileName, arrays, meta)
+#-----------------------------------
+
+class ModelArtifact (ScoringRuntime):
+    """
+    IS:   a trained model scored from a memory-mapped artifact file
+    HAS:  see htScoringRuntime.ScoringRuntime
+    DOES: transform(docs) -> CSR feature matrix, predict_proba(docs),
+          predict(docs)
+    """
+    def transform(self, docs):
+        """ Return CSR feature matrix of the docs, same as the vectorizer """
+        docs = list(docs)
+        rows, featureIds = self.getFeatureIds(docs)
+        X = scipy.sparse.csr_matrix((np.ones(rows.shape[0], dtype=np.int64),
+                        (rows, featureIds)), shape=(len(docs),self.numFeatures))
+        X.sum_duplicates()
+        if self.binary:
+            X.data[:] = 1
+        return X
+# end class ModelArtifact -----------------------------------
+
+def _getMemory():
+    """ Return (RSS, PSS) in bytes of this process """
+    values = {}
+    with open('/proc/self/smaps_rollup') as fp:
+        for line in fp:
+            fields = line.split()
+            if fields[0] in ('Rss:', 'Pss:'):
+                values[fields[0]] = int(fields[1]) * 1024
+    return values.get('Rss:', 0), values.get('Pss:', 0)
+
+def _benchmarkWorker(kind, fileName, docs, barrier, results):
+    """ Load the model, score the docs, then report memory while all the
+        workers are alive.
+    """
+    import numpy, scipy.sparse, sklearn.ensemble    # imports not timed
+    import htCompiledForest, htBinaryFeatures, htFeatureCache
+    before = _getMemory()
+    startTime = time.time()
+    if kind == 'pkl':
+        with open(fileName, 'rb') as fp:
+            model = pickle.load(fp)
+        model.steps[-1][1].set_params(verbose=0, n_jobs=1)
+    else:
+        model = ModelArtifact.load(fileName)
+    loadTime = time.time() - startTime
+    proba = model.predict_proba(docs)
+    barrier.wait()                      # all loaded and scored
+    after = _getMemory()
+    results.put((loadTime, after[0] - before[0], after[1], proba))
+    barrier.wait()                      # don't exit before all measured
+
+def benchmark(sampleFile, modelFile=None, numWorkers=[1, 16]):
+    """ Measure load time and memory of N concurrent workers loading the
+        pkl vs. the artifact. Return report text.
+    """
+    import tempfile
+    import multiprocessing
+    import htMLsample
+
+    cols = htMLsample.readSampleFile(sampleFile, columnar=True)
+    docs = cols.getDocuments()
+    tmpDir = tempfile.TemporaryDirectory()
+    if not modelFile:
+        from sklearn.base import clone
+        import gxdhtclassifier
+        pipeline = clone(gxdhtclassifier.pipeline)
+        pipeline.set_params(classifier__verbose=0, classifier__random_state=1)
+        if hasattr(pipeline.named_steps['vectorizer'], 'cacheDir'):
+            pipeline.set_params(vectorizer__cacheDir=None)
+        pipeline.fit(docs, cols.getKnownYvalues())
+        modelFile = os.path.join(tmpDir.name, 'model.pkl')
+        with open(modelFile, 'wb') as fp:
+            pickle.dump(pipeline, fp)
+    with open(modelFile, 'rb') as fp:
+        pipeline = pickle.load(fp)
+    artifactFile = os.path.join(tmpDir.name, 'model.artifact')
+    writeModelArtifact(pipeline, artifactFile)
+    docs = docs[:100]
+
+    text = "pkl %d bytes, artifact %d bytes, each worker scores %d docs\n" % \
+        (os.path.getsize(modelFile), os.path.getsize(artifactFile), len(docs))
+    text += "%-9s %8s %14s %18s %16s %10s\n" % ('model', 'workers',
+        'mean load ms', 'sum RSS growth MB', 'sum PSS all MB', 'same')
+    context = multiprocessing.get_context('spawn')
+    expected = None
+    for n in numWorkers:
+        for kind, fileName in [('pkl', modelFile), ('artifact',artifactFile)]:
+            barrier = context.Barrier(n)
+            results = context.Queue()
+            workers = [context.Process(target=_benchmarkWorker,
+                            args=(kind, fileName, docs, barrier, results)) \
+                        for i in range(n)]
+            for w in workers:
+                w.start()
+            measured = [results.get() for w in workers]
+            for w in workers:
+                w.join()
+            if expected is None:
+                expected = measured[0][3]
+            same = all([np.array_equal(m[3], expected) for m in measured])
+            text += "%-9s %8d %14.1f %18.1f %16.1f %10s\n" % (kind, n,
+                        1000*np.mean([m[0] for m in measured]),
+                        sum([m[1] for m in measured])/1024.0**2,
+                        sum([m[2] for m in measured])/1024.0**2, same)
+    tmpDir.cleanup()
+    return text
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Write a memory-mapped model artifact for a trained ' +
+                    'model, or benchmark multi-process loading')
+
+    parser.add_argument('command', choices=['write', 'benchmark'],
+        help='write: model.pkl -> artifactFile. ' +
+             'benchmark: load time and memory of N workers, pkl vs. artifact')
+
+    parser.add_argument('files', nargs='+',
+        help='write: model.pkl artifactFile. benchmark: sampleFile')
+
+    parser.add_argument('--model', dest='modelFile', default=None,
+        help='benchmark: trained model pkl. Default: train ' +
+             'gxdhtclassifier.py on the sample file')
+
+    parser.add_argument('--workers', dest='numWorkers', type=int, nargs='+',
+        default=[1, 16], help='benchmark: numbers of workers. Default: 1 16')
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    if args.command == 'write':
+        with open(args.files[0], 'rb') as fp:
+            pipeline = pickle.load(fp)
+        writeModelArtifact(pipeline, args.files[1])
+    elif args.command == 'benchmark':
+        print(benchmark(args.files[0], args.modelFile, args.numWorkers))
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Find near-duplicate experiments with MinHash and LSH, so
+           redundant documents are scored once and reported in training
+           sets.
+
+           GEO SuperSeries/SubSeries and resubmissions give many experiments
+           w/ nearly the same title, description and raw sample text.
+
+           MinHashIndex holds a MinHash signature per (preprocessed)
+           document: for each of numHashes random hash functions, the
+           minimum hash of the document's word shingles (shingleSize words
+           in a row). The fraction of equal signature values estimates the
+           Jaccard similarity of two documents' shingle sets.
+           LSH: signatures are cut into numBands bands. Documents w/ an
+           identical band land in the same bucket and become candidate
+           pairs; candidates w/ estimated similarity >= threshold are joined
+           into clusters (union-find). Clusters are transitive: A ~ B and
+           B ~ C puts A, B, C in one cluster.
+           Each cluster's representative is its first document.
+
+           predictDeduplicated() vectorizes and scores only the
+           representatives and gives every document its representative's
+           predict_proba row. (The documents are preprocessed before they
+           are indexed, so preprocessing is not skipped.)
+
+  If you run this module as a script:
+        htNearDups.py clusters  sampleFile [--threshold 0.8]
+                (clusters w/ more than one sample, and whether their known
+                 classes differ, to stdout. Summary to stderr)
+        htNearDups.py benchmark sampleFile [--threshold 0.7 0.8 0.9]
+                                           [--model model.pkl]
+                (share of documents skipped, time, and how many
+                 predictions change by reusing the representative's.
+                 All the samples are clustered. W/o --model, trains
+                 gxdhtclassifier.py on half the samples and counts changed
+                 predictions on the other half)
+  sampleFile: a preprocessed sample file.
+'''
+import sys
+import time
+import zlib
+import argparse
+import numpy as np
+import htMLsample as mlSampleLib
+#-----------------------------------
+
+HASH_PRIME = 4294967311     # prime > 2**32: a*x+b fits in uint64
+DEFAULT_THRESHOLD = 0.8
+
+def getShingles(doc, shingleSize=3):
+    """ Return array of the (uint64) crc32 hashes of the distinct word
+        shingles in doc. A doc shorter than shingleSize is one shingle.
+    """
+    tokens = doc.split()
+    if not tokens:
+        return np.zeros(0, dtype=np.uint64)
+    n = max(1, len(tokens) - shingleSize +1)
+    shingles = {' '.join(tokens[i:i+shingleSize]) for i in range(n)}
+    return np.array([zlib.crc32(s.encode('utf-8')) for s in shingles],
+                                                            dtype=np.uint64)
+#-----------------------------------
+
+class MinHashIndex (object):
+    """
+    IS:   a MinHash LSH index of documents
+    HAS:  MinHash signatures (documents x numHashes), LSH band buckets
+    DOES: add(docs), getSimilarity(i, j), getClusters(threshold)
+    """
+    def __init__(self, numHashes=128, numBands=16, shingleSize=3, seed=1):
+        if numHashes % numBands:
+            raise ValueError("numHashes must be a multiple of numBands")
+        self.numHashes = numHashes
+        self.numBands = numBands
+        self.rowsPerBand = numHashes // numBands
+        self.shingleSize = shingleSize
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 2**32, size=numHashes).astype(np.uint64)
+        self.b = rng.randint(0, 2**32, size=numHashes).astype(np.uint64)
+        self.signatures = np.zeros((0, numHashes), dtype=np.uint64)
+        self.buckets = [{} for i in range(numBands)]
+    #-----------------------------------
+
+    def getSignature(self, doc):
+        """ Return the MinHash signature of doc. All values are HASH_PRIME
+            for a doc w/o shingles (similar to nothing).
+        """
+        shingles = getShingles(doc, self.shingleSize)
+        if shingles.shape[0] == 0:
+            return np.full(self.numHashes, HASH_PRIME, dtype=np.uint64)
+        return ((np.outer(self.a, shingles) + self.b[:, None]) % HASH_PRIME) \
+                                                                .min(axis=1)
+
+    def add(self, docs):
+        """ Add docs to the index. Return their index numbers """
+        start = self.signatures.shape[0]
+        if not docs:
+            return []
+        sigs = np.vstack([self.getSignature(doc) for doc in docs])
+        self.signatures = np.vstack([self.signatures, sigs])
+        for i, sig in enumerate(sigs):
+            if sig[0] == HASH_PRIME:            # no shingles
+                continue
+            for band, buckets in enumerate(self.buckets):
+                key = sig[band*self.rowsPerBand:(band+1)*self.rowsPerBand] \
+                                                                    .tobytes()
+                buckets.setdefault(key, []).append(start + i)
+        return list(range(start, start + len(docs)))
+    #-----------------------------------
+
+    def getSimilarity(self, i, j):
+        """ Return estimated Jaccard similarity of docs i and j """
+        return float(np.mean(self.signatures[i] == self.signatures[j]))
+
+    def getClusters(self, threshold=DEFAULT_THRESHOLD):
+        """ Return array: for each doc, the index of its cluster's
+            representative (its lowest index doc)
+        """
+        parent = np.arange(self.signatures.shape[0])
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        checked = set()
+        for buckets in self.buckets:
+            for members in buckets.values():
+                if len(members) < 2:
+                    continue
+                sigs = self.signatures[members]
+                for k, i in enumerate(members[:-1]):
+                    similar = (sigs[k+1:] == sigs[k]).mean(axis=1) >= threshold
+                    for j in np.array(members[k+1:])[similar]:
+                        if (i, j) in checked:
+                            continue
+                        checked.add((i, j))
+                        ri, rj = find(i), find(int(j))
+                        if ri != rj:
+                            parent[max(ri, rj)] = min(ri, rj)
+        return np.array([find(i) for i in range(parent.shape[0])])
+# end class MinHashIndex -----------------------------------
+
+def getDocClusters(docs, threshold=DEFAULT_THRESHOLD):
+    """ Return array: for each doc, the index of its cluster's
+        representative
+    """
+    index = MinHashIndex()
+    index.add(docs)
+    return index.getClusters(threshold)
+#-----------------------------------
+
+def predictDeduplicated(pipeline, docs,
+                        reps=None,  # getDocClusters(docs), None to compute
+                        threshold=DEFAULT_THRESHOLD,
+    ):
+    """ Return (predict_proba of the docs, representative of each doc),
+        scoring only one representative doc per cluster.
+    """
+    if reps is None:
+        reps = getDocClusters(docs, threshold)
+    unique, inverse = np.unique(reps, return_inverse=True)
+    proba = pipeline.predict_proba([docs[i] for i in unique])
+    return proba[inverse], reps
+#-----------------------------------
+
+def getMultiClusters(reps):
+    """ Return list of the clusters w/ more than one doc, each a list of
+        doc indexes (representative first)
+    """
+    members = {}
+    for i, rep in enumerate(reps):
+        members.setdefault(int(rep), []).append(i)
+    return [m for rep, m in sorted(members.items()) if len(m) > 1]
+
+def getMixedClusters(classNames, reps):
+    """ Return the multi clusters whose docs have different known classes """
+    return [m for m in getMultiClusters(reps) \
+                                    if len({classNames[i] for i in m}) > 1]
+#-----------------------------------
+
+def getClusterReport(sampleColumns, reps):
+    """ Return (Cluster|ID|knownClassName|mixedClasses lines of the clusters
+        w/ more than one sample, summary text)
+    """
+    ids = sampleColumns.getSampleIDs()
+    classNames = sampleColumns.getKnownClassNames()
+    multi = getMultiClusters(reps)
+    numMixed = len(getMixedClusters(classNames, reps))
+    text = 'Cluster|ID|knownClassName|mixedClasses\n'
+    for m in multi:
+        mixed = len({classNames[i] for i in m}) > 1
+        for i in m:
+            text += '%s|%s|%s|%s\n' % (ids[m[0]], ids[i], classNames[i],
+                                                    'yes' if mixed else 'no')
+    summary = "%d samples, %d clusters, " % (len(reps), len(set(reps))) + \
+              "%d w/ more than one sample (%d samples), " % \
+                                (len(multi), sum([len(m) for m in multi])) + \
+              "%d w/ mixed known classes\n" % numMixed
+    return text, summary
+#-----------------------------------
+
+def benchmark(sampleFile, thresholds=[0.7, 0.8, 0.9], modelFile=None,
+                                                                randomSeed=1):
+    """ Report share of documents skipped, time and changed predictions
+        at each threshold. Return report text.
+        The clusters do not depend on the model, so all the documents are
+        indexed and clustered, and skipped, dedup seconds and mixed class
+        are for the whole file.
+        W/o modelFile, train on half the samples, and count changed
+        predictions only for the other half, so the model has not seen the
+        documents whose predictions are compared.
+    """
+    import pickle
+    cols = mlSampleLib.readSampleFile(sampleFile, columnar=True)
+    docs = cols.getDocuments()
+    classNames = cols.getKnownClassNames()
+    if modelFile:
+        with open(modelFile, 'rb') as fp:
+            pipeline = pickle.load(fp)
+        heldOut = np.arange(len(docs))
+        text = "model %s. " % modelFile
+    else:
+        from sklearn.base import clone
+        from sklearn.model_selection import train_test_split
+        import gxdhtclassifier
+        trainIdx, heldOut = train_test_split(np.arange(len(docs)),
+                        test_size=0.5, stratify=classNames,
+                        random_state=randomSeed)
+        pipeline = clone(gxdhtclassifier.pipeline)
+        pipeline.set_params(classifier__random_state=randomSeed)
+        if hasattr(pipeline.named_steps['vectorizer'], 'cacheDir'):
+            pipeline.set_params(vectorizer__cacheDir=None)
+        pipeline.steps[-1][1].set_params(verbose=0)
+        y = cols.getKnownYvalues()
+        pipeline.fit([docs[i] for i in trainIdx], [y[i] for i in trainIdx])
+        text = "model trained on %d of the documents. " % len(trainIdx)
+    pipeline.steps[-1][1].set_params(verbose=0)
+
+    startTime = time.time()
+    index = MinHashIndex()
+    index.add(docs)
+    indexTime = time.time() - startTime
+
+    startTime = time.time()
+    expected = pipeline.predict_proba(docs)
+    scoreTime = time.time() - startTime
+    expectedPred = expected.argmax(axis=1)
+
+    text += "%d documents. Score all: %.2f seconds. MinHash index: " % \
+                                            (len(docs), scoreTime) + \
+            "%.2f seconds\n" % indexTime
+    text += "%9s %9s %8s %8s %13s %9s %11s\n" % ('threshold', 'clusters',
+            'skipped', 'skip %', 'dedup seconds', 'changed', 'mixed class')
+    for threshold in thresholds:
+        startTime = time.time()
+        reps = index.getClusters(threshold)
+        proba, reps = predictDeduplicated(pipeline, docs, reps)
+        dedupTime = time.time() - startTime + indexTime
+        numUnique = len(set(reps))
+        changed = proba.argmax(axis=1) != expectedPred
+        text += "%9.2f %9d %8d %8.1f %13.2f %9d %11d\n" % (threshold,
+                numUnique, len(docs) - numUnique,
+                100.0*(len(docs) - numUnique)/len(docs), dedupTime,
+                changed[heldOut].sum(),
+                len(getMixedClusters(classNames, reps)))
+    text += "dedup seconds: index + clustering + scoring the " + \
+            "representatives\nchanged: predicted class differs from " + \
+            "scoring the doc itself,\n    counted for the %d " % \
+                                                        len(heldOut) + \
+            ("documents the model was not trained on" if not modelFile \
+                                                    else "documents") + \
+            "\nmixed class: clusters w/ more than one known class\n"
+    return text
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Find near-duplicate samples w/ MinHash LSH')
+
+    parser.add_argument('command', choices=['clusters', 'benchmark'],
+        help='clusters: report the clusters of a sample file. ' +
+             'benchmark: share of scoring work skipped')
+
+    parser.add_argument('sampleFile', help='preprocessed sample file')
+
+    parser.add_argument('--threshold', dest='thresholds', type=float,
+        nargs='+', default=None,
+        help='estimated Jaccard similarity to cluster at. Default: ' +
+             '%.1f (benchmark default: 0.7 0.8 0.9)' % DEFAULT_THRESHOLD)
+
+    parser.add_argument('--model', dest='modelFile', default=None,
+        help='benchmark: trained model pkl. Default: train ' +
+             'gxdhtclassifier.py on half of the sample file, score the rest')
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    if args.command == 'clusters':
+        cols = mlSampleLib.readSampleFile(args.sampleFile, columnar=True)
+        threshold = args.thresholds[0] if args.thresholds \
+                                                    else DEFAULT_THRESHOLD
+        report, summary = getClusterReport(cols,
+                                getDocClusters(cols.getDocuments(), threshold))
+        sys.stdout.write(report)
+        sys.stderr.write(summary)
+    elif args.command == 'benchmark':
+        print(benchmark(args.sampleFile, args.thresholds or [0.7, 0.8, 0.9],
+                                                            args.modelFile))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Pipeline steps that put the HtSample preprocessing inside the
+           trained model.
+
+           Today gxdhtclassifier.py starts at the vectorizer, so predict.py
+           has to be given the same "-p standard" preprocessing the model
+           was trained with, and runs it one sample at a time.
+
+           SamplePreprocessor is a stateless transformer that takes raw
+           documents (HtSample.constructDoc() text: title + '\n' +
+           description, as in SampleColumns.getDocuments()), runs the named
+           HtSample preprocessors on each, and returns the preprocessed
+           documents. Documents are processed in batches, in parallel
+           processes if n_jobs != 1.
+           As the first step of a Pipeline, it is pickled with the model, so
+           pipeline.predict_proba(rawDocs) preprocesses and vectorizes in
+           bulk and cannot get out of sync with training.
+
+  If you run this module as a script, it times preprocessing a sample file
+  outside vs. inside the pipeline at different n_jobs, and checks the
+  predictions are identical:
+        htPipelineSteps.py sampleFile [--jobs n ...]
+'''
+import sys
+import time
+import argparse
+from joblib import Parallel, delayed
+from sklearn.base import BaseEstimator, TransformerMixin
+import htMLsample as mlSampleLib
+from htMLsample import preprocessDocs
+#-----------------------------------
+
+class SamplePreprocessor (BaseEstimator, TransformerMixin):
+    """
+    IS:   a Pipeline step: raw documents -> preprocessed documents
+    HAS:  preprocessors - HtSample preprocessor method names, in order
+          n_jobs        - number of processes (joblib), -1 = all cores
+          batchSize     - documents per batch sent to a process
+    DOES: transform(docs)
+    """
+    def __init__(self, preprocessors=('standard',), n_jobs=1, batchSize=500):
+        self.preprocessors = preprocessors
+        self.n_jobs = n_jobs
+        self.batchSize = batchSize
+
+    def fit(self, X, y=None):
+        for p in self.preprocessors:
+            if not callable(getattr(mlSampleLib.HtSample, p, None)):
+                raise ValueError("unknown HtSample preprocessor '%s'" % p)
+        return self
+
+    def transform(self, X):
+        docs = list(X)
+        preprocessors = list(self.preprocessors)
+        if self.n_jobs == 1 or len(docs) <= self.batchSize:
+            return preprocessDocs(docs, preprocessors)
+        batches = Parallel(n_jobs=self.n_jobs)(
+                        delayed(preprocessDocs)(docs[i:i+self.batchSize],
+                                                                preprocessors)
+                        for i in range(0, len(docs), self.batchSize))
+        return [doc for batch in batches for doc in batch]
+# end class SamplePreprocessor -----------------------------------
+
+def benchmark(sampleFile, jobs=[1, -1]):
+    """ Time preprocessing + predict_proba outside vs. inside the pipeline.
+        Return report text.
+    """
+    import numpy as np
+    from sklearn.base import clone
+    from sklearn.pipeline import Pipeline
+    import gxdhtclassifier
+
+    cols = mlSampleLib.readSampleFile(sampleFile, columnar=True)
+    rawDocs = cols.getDocuments()
+    y = cols.getKnownYvalues()
+    pipeline = clone(gxdhtclassifier.pipeline)
+    pipeline.set_params(classifier__verbose=0, classifier__random_state=1)
+    if hasattr(pipeline.named_steps['vectorizer'], 'cacheDir'):
+        pipeline.set_params(vectorizer__cacheDir=None)
+
+    pipeline.fit(mlSampleLib.readSampleFile(sampleFile, columnar=True)
+                        .preprocess(['standard']).getDocuments(), y)
+
+    startTime = time.time()
+    docs = mlSampleLib.readSampleFile(sampleFile, columnar=True) \
+                                        .preprocess(['standard']).getDocuments()
+    proba = pipeline.predict_proba(docs)
+    text = "%d documents\n" % len(rawDocs)
+    text += "%-28s %8.3f seconds\n" % ('preprocess, then predict',
+                                                    time.time() - startTime)
+    for n in jobs:
+        embedded = Pipeline([('preprocessor', SamplePreprocessor(n_jobs=n))] +
+                                                            pipeline.steps)
+        startTime = time.time()
+        embeddedProba = embedded.predict_proba(rawDocs)
+        text += "%-28s %8.3f seconds  identical: %s\n" % \
+                    ('in pipeline, n_jobs=%d' % n, time.time() - startTime,
+                                    np.array_equal(proba, embeddedProba))
+    return text
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Time preprocessing outside vs. inside the pipeline')
+
+    parser.add_argument('sampleFile', help='unpreprocessed sample file')
+
+    parser.add_argument('--jobs', dest='jobs', type=int, nargs='+',
+        default=[1, -1], help='n_jobs values to time. Default: 1 -1')
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    print(benchmark(args.sampleFile, args.jobs))
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Predict a sample file w/ a persistent prediction cache, so
+           experiments whose text has not changed since the last run are not
+           preprocessed and scored again.
+
+           The cache is a local sqlite file, one row per prediction, keyed by
+                ID          experiment ID
+                textHash    sha256 of the (unpreprocessed) title + description
+                modelHash   sha256 of the model pkl, the preprocessor names,
+                            the source of the modules the preprocessors
+                            run (htMLsample.py, htTextTransform.py, utilsLib),
+                            the source of the modules of the Pipeline step
+                            classes the pkl refers to (htBinaryFeatures.py,
+                            htFeatureCache.py, htFeatureSelection.py,
+                            htPipelineSteps.py), and the sklearn version
+           So retraining the model, editing htTextTransform.py, or upgrading
+           sklearn changes the modelHash and the old rows are simply not
+           found (they can be removed w/ the "purge" command).
+
+           predictFile() looks up every sample, preprocesses and scores only
+           the misses, stores their predictions, and writes a complete preds
+           file in the same format as MLtextTools predict.py:
+                ID|Pred Class|Confidence|Abs Value|True Class|FP/FN|extraInfo...
+           The sample type is read from the sample file's #meta line. For
+           unclassified samples (HtSample) there are no true class columns:
+                ID|Pred Class|Confidence|Abs Value
+
+  If you run this module as a script:
+        htPredictCache.py predict  sampleFile [--model model.pkl]
+                                   [--cache cache.db] [-p preprocessor ...]
+                                   (preds file to stdout)
+        htPredictCache.py purge    [--model model.pkl] [--cache cache.db]
+                                   (delete the rows of other models)
+        htPredictCache.py counts   [--cache cache.db]
+'''
+import sys
+import time
+import pickle
+import sqlite3
+import hashlib
+import inspect
+import argparse
+import htMLsample as mlSampleLib
+import htTextTransform
+from htPredictServer import getConfidence
+from htSampleStore import getSampleObjType
+#-----------------------------------
+
+DEFAULT_CACHE = 'gxdhtclassifier.predcache.db'
+DEFAULT_MODEL = 'gxdhtclassifier.pkl'
+
+def getPreprocessorSourceFiles():
+    """ Return the source files of the modules the preprocessors run """
+    modules = [mlSampleLib, htTextTransform]
+    try:
+        import utilsLib
+        modules.append(utilsLib)
+    except ImportError:
+        pass
+    return [inspect.getsourcefile(m) for m in modules]
+
+def getPipelineStepSourceFiles():
+    """ Return the source files of the modules of the Pipeline steps a
+        model pkl may refer to: a pkl only stores class names and params,
+        the code that predicts is in these modules
+    """
+    import htBinaryFeatures
+    import htFeatureCache
+    import htFeatureSelection
+    import htPipelineSteps
+    return [inspect.getsourcefile(m) for m in [htBinaryFeatures,
+                        htFeatureCache, htFeatureSelection, htPipelineSteps]]
+#-----------------------------------
+
+def getModelHash(modelFile, preprocessors):
+    """ Return hex sha256 of the model pkl, the preprocessor names, the
+        preprocessor and Pipeline step source files, and the sklearn version
+    """
+    import sklearn
+    h = hashlib.sha256()
+    for fileName in [modelFile] + getPreprocessorSourceFiles() + \
+                                                getPipelineStepSourceFiles():
+        with open(fileName, 'rb') as fp:
+            for block in iter(lambda: fp.read(1<<20), b''):
+                h.update(block)
+    h.update(' '.join(preprocessors).encode('utf-8'))
+    h.update(b'\0sklearn ' + sklearn.__version__.encode('utf-8'))
+    return h.hexdigest()
+#-----------------------------------
+
+def getTextHash(title, description):
+    h = hashlib.sha256(title.encode('utf-8'))
+    h.update(b'\0')
+    h.update(description.encode('utf-8'))
+    return h.hexdigest()
+#-----------------------------------
+
+class PredictionCache (object):
+    """
+    IS:   a sqlite file of predictions keyed by (ID, textHash, modelHash)
+    HAS:  sqlite connection
+    DOES: get(keys), put(rows), purge(modelHash), getCounts()
+    """
+    def __init__(self, fileName=DEFAULT_CACHE):
+        self.conn = sqlite3.connect(fileName)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS prediction (
+                                ID          TEXT NOT NULL,
+                                textHash    TEXT NOT NULL,
+                                modelHash   TEXT NOT NULL,
+                                predClass   TEXT NOT NULL,
+                                confidence  REAL NOT NULL,
+                                absValue    REAL NOT NULL,
+                                PRIMARY KEY (ID, textHash, modelHash)
+                                ) WITHOUT ROWID''')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+    #-----------------------------------
+
+    def get(self, modelHash, keys):
+        """ keys = list of (ID, textHash)
+            Return dict {(ID, textHash): (predClass, confidence, absValue)}
+            for the keys that are in the cache.
+        """
+        found = {}
+        cursor = self.conn.execute('SELECT ID, textHash, predClass, ' +
+                'confidence, absValue FROM prediction WHERE modelHash = ?',
+                (modelHash,))
+        wanted = set(keys)
+        for ID, textHash, predClass, confidence, absValue in cursor:
+            if (ID, textHash) in wanted:
+                found[(ID, textHash)] = (predClass, confidence, absValue)
+        return found
+
+    def put(self, modelHash, rows):
+        """ rows = list of (ID, textHash, predClass, confidence, absValue) """
+        self.conn.executemany('INSERT OR REPLACE INTO prediction ' +
+                '(ID, textHash, modelHash, predClass, confidence, absValue) ' +
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(r[0], r[1], modelHash) + tuple(r[2:]) for r in rows])
+        self.conn.commit()
+
+    def purge(self, modelHash):
+        """ Delete the rows of other models, return the number deleted """
+        n = self.conn.execute('DELETE FROM prediction WHERE modelHash != ?',
+                                                    (modelHash,)).rowcount
+        self.conn.commit()
+        self.conn.execute('VACUUM')
+        return n
+
+    def getCounts(self):
+        """ Return list of (modelHash, number of rows) """
+        return self.conn.execute('SELECT modelHash, count(*) FROM ' +
+                        'prediction GROUP BY modelHash ORDER BY 2 DESC').fetchall()
+# end class PredictionCache -----------------------------------
+
+def isClassified(sampleObjType):
+    return issubclass(sampleObjType, mlSampleLib.ClassifiedSample)
+
+def getPredsHeader(sampleObjType=mlSampleLib.ClassifiedHtSample):
+    """ Return the preds file header line. Unclassified samples have no
+        True Class and FP/FN columns, and no extraInfo.
+    """
+    if not isClassified(sampleObjType):
+        return '|'.join(['ID', 'Pred Class', 'Confidence', 'Abs Value']) +'\n'
+    return '|'.join(['ID', 'Pred Class', 'Confidence', 'Abs Value',
+                    'True Class', 'FP/FN'] +
+                    sampleObjType.getExtraInfoFieldNames()) + '\n'
+
+def getPredsLine(sample, predClass, confidence, absValue):
+    """ Return a preds file line for a (classified or unclassified) sample """
+    fields = [sample.getID(), predClass, '%5.3f' % confidence,
+                                                    '%5.3f' % absValue]
+    if not isClassified(type(sample)):
+        return '|'.join(fields) + '\n'
+    trueClass = sample.getKnownClassName()
+    sampleClassNames = sample.getClassNames()
+    isPredPos = predClass == sampleClassNames[sample.getY_positive()]
+    if predClass == trueClass:
+        fpfn = 'TP' if isPredPos else 'TN'
+    else:
+        fpfn = 'FP' if isPredPos else 'FN'
+    return '|'.join(fields + [trueClass, fpfn] + sample.getExtraInfo()) + '\n'
+#-----------------------------------
+
+def predictFile(sampleFile,     # unpreprocessed sample file
+                outFile,        # open file to write the preds to
+                modelFile=DEFAULT_MODEL,
+                cacheFile=DEFAULT_CACHE,
+                preprocessors=['standard'],
+    ):
+    """ Write the preds of the samples, scoring only the cache misses.
+        Return (number of samples, number of misses)
+    """
+    modelHash = getModelHash(modelFile, preprocessors)
+    cols = mlSampleLib.readSampleFile(sampleFile,
+                        getSampleObjType(sampleFile), columnar=True)
+    keys = [(ID, getTextHash(t, d)) for ID, t, d in \
+            zip(cols.getSampleIDs(), cols.getTitles(), cols.getDescriptions())]
+
+    cache = PredictionCache(cacheFile)
+    found = cache.get(modelHash, keys)
+    samples = cols.getSamples()
+    misses = [i for i, k in enumerate(keys) if k not in found]
+
+    if misses:
+        with open(modelFile, 'rb') as fp:
+            pipeline = pickle.load(fp)
+        pipeline.steps[-1][1].set_params(verbose=0)
+        docs = []
+        for i in misses:
+            for p in preprocessors:
+                getattr(samples[i], p)()
+            docs.append(samples[i].constructDoc())
+        probas = pipeline.predict_proba(docs)
+        classes = pipeline.steps[-1][1].classes_
+        rows = []
+        for i, proba in zip(misses, probas):
+            pred = getConfidence(proba, classes, cols.sampleObjType)
+            found[keys[i]] = pred
+            rows.append(keys[i] + pred)
+        cache.put(modelHash, rows)
+    cache.close()
+
+    outFile.write(getPredsHeader(cols.sampleObjType))
+    for sample, key in zip(samples, keys):
+        outFile.write(getPredsLine(sample, *found[key]))
+    return len(keys), len(misses)
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Predict a sample file using a persistent prediction ' +
+                    'cache, or manage the cache')
+
+    parser.add_argument('command', choices=['predict', 'purge', 'counts'],
+        help='predict: write preds file to stdout. ' +
+             'purge: delete predictions of other models. ' +
+             'counts: number of predictions per model')
+
+    parser.add_argument('sampleFile', nargs='?', default=None,
+        help='predict: unpreprocessed sample file')
+
+    parser.add_argument('-m', '--model', dest='modelFile',
+        default=DEFAULT_MODEL,
+        help='trained model pkl. Default: %s' % DEFAULT_MODEL)
+
+    parser.add_argument('-c', '--cache', dest='cacheFile',
+        default=DEFAULT_CACHE,
+        help='prediction cache file. Default: %s' % DEFAULT_CACHE)
+
+    parser.add_argument('-p', '--preprocessor', dest='preprocessors',
+        action='append', default=None,
+        help='preprocessor to run on each sample. Default: standard')
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    preprocessors = args.preprocessors or ['standard']
+    if args.command == 'predict':
+        if not args.sampleFile:
+            sys.stderr.write("predict needs a sampleFile\n")
+            exit(5)
+        startTime = time.time()
+        numSamples, numMisses = predictFile(args.sampleFile, sys.stdout,
+                        args.modelFile, args.cacheFile, preprocessors)
+        sys.stderr.write("%d samples, %d scored, %d from cache, " % \
+                    (numSamples, numMisses, numSamples - numMisses) +
+                    "%.2f seconds\n" % (time.time() - startTime))
+    elif args.command == 'purge':
+        cache = PredictionCache(args.cacheFile)
+        n = cache.purge(getModelHash(args.modelFile, preprocessors))
+        sys.stderr.write("%d predictions deleted\n" % n)
+    elif args.command == 'counts':
+        for modelHash, n in PredictionCache(args.cacheFile).getCounts():
+            print("%s %d" % (modelHash, n))
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           A long running prediction service for a trained gxdhtclassifier
+           model.
+
+           Running gxdhtclassifier.test.sh -> predict.py for each batch of
+           new experiments starts python, imports sklearn, unpickles the
+           model and compiles the htTextTransform mappings before it scores
+           anything. The server does all that once, then scores JSON-lines
+           requests as they arrive, one JSON object per line:
+                {"ID": "GSE12345", "title": "...", "description": "..."}
+           and replies with one JSON object per line (same order as the
+           requests on a connection):
+                {"ID": "GSE12345", "predClass": "Yes", "confidence": 0.861,
+                 "absValue": 0.861, "batchSize": 7,
+                 "queueMs": 1.2, "scoreMs": 35.0, "totalMs": 36.2}
+           or {"ID": ..., "error": "..."} for a bad request.
+           Confidence and Abs Value are the same as in predict.py preds
+           files: the probability of the predicted class, negative for "No".
+
+           A single scoring thread takes the requests that are waiting (from
+           any connection), up to --maxbatch, waiting at most --maxwait ms
+           for more to arrive, then preprocesses them and calls
+           predict_proba() once for the whole micro-batch.
+           Each connection (or stdin) has its own writer thread that waits
+           for its replies and writes them, so a slow or closed client never
+           holds up the scoring thread.
+
+           The request {"command": "stats"} replies with latency stats of the
+           requests scored so far.
+
+           Requests come from stdin (replies to stdout), or from a Unix
+           socket where each connection can send any number of requests.
+
+  If you run this module as a script:
+        htPredictServer.py serve  [--model model.pkl] [--socket path]
+                                  [-p preprocessor ...]
+        htPredictServer.py client --socket path [jsonLinesFile]
+'''
+import sys
+import os
+import time
+import json
+import queue
+import pickle
+import socket
+import argparse
+import threading
+import socketserver
+import collections
+from concurrent.futures import Future
+import numpy as np
+import htMLsample as mlSampleLib
+#-----------------------------------
+
+MAX_BATCH_SIZE   = 256      # max requests to score in one micro-batch
+MAX_WAIT_MS      = 5        # max ms to wait for more requests for a batch
+NUM_LATENCIES    = 10000    # number of recent request latencies to keep
+
+def getConfidence(proba,        # predict_proba() row
+                  classes,      # the classifier's classes_
+                  sampleObjType=mlSampleLib.ClassifiedHtSample,
+    ):
+    """ Return (predicted class name, confidence, abs value) as predict.py
+        writes them: confidence is the probability of the predicted class,
+        negative if it is not the positive class.
+    """
+    i = int(np.argmax(proba))
+    absValue = float(proba[i])
+    y = classes[i]
+    confidence = absValue if y == sampleObjType.y_positive else -absValue
+    return sampleObjType.sampleClassNames[y], confidence, absValue
+#-----------------------------------
+
+class PredictServer (object):
+    """
+    IS:   a trained model and preprocessors loaded once, scoring requests in
+            micro-batches on a scoring thread
+    HAS:  pipeline, preprocessor names, request queue, latency stats
+    DOES: submit(request) -> Future, serveStream(inFile, outFile),
+          serveSocket(path), getStats(), stop()
+    """
+    def __init__(self, pipeline,
+                preprocessors=['standard'],
+                maxBatchSize=MAX_BATCH_SIZE,
+                maxWaitMs=MAX_WAIT_MS,
+                ):
+        self.pipeline = pipeline
+        self.preprocessors = preprocessors
+        self.maxBatchSize = maxBatchSize
+        self.maxWait = maxWaitMs/1000.0
+        self.classes = pipeline.steps[-1][1].classes_
+
+        self.queue = queue.Queue()      # (request dict, Future, arrival time)
+        self.statsLock = threading.Lock()
+        self.latencies = collections.deque(maxlen=NUM_LATENCIES)
+        self.numRequests = 0
+        self.numBatches = 0
+        self.startTime = time.time()
+
+        # warm up, e.g., load the stemmer
+        self.pipeline.predict_proba([self._getDoc({'ID': 'warmup',
+                                'title': 'warm up', 'description': 'warm up'})])
+        self.thread = threading.Thread(target=self._batchLoop, daemon=True)
+        self.thread.start()
+    #-----------------------------------
+
+    def submit(self, request):
+        """ Queue a request dict, return a Future of its reply dict """
+        future = Future()
+        if request.get('command') == 'stats':
+            future.set_result(self.getStats())
+        else:
+            self.queue.put((request, future, time.time()))
+        return future
+
+    def stop(self):
+        """ Score the requests already queued, then stop the scoring thread
+        """
+        self.queue.put(None)
+        self.thread.join()
+    #-----------------------------------
+
+    def _batchLoop(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.time() + self.maxWait
+            while len(batch) < self.maxBatchSize:
+                try:
+                    item = self.queue.get(timeout=max(0,deadline-time.time()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._scoreBatch(batch)
+
+    def _getDoc(self, request):
+        sample = mlSampleLib.HtSample()
+        sample.setFields({'ID': str(request['ID']),
+                          'title': request.get('title') or '',
+                          'description': request.get('description') or ''})
+        for p in self.preprocessors:
+            getattr(sample, p)()
+        return sample.constructDoc()
+
+    def _scoreBatch(self, batch):
+        batchStart = time.time()
+        docs = []
+        scored = []                     # (request, future, arrival time)
+        for request, future, arrival in batch:
+            try:
+                docs.append(self._getDoc(request))
+                scored.append((request, future, arrival))
+            except Exception as e:
+                future.set_result({'ID': request.get('ID'),
+                                   'error': '%s: %s' % (type(e).__name__, e)})
+        if not docs:
+            return
+        try:
+            probas = self.pipeline.predict_proba(docs)
+        except Exception as e:
+            for request, future, arrival in scored:
+                future.set_exception(e)
+            return
+        end = time.time()
+
+        latencies = []
+        for (request, future, arrival), proba in zip(scored, probas):
+            predClass, confidence, absValue = getConfidence(proba,self.classes)
+            total = 1000*(end - arrival)
+            latencies.append(total)
+            future.set_result({'ID': request['ID'],
+                        'predClass': predClass,
+                        'confidence': round(confidence, 3),
+                        'absValue': round(absValue, 3),
+                        'batchSize': len(batch),
+                        'queueMs': round(1000*(batchStart - arrival), 3),
+                        'scoreMs': round(1000*(end - batchStart), 3),
+                        'totalMs': round(total, 3),
+                        })
+        with self.statsLock:
+            self.latencies.extend(latencies)
+            self.numRequests += len(scored)
+            self.numBatches += 1
+    #-----------------------------------
+
+    def getStats(self):
+        """ Return dict of request counts and latency percentiles """
+        with self.statsLock:
+            latencies = np.array(self.latencies)
+            stats = {'requests': self.numRequests,
+                     'batches': self.numBatches,
+                     'meanBatchSize': round(self.numRequests / \
+                                                max(1, self.numBatches), 2),
+                     'uptimeSeconds': round(time.time() - self.startTime, 1),
+                     }
+        if latencies.shape[0]:
+            for pct in [50, 90, 99]:
+                stats['p%dMs' % pct] = round(float(np.percentile(latencies,
+                                                                    pct)), 3)
+            stats['maxMs'] = round(float(latencies.max()), 3)
+        return stats
+    #-----------------------------------
+
+    def serveStream(self, inFile, outFile):
+        """ Score the JSON-lines requests in inFile, write replies to outFile
+            as they are scored. Return when inFile is exhausted and all
+            replies are written, or when outFile's reader has gone away.
+            Return True if all replies were written.
+            Replies are written, in request order, by a writer thread for
+            this stream, so the scoring thread never waits on outFile.
+        """
+        replies = queue.Queue()         # futures in request order, None=end
+        broken = threading.Event()      # outFile's reader has gone away
+
+        def writeReplies():
+            while True:
+                future = replies.get()
+                if future is None:
+                    break
+                if broken.is_set():     # just drain, the futures still finish
+                    continue
+                try:
+                    if not future.done():   # flush before waiting
+                        outFile.flush()
+                    if future.exception() is not None:
+                        reply = {'error': '%s: %s' % \
+                            (type(future.exception()).__name__,
+                                                        future.exception())}
+                    else:
+                        reply = future.result()
+                    outFile.write(json.dumps(reply) + '\n')
+                except (BrokenPipeError, ConnectionResetError):
+                    broken.set()
+            if not broken.is_set():
+                try:
+                    outFile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    broken.set()
+
+        writer = threading.Thread(target=writeReplies, daemon=True)
+        writer.start()
+        try:
+            for line in inFile:
+                if broken.is_set():
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict) or \
+                            ('ID' not in request and 'command' not in request):
+                        raise ValueError('request needs an ID')
+                    future = self.submit(request)
+                except ValueError as e:
+                    future = Future()
+                    future.set_result({'error': 'bad request: %s' % e})
+                replies.put(future)
+        finally:
+            replies.put(None)
+            writer.join()
+        return not broken.is_set()
+    #-----------------------------------
+
+    def serveSocket(self, socketPath):
+        """ Serve JSON-lines requests on a Unix socket until interrupted """
+        server = self
+
+        class Handler (socketserver.StreamRequestHandler):
+            def handle(self):
+                inFile = (line.decode('utf-8') for line in self.rfile)
+                outFile = TextSocketWriter(self.wfile)
+                try:
+                    server.serveStream(inFile, outFile)
+                except ConnectionResetError:    # while reading requests
+                    pass
+
+        if os.path.exists(socketPath):
+            os.unlink(socketPath)
+        with socketserver.ThreadingUnixStreamServer(socketPath,Handler) as s:
+            s.daemon_threads = True
+            try:
+                s.serve_forever()
+            finally:
+                os.unlink(socketPath)
+# end class PredictServer -----------------------------------
+
+class TextSocketWriter (object):
+    """ text write()/flush() on a socket binary file """
+    def __init__(self, wfile):
+        self.wfile = wfile
+    def write(self, text):
+        self.wfile.write(text.encode('utf-8'))
+    def flush(self):
+        self.wfile.flush()
+#-----------------------------------
+
+def requestPredictions(socketPath, requests):
+    """ Send request dicts to a server's Unix socket, return reply dicts """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socketPath)
+        text = ''.join([json.dumps(r) + '\n' for r in requests])
+        def send():
+            sock.sendall(text.encode('utf-8'))
+            sock.shutdown(socket.SHUT_WR)
+        sender = threading.Thread(target=send)
+        sender.start()          # send while reading, so neither side blocks
+        with sock.makefile('r', encoding='utf-8') as fp:
+            replies = [json.loads(line) for line in fp]
+        sender.join()
+        return replies
+#-----------------------------------
+
+def loadModel(modelFile):
+    with open(modelFile, 'rb') as fp:
+        pipeline = pickle.load(fp)
+    pipeline.steps[-1][1].set_params(verbose=0)
+    return pipeline
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Serve predictions of a trained model for JSON-lines ' +
+                    'requests on stdin or a Unix socket')
+
+    parser.add_argument('command', choices=['serve', 'client'],
+        help='serve: load the model and serve requests. ' +
+             'client: send JSON-lines requests to a server socket')
+
+    parser.add_argument('inputFile', nargs='?', default=None,
+        help='client: JSON-lines request file. Default: stdin')
+
+    parser.add_argument('-m', '--model', dest='modelFile',
+        default='gxdhtclassifier.pkl',
+        help='trained model pkl. Default: gxdhtclassifier.pkl')
+
+    parser.add_argument('-s', '--socket', dest='socketPath', default=None,
+        help='Unix socket path. Default for serve: stdin/stdout')
+
+    parser.add_argument('-p', '--preprocessor', dest='preprocessors',
+        action='append', default=None,
+        help='preprocessor to run on each request. Default: standard')
+
+    parser.add_argument('--maxbatch', dest='maxBatchSize', type=int,
+        default=MAX_BATCH_SIZE,
+        help='max requests per micro-batch. Default: %d' % MAX_BATCH_SIZE)
+
+    parser.add_argument('--maxwait', dest='maxWaitMs', type=float,
+        default=MAX_WAIT_MS,
+        help='max ms to wait for a micro-batch to fill. Default: %d' % \
+                                                                MAX_WAIT_MS)
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    if args.command == 'serve':
+        startTime = time.time()
+        server = PredictServer(loadModel(args.modelFile),
+                    args.preprocessors or ['standard'],
+                    args.maxBatchSize, args.maxWaitMs)
+        sys.stderr.write("loaded %s in %.2f seconds\n" % \
+                                    (args.modelFile, time.time() - startTime))
+        try:
+            if args.socketPath:
+                sys.stderr.write("serving on %s\n" % args.socketPath)
+                server.serveSocket(args.socketPath)
+            else:
+                server.serveStream(sys.stdin, sys.stdout)
+        except KeyboardInterrupt:
+            pass
+        server.stop()
+        sys.stderr.write("%s\n" % json.dumps(server.getStats()))
+    elif args.command == 'client':
+        if not args.socketPath:
+            sys.stderr.write("client needs --socket\n")
+            exit(5)
+        inFile = open(args.inputFile) if args.inputFile else sys.stdin
+        requests = [json.loads(line) for line in inFile if line.strip()]
+        for reply in requestPredictions(args.socketPath, requests):
+            print(json.dumps(reply))
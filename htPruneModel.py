@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Prune a trained gxdhtclassifier model to the features its forest
+           uses.
+
+           Many vocabulary entries are never used in a split by any tree
+           (the +0.0000 importances in the .features.txt files), yet at
+           predict time the vectorizer still looks up and stores every one of
+           them. And the vectorizer's stop_words_ attribute (every term
+           removed by min_df/max_df, only kept for introspection) is pickled
+           with the model.
+
+           pruneModel() returns a copy of the trained pipeline where:
+                the vectorizer vocabulary_ only has the terms used in at
+                    least one split, in the same (sorted) order, and
+                    stop_words_ is dropped
+                each tree's split feature indexes are remapped to the pruned
+                    vocabulary
+           Predictions are identical to the unpruned model.
+
+  If you run this module as a script, it prunes a model pkl, or measures pkl
+  size, load time and vectorization time of a model before and after pruning:
+        htPruneModel.py prune     model.pkl prunedModel.pkl
+        htPruneModel.py benchmark sampleFile [--model model.pkl]
+'''
+import sys
+import io
+import time
+import copy
+import pickle
+import argparse
+import numpy as np
+from sklearn.tree._tree import Tree
+from htFeatureSelection import foldFeatureSelector
+#-----------------------------------
+
+def getUsedFeatures(forest):
+    """ Return sorted array of the feature indexes used in any split """
+    used = [est.tree_.feature[est.tree_.feature >= 0] \
+                                            for est in forest.estimators_]
+    return np.unique(np.concatenate(used))
+#-----------------------------------
+
+def remapTree(tree,             # sklearn Tree
+              oldToNew,         # array, oldToNew[old feature] = new feature
+              numFeatures,      # number of features after pruning
+    ):
+    """ Return a copy of the tree w/ its split features remapped """
+    state = tree.__getstate__()
+    nodes = state['nodes'].copy()
+    isSplit = nodes['feature'] >= 0
+    nodes['feature'][isSplit] = oldToNew[nodes['feature'][isSplit]]
+    state['nodes'] = nodes
+    newTree = Tree(numFeatures, np.array(tree.n_classes), tree.n_outputs)
+    newTree.__setstate__(state)
+    return newTree
+#-----------------------------------
+
+def pruneModel(pipeline):
+    """
+    Return a pruned copy of a trained pipeline w/ a 'vectorizer' step and a
+        forest as its last step.
+    A BinaryFeatureSelector step is folded into the vocabulary first.
+    """
+    folded = foldFeatureSelector(pipeline)
+    pipeline = copy.deepcopy(pipeline) if folded is pipeline else folded
+    vectorizer = pipeline.named_steps['vectorizer']
+    forest = pipeline.steps[-1][1]
+
+    used = getUsedFeatures(forest)
+    numFeatures = len(used)
+    oldToNew = np.full(len(vectorizer.vocabulary_), -1, dtype=np.intp)
+    oldToNew[used] = np.arange(numFeatures)
+
+    vectorizer.vocabulary_ = { term: int(oldToNew[i]) \
+                for term, i in vectorizer.vocabulary_.items() if oldToNew[i] >=0}
+    if hasattr(vectorizer, 'stop_words_'):
+        del vectorizer.stop_words_
+
+    for est in forest.estimators_:
+        est.tree_ = remapTree(est.tree_, oldToNew, numFeatures)
+        est.n_features_in_ = numFeatures
+        est.max_features_ = min(est.max_features_, numFeatures)
+    forest.n_features_in_ = numFeatures
+    return pipeline
+#-----------------------------------
+
+def benchmark(sampleFile, modelFile=None, nTimes=5):
+    """ Measure pkl size, load time, vectorization time and predictions of a
+        model before and after pruning. Return report text.
+    """
+    import htMLsample
+    from sklearn.base import clone
+
+    sampleSet = htMLsample.readSampleFile(sampleFile, columnar=True)
+    docs = sampleSet.getDocuments()
+    if modelFile:
+        with open(modelFile, 'rb') as fp:
+            pipeline = pickle.load(fp)
+    else:
+        import gxdhtclassifier
+        pipeline = clone(gxdhtclassifier.pipeline)
+        pipeline.set_params(classifier__verbose=0, classifier__random_state=1)
+        pipeline.fit(docs, sampleSet.getKnownYvalues())
+    pipeline.steps[-1][1].set_params(verbose=0)
+    pruned = pruneModel(pipeline)
+
+    def bestTime(f):
+        times = []
+        for i in range(nTimes):
+            startTime = time.time()
+            f()
+            times.append(time.time() - startTime)
+        return min(times)
+
+    text = "%d documents, best of %d\n" % (len(docs), nTimes)
+    text += "%-9s %9s %10s %9s %14s\n" % ('model', 'features', 'pkl bytes',
+                                            'load ms', 'vectorize ms')
+    probas = []
+    for name, p in [('original', pipeline), ('pruned', pruned)]:
+        pkl = pickle.dumps(p)
+        loadTime = bestTime(lambda: pickle.load(io.BytesIO(pkl)))
+        vectorizer = p.named_steps['vectorizer']
+        vectorizeTime = bestTime(lambda: vectorizer.transform(docs))
+        probas.append(p.predict_proba(docs))
+        text += "%-9s %9d %10d %9.1f %14.1f\n" % (name,
+                        len(vectorizer.vocabulary_), len(pkl),
+                        1000*loadTime, 1000*vectorizeTime)
+    text += "identical predict_proba: %s\n" % np.array_equal(*probas)
+    return text
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Prune a trained model to the features its forest uses')
+
+    parser.add_argument('command', choices=['prune', 'benchmark'],
+        help='prune: model.pkl -> prunedModel.pkl. ' +
+             'benchmark: size, load and vectorization time before & after')
+
+    parser.add_argument('files', nargs='+',
+        help='prune: model.pkl prunedModel.pkl. benchmark: sampleFile')
+
+    parser.add_argument('--model', dest='modelFile', default=None,
+        help='benchmark: trained model pkl. Default: train ' +
+             'gxdhtclassifier.py on the sample file')
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    if args.command == 'prune':
+        with open(args.files[0], 'rb') as fp:
+            pipeline = pickle.load(fp)
+        pruned = pruneModel(pipeline)
+        with open(args.files[1], 'wb') as fp:
+            pickle.dump(pruned, fp)
+        sys.stderr.write("%d of %d features kept\n" % \
+                (len(pruned.named_steps['vectorizer'].vocabulary_),
+                 len(pipeline.named_steps['vectorizer'].vocabulary_)))
+    elif args.command == 'benchmark':
+        print(benchmark(args.files[0], args.modelFile))
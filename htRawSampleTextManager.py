@@ -48,22 +48,30 @@ class RawSampleTextManager (object):
     """
     def __init__(self,
                 db,       # initialized db module
-                expTbl='gxd_htexperiment'):
+                expTbl='gxd_htexperiment',
+                expKeys=None):
         """
             expTblName is a database table with '_experiment_key' field that
                 contains the experiments you want the raw sample text for.
                 Default is 'gxd_htexperiment' - meaning all experiments.
                 But if you pass in the name of a populated temp table,
                 you can get raw sample text for just those experiments.
+            expKeys is a list of _experiment_keys. If given, get the raw
+                sample text for just those experiments (e.g., a chunk of
+                the experiments in a tmp table), w/o building a tmp table.
         """
         self.db = db
         self.expTbl = expTbl
-        self.rawSampleTmpTbl = 'tmp_%s_rawsample_text' % expTbl
         self.experimentDict = {}        # experimentDict[exp_key] is a
                                         #   set of (field,value) pairs
                                         #   from the samples of that experiment
-        self._buildRawSampleTmpTbl()
-        self._buildExperimentDict()
+        if expKeys is None:
+            self.rawSampleTmpTbl = 'tmp_%s_rawsample_text' % expTbl
+            self._buildRawSampleTmpTbl()
+            self._buildExperimentDict()
+        else:
+            self.rawSampleTmpTbl = None
+            self._buildExperimentDict(self._getExpKeysQuery(expKeys))
     #-----------------------------------
 
     def _buildRawSampleTmpTbl(self):
@@ -92,11 +100,31 @@ class RawSampleTextManager (object):
         verbose("%8.3f seconds\n\n" %  (time.time()-startTime))
     #-----------------------------------
 
-    def _buildExperimentDict(self):
-        startTime = time.time()
-        verbose("Getting raw sample text from %s ..." % self.rawSampleTmpTbl)
+    def _getExpKeysQuery(self, expKeys):
+        """ Return sql for the "key:value" pairs of the expKeys experiments
+        """
+        if not expKeys:
+            return None
+        return """
+            select distinct rs._experiment_key, kv.key, kv.value
+            from GXD_HTRawSample rs
+                join MGI_KeyValue kv on
+                    (rs._rawsample_key = kv._object_key and _mgitype_key = 47)
+            where rs._experiment_key in (%s)
+            """ % ','.join([str(k) for k in expKeys])
+    #-----------------------------------
 
-        q = "select * from %s" % self.rawSampleTmpTbl
+    def _buildExperimentDict(self, q=None):
+        """ q: sql for the "key:value" pairs. Default: the raw sample tmp
+            table. If q is None and there is no tmp table, there are none.
+        """
+        if q is None and self.rawSampleTmpTbl is None:
+            return
+        startTime = time.time()
+        verbose("Getting raw sample text from %s ..." % \
+                                        (self.rawSampleTmpTbl or 'expKeys'))
+        if q is None:
+            q = "select * from %s" % self.rawSampleTmpTbl
         results = self.db.sql(q, 'auto')
         for i,r in enumerate(results):
             try:
@@ -129,6 +157,8 @@ class RawSampleTextManager (object):
     def getNumFieldValuePairs(self):
         """ Return the number of distinct field-value pairs
         """
+        if self.rawSampleTmpTbl is None:    # only expKeys were fetched
+            return sum([len(pairs) for pairs in self.experimentDict.values()])
         q = """select count(*) as num from %s
             """ % (self.rawSampleTmpTbl)
         num = self.db.sql(q, 'auto')[0]['num']
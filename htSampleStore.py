@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           A columnar, memory-mapped file format for HtSample sets
+           (a "sample store"), an alternative to the delimited text
+           sample files.
+
+           Each field of the samples is stored as one contiguous utf-8 blob
+           plus an array of offsets into the blob. So you can read one field
+           (e.g., the knownClassNames) or one sample without reading or
+           parsing the rest of the file.
+           An index of the rows sorted by ID lets you look up a sample by its
+           GEO/ArrayExpress ID.
+
+           Built on htArrayFile. Arrays in the file:
+                <fieldName>.blob        uint8   field values, utf-8, concatenated
+                <fieldName>.offsets     uint64  value i is blob[off[i]:off[i+1]]
+                ID.sortedRows           uint32  row numbers in ID order
+           Meta:
+                sampleObjType, fieldNames, numSamples,
+                sampleSetMeta - #meta items from the text sample file
+
+  If you run this module as a script, it converts between text sample files
+  and sample stores, and gives quick access to stores:
+        htSampleStore.py tostore sampleFile storeFile
+        htSampleStore.py totext  storeFile  [sampleFile]   (default stdout)
+        htSampleStore.py get     storeFile  ID [ID ...]
+        htSampleStore.py counts  storeFile
+'''
+import sys
+import argparse
+import numpy as np
+import htMLsample as mlSampleLib
+from htArrayFile import writeArrayFile, ArrayFile
+#-----------------------------------
+
+def writeSampleStore(sampleColumns,     # htMLsample.SampleColumns
+                     fileName,
+    ):
+    """ Write the sample columns as a sample store file
+    """
+    sampleObjType = sampleColumns.sampleObjType
+    fieldNames = sampleObjType.getFieldNames()
+    arrays = {}
+    for fn in fieldNames:
+        encoded = [v.encode('utf-8') for v in sampleColumns.getColumn(fn)]
+        offsets = np.zeros(len(encoded)+1, dtype=np.uint64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        arrays[fn + '.blob'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        arrays[fn + '.offsets'] = offsets
+
+    ids = sampleColumns.getSampleIDs()
+    arrays['ID.sortedRows'] = np.array(sorted(range(len(ids)),
+                                key=lambda i: ids[i]), dtype=np.uint32)
+    meta = {'sampleObjType': sampleObjType.__name__,
+            'fieldNames'   : list(fieldNames),
+            'numSamples'   : len(ids),
+            'sampleSetMeta': sampleColumns.meta,
+            }
+    writeArrayFile(fileName, arrays, meta)
+#-----------------------------------
+
+class SampleStore (object):
+    """
+    IS:   a memory-mapped sample store file
+    HAS:  sampleObjType, fieldNames, numSamples
+    DOES: getValue(fieldName, row)  - one field value
+          getColumn(fieldName)      - list of values of one field
+          getRowByID(ID)            - row number of a sample ID, or None
+          getSample(row)            - a sampleObjType object for a row
+          getSampleByID(ID)
+          getSampleColumns()        - all of it as an htMLsample.SampleColumns
+    """
+    def __init__(self, fileName):
+        self.arrayFile = ArrayFile(fileName)
+        meta = self.arrayFile.getMeta()
+        self.sampleObjType = getattr(mlSampleLib, meta['sampleObjType'])
+        self.fieldNames = meta['fieldNames']
+        self.numSamples = meta['numSamples']
+        self.sampleSetMeta = meta['sampleSetMeta']
+        self.blobs = {}             # blobs[fieldName] = blob array
+        self.offsets = {}           # offsets[fieldName] = offsets array
+        for fn in self.fieldNames:
+            self.blobs[fn] = self.arrayFile.getArray(fn + '.blob')
+            self.offsets[fn] = self.arrayFile.getArray(fn + '.offsets')
+        self.sortedRows = self.arrayFile.getArray('ID.sortedRows')
+    #-----------------------------------
+
+    def getNumSamples(self): return self.numSamples
+    def getFieldNames(self): return self.fieldNames
+
+    def getValue(self, fieldName, row):
+        off = self.offsets[fieldName]
+        return self.blobs[fieldName][off[row]:off[row+1]].tobytes() \
+                                                            .decode('utf-8')
+
+    def getColumn(self, fieldName):
+        text = self.blobs[fieldName].tobytes()
+        off = self.offsets[fieldName].tolist()
+        return [text[off[i]:off[i+1]].decode('utf-8') \
+                                            for i in range(self.numSamples)]
+    #-----------------------------------
+
+    def getRowByID(self, ID):
+        """ Binary search the ID index. Return the row number or None.
+        """
+        lo, hi = 0, self.numSamples
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.getValue('ID', self.sortedRows[mid]) < ID:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.numSamples:
+            row = int(self.sortedRows[lo])
+            if self.getValue('ID', row) == ID:
+                return row
+        return None
+    #-----------------------------------
+
+    def getSample(self, row):
+        values = { fn: self.getValue(fn, row) for fn in self.fieldNames }
+        return self.sampleObjType().setFields(values)
+
+    def getSampleByID(self, ID):
+        row = self.getRowByID(ID)
+        if row is None:
+            return None
+        return self.getSample(row)
+
+    def getSampleColumns(self):
+        columns = [self.getColumn(fn) for fn in self.fieldNames]
+        return mlSampleLib.SampleColumns(self.sampleObjType, columns,
+                                                        self.sampleSetMeta)
+    #-----------------------------------
+
+    def close(self):
+        self.blobs = {}             # drop our views on the mapped file first
+        self.offsets = {}
+        self.sortedRows = None
+        self.arrayFile.close()
+# end class SampleStore -----------------------------------
+
+def sampleFileToStore(sampleFile, storeFile, sampleObjType=None):
+    """ Convert text sample file to a sample store.
+        sampleObjType defaults to the one named in the file's #meta line
+    """
+    if sampleObjType is None:
+        sampleObjType = getSampleObjType(sampleFile)
+    cols = mlSampleLib.readSampleFile(sampleFile, sampleObjType=sampleObjType,
+                                                            columnar=True)
+    writeSampleStore(cols, storeFile)
+    return cols.getNumSamples()
+#-----------------------------------
+
+def storeToSampleFile(storeFile, outFile):
+    """ Convert sample store to a text sample file.
+        outFile is a filename or open file
+    """
+    if type(outFile) == type(''):
+        with open(outFile, 'w') as fp:
+            return storeToSampleFile(storeFile, fp)
+
+    store = SampleStore(storeFile)
+    sampleObjType = store.sampleObjType
+    fieldSep  = sampleObjType.getFieldSep()
+    recordEnd = sampleObjType.getRecordEnd()
+
+    outFile.write('#meta  ' + ' '.join(['%s=%s' % (k,v) \
+                        for k,v in store.sampleSetMeta.items()]) + '\n')
+    outFile.write(fieldSep.join(store.fieldNames) + recordEnd)
+    columns = [store.getColumn(fn) for fn in store.fieldNames]
+    for values in zip(*columns):
+        outFile.write(fieldSep.join(values) + recordEnd)
+    outFile.flush()
+    numSamples = store.getNumSamples()
+    store.close()
+    return numSamples
+#-----------------------------------
+
+def getSampleObjType(sampleFile):
+    """ Return the Sample class named in the #meta line of the sample file.
+        Default to ClassifiedHtSample.
+    """
+    with open(sampleFile, 'r') as fp:
+        line = fp.readline()
+    for item in line.split()[1:]:
+        k, v = item.split('=', 1)
+        if k == 'sampleObjType':
+            return getattr(mlSampleLib, v)
+    return mlSampleLib.ClassifiedHtSample
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Convert between sample files and sample store files, ' +
+                    'and read sample stores')
+
+    parser.add_argument('command', choices=['tostore','totext','get','counts'],
+        help='tostore: sampleFile -> storeFile, totext: storeFile -> ' +
+             'sampleFile, get: write samples with IDs to stdout, ' +
+             'counts: count of samples in each class')
+
+    parser.add_argument('files', nargs='+',
+        help='input file, then output file or IDs depending on the command')
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+
+    if args.command == 'tostore':
+        n = sampleFileToStore(args.files[0], args.files[1])
+        sys.stderr.write("wrote %d samples to '%s'\n" % (n, args.files[1]))
+
+    elif args.command == 'totext':
+        outFile = args.files[1] if len(args.files) > 1 else sys.stdout
+        storeToSampleFile(args.files[0], outFile)
+
+    elif args.command == 'get':
+        store = SampleStore(args.files[0])
+        fieldSep = store.sampleObjType.getFieldSep()
+        for ID in args.files[1:]:
+            row = store.getRowByID(ID)
+            if row is None:
+                sys.stderr.write("%s not found\n" % ID)
+            else:
+                print(fieldSep.join([store.getValue(fn, row) \
+                                            for fn in store.fieldNames]))
+
+    elif args.command == 'counts':
+        store = SampleStore(args.files[0])
+        if 'knownClassName' not in store.getFieldNames():
+            sys.stderr.write("'%s' has no knownClassName field\n" % \
+                                                                args.files[0])
+            exit(5)
+        classNames = store.getColumn('knownClassName')
+        for c in sorted(set(classNames)):
+            print("%7d %s" % (classNames.count(c), c))
+        print("%7d total" % store.getNumSamples())
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           A NumPy only runtime for scoring with an exported gxdhtclassifier
+           model, for fast cold starts.
+
+           A cron job that classifies a handful of new experiments spends
+           most of its time importing sklearn and scipy and unpickling the
+           Pipeline. The "export" command writes a trained model pkl to a
+           model artifact file (see htModelArtifact.py): the vocabulary,
+           stop words and ngram settings, and the forest node arrays in one
+           self-describing, memory-mapped htArrayFile.
+
+           ScoringRuntime loads an artifact and scores (preprocessed)
+           documents importing only numpy, htArrayFile and htCompiledForest:
+                tokenize like CountVectorizer (lowercase, token_pattern, stop
+                    words, ngrams)
+                look up all the ngrams of a batch w/ one np.searchsorted() on
+                    the sorted vocabulary terms
+                set the features in a dense uint8 batch (float32 counts
+                    for a non-binary vectorizer)
+                CompiledForest.predict_proba()
+           Probabilities are identical to the sklearn pipeline's.
+           If the model has a SamplePreprocessor step, the documents are
+           preprocessed w/ htMLsample.preprocessDocs() (not htPipelineSteps,
+           which imports sklearn). But the "standard" preprocessor's stemmer
+           imports nltk, and nltk's package init loads scipy and sklearn
+           when they are installed. For fast cold starts, export models w/o
+           a preprocessor step and score preprocessed documents.
+
+  If you run this module as a script:
+        htScoringRuntime.py export    model.pkl artifactFile
+        htScoringRuntime.py score     artifactFile sampleFile
+                (preprocessed sample file -> ID|Pred Class|Confidence|
+                                                Abs Value to stdout)
+        htScoringRuntime.py coldstart artifactFile sampleFile
+                                                [--model model.pkl]
+                (time from process start to first prediction, artifact vs.
+                 pkl)
+'''
+import sys
+import re
+import time
+import numpy as np
+from htArrayFile import ArrayFile
+from htCompiledForest import CompiledForest
+#-----------------------------------
+
+FOREST_PREFIX = 'forest.'
+BATCH_SIZE = 4096           # documents per dense feature batch
+
+class ScoringRuntime (object):
+    """
+    IS:   a trained model scored from a (memory-mapped) model artifact
+    HAS:  vocabulary terms and feature indexes, CompiledForest, tokenizer
+            settings, class names
+    DOES: getFeatureIds(docs), getDenseFeatures(docs),
+          predict_proba(docs), predict(docs), getConfidences(docs)
+    """
+    def __init__(self, arrays, meta):
+        self.terms = arrays['vocab.terms']
+        self.termIndex = arrays['vocab.index']
+        forestArrays = {name[len(FOREST_PREFIX):]: a \
+                for name, a in arrays.items() if name.startswith(FOREST_PREFIX)}
+        self.forest = CompiledForest(forestArrays, meta['forest'])
+        self.classes_ = self.forest.classes_
+
+        vmeta = meta['vectorizer']
+        self.lowercase  = vmeta['lowercase']
+        self.tokenRe    = re.compile(vmeta['tokenPattern'])
+        self.stopWords  = frozenset(vmeta['stopWords'])
+        self.minN, self.maxN = vmeta['ngramRange']
+        self.binary     = vmeta['binary']
+        self.numFeatures = vmeta['numFeatures']
+        self.preprocessors = meta.get('preprocessors', [])
+        self.classNames = meta.get('classNames', ['No', 'Yes'])
+        self.yPositive  = meta.get('yPositive', 1)
+    #-----------------------------------
+
+    @classmethod
+    def load(cls, fileName):
+        """ Return the model memory-mapped from the artifact file """
+        arrayFile = ArrayFile(fileName)
+        arrays = {name: arrayFile.getArray(name) \
+                                    for name in arrayFile.getArrayNames()}
+        return cls(arrays, arrayFile.getMeta())
+    #-----------------------------------
+
+    def getTerms(self, doc):
+        """ Return list of the doc's ngrams, as CountVectorizer builds them """
+        if self.lowercase:
+            doc = doc.lower()
+        tokens = [t for t in self.tokenRe.findall(doc) \
+                                                if t not in self.stopWords]
+        grams = tokens if self.minN == 1 else []
+        for n in range(max(2, self.minN), self.maxN +1):
+            grams += [' '.join(tokens[i:i+n]) \
+                                    for i in range(len(tokens) - n +1)]
+        return grams
+
+    def getFeatureIds(self, docs):
+        """ Return (rows, featureIds) arrays, one entry per ngram occurrence
+            in the docs that is in the vocabulary
+        """
+        if self.preprocessors:
+            from htMLsample import preprocessDocs
+            docs = preprocessDocs(docs, self.preprocessors)
+        grams = []
+        counts = []
+        for doc in docs:
+            terms = self.getTerms(doc)
+            grams += terms
+            counts.append(len(terms))
+        rows = np.repeat(np.arange(len(counts)), counts)
+        if not grams:
+            return rows, rows.copy()
+
+        # look all the grams up at once in the sorted terms
+        encoded = np.array([g.encode('utf-8') for g in grams])
+        pos = np.minimum(np.searchsorted(self.terms, encoded),
+                                                    self.terms.shape[0] -1)
+        found = self.terms[pos] == encoded
+        return rows[found], self.termIndex[pos[found]]
+
+    def getDenseFeatures(self, docs):
+        """ Return dense feature matrix of the docs: uint8 0/1 for a binary
+            vectorizer, float32 counts (as sklearn compares them) if not
+        """
+        rows, featureIds = self.getFeatureIds(docs)
+        if self.binary:
+            X = np.zeros((len(docs), self.numFeatures), dtype=np.uint8)
+            X[rows, featureIds] = 1
+        else:
+            X = np.zeros((len(docs), self.numFeatures), dtype=np.float32)
+            np.add.at(X, (rows, featureIds), 1)
+        return X
+    #-----------------------------------
+
+    def predict_proba(self, docs):
+        docs = list(docs)
+        batches = [self.forest.predict_proba(self.getDenseFeatures(
+                                                    docs[i:i+BATCH_SIZE])) \
+                    for i in range(0, len(docs), BATCH_SIZE)]
+        if not batches:
+            return np.zeros((0, len(self.classes_)), dtype=np.float64)
+        return np.vstack(batches)
+
+    def predict(self, docs):
+        return self.classes_.take(np.argmax(self.predict_proba(docs), axis=1))
+
+    def getConfidences(self, docs):
+        """ Return list of (predicted class name, confidence, abs value) as
+            predict.py writes them in preds files
+        """
+        results = []
+        for proba in self.predict_proba(docs):
+            i = int(np.argmax(proba))
+            y = self.classes_[i]
+            absValue = float(proba[i])
+            results.append((self.classNames[y],
+                        absValue if y == self.yPositive else -absValue,
+                        absValue))
+        return results
+# end class ScoringRuntime -----------------------------------
+
+def readDocuments(sampleFile):
+    """ Return (IDs, documents) of a sample file, w/o importing htMLsample.
+        Records end in '\n', fields are '|' separated, the header line names
+        the fields. Document = title + '\n' + description.
+    """
+    with open(sampleFile, 'r') as fp:
+        lines = fp.read().split('\n')
+    if lines and lines[0].startswith('#meta'):
+        lines.pop(0)
+    fieldNames = lines.pop(0).split('|')
+    iID, iTitle, iDesc = [fieldNames.index(fn) \
+                                    for fn in ('ID', 'title', 'description')]
+    ids = []
+    docs = []
+    for line in lines:
+        if line:
+            fields = line.split('|')
+            ids.append(fields[iID])
+            docs.append(fields[iTitle] + '\n' + fields[iDesc])
+    return ids, docs
+#-----------------------------------
+
+COLD_PKL = '''
+import pickle, sys
+sys.path[:0] = %r
+with open(%r, 'rb') as fp:
+    pipeline = pickle.load(fp)
+pipeline.steps[-1][1].set_params(verbose=0, n_jobs=1)
+from htScoringRuntime import readDocuments
+ids, docs = readDocuments(%r)
+pipeline.predict_proba(docs[:5])
+'''
+COLD_ARTIFACT = '''
+import sys
+sys.path[:0] = %r
+from htScoringRuntime import ScoringRuntime, readDocuments
+model = ScoringRuntime.load(%r)
+ids, docs = readDocuments(%r)
+model.predict_proba(docs[:5])
+print(' '.join(sorted(set(m.split('.')[0] for m in sys.modules))))
+'''
+
+def coldStart(artifactFile, sampleFile, modelFile, nTimes=5):
+    """ Time fresh python processes from start to the first prediction of
+        5 documents, pkl vs. artifact. Return report text.
+    """
+    import subprocess
+    text = "time from process start to first prediction, best of %d\n" % \
+                                                                    nTimes
+    for name, script, fileName in [('pkl', COLD_PKL, modelFile),
+                                ('artifact', COLD_ARTIFACT, artifactFile)]:
+        if not fileName:
+            continue
+        code = script % (sys.path, fileName, sampleFile)
+        times = []
+        for i in range(nTimes):
+            startTime = time.time()
+            p = subprocess.run([sys.executable, '-c', code], check=True,
+                                capture_output=True, text=True)
+            times.append(time.time() - startTime)
+        text += "%-9s %8.3f seconds\n" % (name, min(times))
+        if name == 'artifact':
+            modules = set(p.stdout.split())
+            text += "artifact runtime imported sklearn: %s, scipy: %s\n" % \
+                            ('sklearn' in modules, 'scipy' in modules)
+    return text
+#-----------------------------------
+
+def getArgs():
+    import argparse
+
+    parser = argparse.ArgumentParser( \
+        description='Export a trained model to a model artifact, score with ' +
+                    'it, or time cold starts')
+
+    parser.add_argument('command', choices=['export', 'score', 'coldstart'],
+        help='export: model.pkl -> artifactFile. ' +
+             'score: artifactFile sampleFile -> preds to stdout. ' +
+             'coldstart: artifactFile sampleFile, time to first prediction')
+
+    parser.add_argument('files', nargs=2,
+        help='export: model.pkl artifactFile. ' +
+             'score and coldstart: artifactFile sampleFile')
+
+    parser.add_argument('--model', dest='modelFile', default=None,
+        help='coldstart: also time loading this model pkl')
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    if args.command == 'export':
+        import pickle
+        from htModelArtifact import writeModelArtifact
+        with open(args.files[0], 'rb') as fp:
+            pipeline = pickle.load(fp)
+        writeModelArtifact(pipeline, args.files[1])
+    elif args.command == 'score':
+        model = ScoringRuntime.load(args.files[0])
+        ids, docs = readDocuments(args.files[1])
+        sys.stdout.write('ID|Pred Class|Confidence|Abs Value\n')
+        for ID, (predClass, confidence, absValue) in zip(ids,
+                                                model.getConfidences(docs)):
+            sys.stdout.write('%s|%s|%5.3f|%5.3f\n' % \
+                                    (ID, predClass, confidence, absValue))
+    elif args.command == 'coldstart':
+        print(coldStart(args.files[0], args.files[1], args.modelFile))
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Helpers for ModelDev tuning scripts (RF.py, GB.py, ...) that run
+           textTuningLib.TextPipelineTuningHelper grid searches.
+
+           memoizePipeline() - when the grid search parameters for the
+                vectorizer (or any transformer step) vary less than the
+                parameters after it, the step is still refit for every CV
+                fold of every grid point. This turns on Pipeline step
+                memoization so each fold's transformed matrix is computed
+                once per distinct combination of the step's (and upstream
+                steps') params and shared by the grid points.
+
+           setSearchMode() - if tuning.cfg says SEARCH_MODE: halving or
+                halvingrandom, make the tuning helper run a successive
+                halving search (sklearn HalvingGridSearchCV or
+                HalvingRandomSearchCV) instead of GridSearchCV.
+                All candidates get a small budget (HALVING_RESOURCE, e.g.,
+                classifier__n_estimators, or n_samples) first, and only the
+                best 1/HALVING_FACTOR are promoted to the next, bigger budget.
+                The scorer (GRIDSEARCH_BETA F-score), cv_results_,
+                best_params_, and so the reports and index.out are the same
+                as for a grid search.
+
+  If you run this module as a script, it times a grid search on a sample
+  file with and without memoization, or compares the baseline grid search
+  to a grid search and a halving search over a bigger grid:
+        htTuningLib.py benchmark sampleFile [--model RF|GB] [--jobs n]
+        htTuningLib.py halving   sampleFile [--jobs n]
+'''
+import sys
+import os
+import time
+import atexit
+import shutil
+import tempfile
+import argparse
+import configparser
+from joblib import Memory
+#-----------------------------------
+
+PIPELINE_CACHE_ENV = 'GXDHT_PIPELINE_CACHE'  # env var w/ memoization dir
+
+def getStepParams(parameters,   # grid search parameters dict
+                  stepName,     # Pipeline step name, e.g., 'vectorizer'
+    ):
+    """ Return dict {param: list of values} of the grid params for the step
+    """
+    prefix = stepName + '__'
+    return { k: v for k, v in parameters.items() if k.startswith(prefix) }
+#-----------------------------------
+
+def getNumCombinations(parameters):
+    n = 1
+    for values in parameters.values():
+        n *= len(values)
+    return n
+#-----------------------------------
+
+def getTransformerStepNames(pipeline):
+    """ Return the names of all the steps before the final estimator """
+    return [name for name, step in pipeline.steps[:-1]]
+#-----------------------------------
+
+def getNumTransformerFits(pipeline, parameters):
+    """
+    Return (n, m) where, for each CV fold,
+        n is the number of transformer step fits without memoization
+            (every transformer step is fit for every grid point)
+        m is the number with memoization
+            (a step is fit once per distinct combination of its own params
+            and the params of the steps before it, since those determine
+            its input)
+    """
+    stepNames = getTransformerStepNames(pipeline)
+    n = getNumCombinations(parameters) * len(stepNames)
+    m = 0
+    upstreamParams = {}
+    for name in stepNames:
+        upstreamParams.update(getStepParams(parameters, name))
+        m += getNumCombinations(upstreamParams)
+    return n, m
+#-----------------------------------
+
+def memoizePipeline(pipeline,
+                    parameters,     # grid search parameters
+                    cacheDir=None,  # None: $GXDHT_PIPELINE_CACHE or tmp dir
+                    verbose=True,
+    ):
+    """
+    If memoizing the pipeline's transformer steps saves any fits, set the
+        pipeline's memory so each transformer step is fit once per distinct
+        (step and upstream step params, training fold) and shared across
+        grid points.
+    Return the pipeline.
+    A temporary cacheDir is removed when the process exits.
+    """
+    n, m = getNumTransformerFits(pipeline, parameters)
+    if m >= n:
+        if verbose:
+            sys.stderr.write("Pipeline memoization: no repeated " +
+                            "transformer fits, not memoizing\n")
+        return pipeline
+
+    if cacheDir is None:
+        cacheDir = os.environ.get(PIPELINE_CACHE_ENV)
+    if cacheDir is None:
+        cacheDir = tempfile.mkdtemp(prefix='htPipelineCache')
+        atexit.register(shutil.rmtree, cacheDir, ignore_errors=True)
+
+    pipeline.set_params(memory=Memory(cacheDir, verbose=0))
+    if verbose:
+        sys.stderr.write("Pipeline memoization in '%s': " % cacheDir +
+            "%d transformer fits per fold instead of %d\n" % (m, n))
+    return pipeline
+#-----------------------------------
+
+SEARCH_MODES = ['grid', 'halving', 'halvingrandom']
+
+def getSearchConfig(configFile='tuning.cfg'):
+    """
+    Return dict of the search mode params from the [MODEL_TUNING] section
+        of the config file, w/ defaults for any that are missing.
+    """
+    cp = configparser.ConfigParser()
+    cp.optionxform = str            # keep case of param names
+    cp.read(configFile)
+    get = lambda name, default: cp.get('MODEL_TUNING', name, fallback=default)
+
+    config = {
+        'SEARCH_MODE'          : get('SEARCH_MODE', 'grid'),
+        'HALVING_RESOURCE'     : get('HALVING_RESOURCE',
+                                                'classifier__n_estimators'),
+        'HALVING_FACTOR'       : int(get('HALVING_FACTOR', '3')),
+        'HALVING_MIN_RESOURCES': get('HALVING_MIN_RESOURCES', 'exhaust'),
+        'HALVING_MAX_RESOURCES': get('HALVING_MAX_RESOURCES', 'auto'),
+        'HALVING_CANDIDATES'   : get('HALVING_CANDIDATES', 'exhaust'),
+        'HALVING_ROUNDS'       : get('HALVING_ROUNDS', 'auto'),
+        }
+    if config['SEARCH_MODE'] not in SEARCH_MODES:
+        raise ValueError("%s: SEARCH_MODE '%s' is not one of %s" % \
+                            (configFile, config['SEARCH_MODE'], SEARCH_MODES))
+    for name in ['HALVING_MIN_RESOURCES', 'HALVING_MAX_RESOURCES',
+                                    'HALVING_CANDIDATES', 'HALVING_ROUNDS']:
+        if config[name].isdigit():
+            config[name] = int(config[name])
+    return config
+#-----------------------------------
+
+def getHalvingGrid(config,          # dict from getSearchConfig()
+                   parameters,      # grid search parameters
+    ):
+    """
+    Return (copy of parameters w/o the resource, max resources).
+    If the resource is an estimator param, the halving search sets it, so
+        it is left out of the grid. Its max in the grid is the max resource
+        unless HALVING_MAX_RESOURCES is set.
+    """
+    resource     = config['HALVING_RESOURCE']
+    maxResources = config['HALVING_MAX_RESOURCES']
+    if resource == 'n_samples':
+        return dict(parameters), maxResources
+
+    grid = { k: v for k, v in parameters.items() if k != resource }
+    if maxResources == 'auto':
+        if resource not in parameters:
+            raise ValueError("HALVING_MAX_RESOURCES must be set, " +
+                            "'%s' is not in the parameters" % resource)
+        maxResources = max(parameters[resource])
+    return grid, maxResources
+#-----------------------------------
+
+def getRoundsMinResources(maxResources, factor, rounds):
+    """ Return the min resources so a halving search w/ enough candidates
+        runs the given number of rounds, the last one on maxResources
+    """
+    return max(1, maxResources // factor**(rounds -1))
+#-----------------------------------
+
+def getHalvingSearch(config,        # dict from getSearchConfig()
+                     randomSeed=None,
+    ):
+    """
+    Return a function w/ the GridSearchCV(estimator, param_grid, ...)
+        signature that builds a halving search as specified by config.
+    The param_grid passed to the function is not modified.
+    If HALVING_ROUNDS is a number, min_resources is set from the max
+        resources when the search is fit (for n_samples, the number of
+        training samples), overriding HALVING_MIN_RESOURCES.
+    """
+    from sklearn.experimental import enable_halving_search_cv
+    from sklearn.model_selection import HalvingGridSearchCV, \
+                                        HalvingRandomSearchCV
+    rounds = config['HALVING_ROUNDS']
+
+    def setMinResources(search, X):
+        if rounds != 'auto':
+            maxResources = search.max_resources
+            if maxResources == 'auto':          # n_samples
+                maxResources = len(X)
+            search.min_resources = getRoundsMinResources(maxResources,
+                                                        search.factor, rounds)
+
+    class RoundsHalvingGridSearchCV (HalvingGridSearchCV):
+        def fit(self, X, y=None, **fitParams):
+            setMinResources(self, X)
+            return super().fit(X, y, **fitParams)
+
+    class RoundsHalvingRandomSearchCV (HalvingRandomSearchCV):
+        def fit(self, X, y=None, **fitParams):
+            setMinResources(self, X)
+            return super().fit(X, y, **fitParams)
+
+    def halvingSearch(estimator, param_grid, **kwargs):
+        grid, maxResources = getHalvingGrid(config, param_grid)
+        kwargs.update(factor=config['HALVING_FACTOR'],
+                    resource=config['HALVING_RESOURCE'],
+                    min_resources=config['HALVING_MIN_RESOURCES'],
+                    max_resources=maxResources, random_state=randomSeed)
+        if config['SEARCH_MODE'] == 'halvingrandom':
+            return RoundsHalvingRandomSearchCV(estimator, grid,
+                            n_candidates=config['HALVING_CANDIDATES'], **kwargs)
+        return RoundsHalvingGridSearchCV(estimator, grid, **kwargs)
+    return halvingSearch
+#-----------------------------------
+
+def setSearchMode(tuningLib,        # textTuningLib module
+                  parameters,       # grid search parameters (not modified)
+                  configFile='tuning.cfg',
+                  randomSeed=None,
+                  verbose=True,
+    ):
+    """
+    If the config file SEARCH_MODE is a halving mode, make tuningLib's
+        TextPipelineTuningHelper use a halving search instead of GridSearchCV.
+    Return the search mode.
+    """
+    config = getSearchConfig(configFile)
+    if config['SEARCH_MODE'] == 'grid':
+        return 'grid'
+    if not hasattr(tuningLib, 'GridSearchCV'):
+        raise AttributeError("%s has no GridSearchCV to replace, " % \
+                    tuningLib.__name__ + "cannot use SEARCH_MODE '%s'" % \
+                    config['SEARCH_MODE'])
+    getHalvingGrid(config, parameters)          # check the resource now
+    tuningLib.GridSearchCV = getHalvingSearch(config, randomSeed)
+    if verbose:
+        sys.stderr.write("Search mode: %s on %s, factor %d\n" % \
+            (config['SEARCH_MODE'], config['HALVING_RESOURCE'],
+                                                config['HALVING_FACTOR']))
+    return config['SEARCH_MODE']
+#-----------------------------------
+
+def getBenchmarkPipeline(model, randomSeed=1):
+    """ Return (pipeline, parameters) from ModelDev/baseline RF.py or GB.py
+    """
+    from sklearn.pipeline import Pipeline
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.ensemble import RandomForestClassifier, \
+                                 GradientBoostingClassifier
+    vectorizer = CountVectorizer(stop_words='english', binary=True,
+                                    token_pattern=r'\b([a-z_]\w+)\b')
+    parameters = {
+        'vectorizer__ngram_range': [(1,2),],
+        'vectorizer__min_df': [0.02,],
+        'vectorizer__max_df': [0.75,],
+        }
+    if model == 'RF':
+        classifier = RandomForestClassifier(class_weight='balanced',
+                                    random_state=randomSeed, n_jobs=1)
+        parameters.update({
+            'classifier__min_samples_split': [25, 50, 75, 100],
+            'classifier__n_estimators': [100,],
+            })
+    else:
+        classifier = GradientBoostingClassifier(random_state=randomSeed)
+        parameters.update({
+            'classifier__learning_rate': [ .1, ],
+            'classifier__n_estimators': [200,],
+            'classifier__min_samples_split': [2, 5, 10, 20, ],
+            })
+    pipeline = Pipeline([('vectorizer', vectorizer),
+                         ('classifier', classifier)])
+    return pipeline, parameters
+#-----------------------------------
+
+def benchmark(sampleFile, model, numJobs=1, numCV=5, beta=2):
+    """ Time a grid search w/ and w/o memoization. Return report text.
+    """
+    import htMLsample
+    from sklearn.model_selection import GridSearchCV
+    from sklearn.metrics import make_scorer, fbeta_score
+
+    sampleSet = htMLsample.readSampleFile(sampleFile, columnar=True)
+    docs = sampleSet.getDocuments()
+    y = sampleSet.getKnownYvalues()
+    scorer = make_scorer(fbeta_score, beta=beta, pos_label=1)
+
+    text = "Grid search times: %s  %d samples  %d folds  %d jobs\n" % \
+                            (model, len(docs), numCV, numJobs)
+    for memoize in [False, True]:
+        pipeline, parameters = getBenchmarkPipeline(model)
+        cacheDir = tempfile.mkdtemp(prefix='htPipelineCache')
+        if memoize:
+            memoizePipeline(pipeline, parameters, cacheDir)
+        gs = GridSearchCV(pipeline, parameters, scoring=scorer, cv=numCV,
+                                                n_jobs=numJobs)
+        startTime = time.time()
+        gs.fit(docs, y)
+        elapsed = time.time() - startTime
+        shutil.rmtree(cacheDir, ignore_errors=True)
+        text += "memoize=%-5s  %8.2f seconds  best F%d %6.4f  %s\n" % \
+                    (memoize, elapsed, beta, gs.best_score_, gs.best_params_)
+    return text
+#-----------------------------------
+
+HALVING_GRID = {   # GB params added to the baseline grid: 36 grid points
+    'classifier__learning_rate': [.1, .2, .3],
+    'classifier__max_features': [None, 0.3, 'sqrt'],
+    }
+
+def benchmarkHalving(sampleFile, numJobs=1, numCV=5, beta=2):
+    """ Time the baseline GB grid search, and a grid search and a halving
+        search over the baseline grid w/ HALVING_GRID added.
+        The halving search is over n_samples: all candidates on 1/4 of the
+        samples, the best 1/4 of them on all the samples. Each fit has a
+        fixed cost (loading the memoized vectorizer, transforming the test
+        fold), so halving over n_estimators, w/ more and smaller fits,
+        was slower than the grid search.
+        Return report text.
+    """
+    import htMLsample
+    from sklearn.model_selection import GridSearchCV
+    from sklearn.metrics import make_scorer, fbeta_score
+
+    sampleSet = htMLsample.readSampleFile(sampleFile, columnar=True)
+    docs = sampleSet.getDocuments()
+    y = sampleSet.getKnownYvalues()
+    scorer = make_scorer(fbeta_score, beta=beta, pos_label=1)
+    config = {'SEARCH_MODE'          : 'halving',
+              'HALVING_RESOURCE'     : 'n_samples',
+              'HALVING_FACTOR'       : 4,
+              'HALVING_MIN_RESOURCES': 'exhaust',
+              'HALVING_MAX_RESOURCES': 'auto',
+              'HALVING_CANDIDATES'   : 'exhaust',
+              'HALVING_ROUNDS'       : 2,
+              }
+    text = "GB search times: %d samples  %d folds  %d jobs\n" % \
+                            (len(docs), numCV, numJobs)
+    for mode in ['baseline grid', 'grid', 'halving']:
+        pipeline, parameters = getBenchmarkPipeline('GB')
+        search = GridSearchCV
+        if mode != 'baseline grid':
+            parameters.update(HALVING_GRID)
+        if mode == 'halving':
+            search = getHalvingSearch(config, randomSeed=1)
+        numCandidates = getNumCombinations(parameters)
+        cacheDir = tempfile.mkdtemp(prefix='htPipelineCache')
+        memoizePipeline(pipeline, parameters, cacheDir, verbose=False)
+        gs = search(pipeline, parameters, scoring=scorer, cv=numCV,
+                                                n_jobs=numJobs)
+        startTime = time.time()
+        gs.fit(docs, y)
+        elapsed = time.time() - startTime
+        shutil.rmtree(cacheDir, ignore_errors=True)
+        text += "%-13s %6d grid points %8.2f seconds  best F%d %6.4f\n" % \
+                    (mode, numCandidates, elapsed, beta, gs.best_score_)
+        text += "    %s\n" % gs.best_params_
+    return text
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Benchmark tuning helpers on a sample file')
+
+    parser.add_argument('command', choices=['benchmark', 'halving'],
+        help='benchmark: time grid search w/ & w/o memoization. ' +
+             'halving: GB grid search vs. grid and halving search on a ' +
+             'bigger grid')
+
+    parser.add_argument('sampleFile', help='preprocessed sample file')
+
+    parser.add_argument('--model', dest='model', choices=['RF', 'GB'],
+        default='RF', help='baseline model grid to use. Default: RF')
+
+    parser.add_argument('--jobs', dest='numJobs', type=int, default=1,
+        help='number of parallel grid search jobs. Default: 1')
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    if args.command == 'benchmark':
+        print(benchmark(args.sampleFile, args.model, args.numJobs))
+    elif args.command == 'halving':
+        print(benchmarkHalving(args.sampleFile, args.numJobs))
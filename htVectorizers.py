@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Vectorizers for GXD HT sample documents.
+
+           ParallelCountVectorizer - a CountVectorizer that tokenizes and
+                counts the documents in a pool of processes (n_jobs).
+                Each process builds a CSR matrix shard for a chunk of the
+                documents with its own local vocabulary. The shards' document
+                frequencies are merged, the same min_df/max_df pruning as
+                CountVectorizer is applied to the merged counts, and the
+                shards are remapped to the final, sorted vocabulary and
+                stacked.
+                Same params (+ n_jobs) and same vocabulary_, stop_words_ and
+                matrix as CountVectorizer.
+
+           HashingDfVectorizer - a vectorizer w/o a global vocabulary.
+                Terms are hashed into n_features buckets (as
+                HashingVectorizer), and fit() streams over the documents in
+                chunks counting the document frequency of each bucket. The
+                min_df/max_df pruning is applied to the buckets, and the
+                surviving buckets are the features.
+                Fit memory is bounded by n_features and chunkSize instead of
+                growing with the number of distinct unigrams + bigrams.
+                Feature names come from a reverse map (bucket -> terms) that
+                is only kept for the surviving buckets.
+
+  If you run this module as a script, it times CountVectorizer and
+  ParallelCountVectorizer at different numbers of jobs on a sample file, and
+  checks that their results are identical. Or it compares memory and
+  cross validated accuracy of the production pipeline w/ CountVectorizer vs.
+  HashingDfVectorizer:
+        htVectorizers.py benchmark sampleFile [--jobs 1,2,4] [--replicate n]
+        htVectorizers.py hashing   sampleFile [--replicate n]
+'''
+import sys
+import time
+import numbers
+import tracemalloc
+import argparse
+import numpy as np
+import scipy.sparse
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.utils import murmurhash3_32
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+#-----------------------------------
+
+def _countChunk(vectorizer,     # CountVectorizer w/ the params to use
+                documents,      # list of str
+    ):
+    """
+    Tokenize and count the documents.
+    Return (terms, X) where terms is the chunk's local vocabulary in column
+        order and X is the chunk's CSR matrix of term counts.
+    """
+    analyze = vectorizer.build_analyzer()
+    vocabulary = {}
+    indices = []
+    data = []
+    indptr = [0]
+    for doc in documents:
+        counts = {}
+        for term in analyze(doc):
+            i = vocabulary.setdefault(term, len(vocabulary))
+            counts[i] = counts.get(i, 0) + 1
+        indices.extend(counts.keys())
+        data.extend(counts.values())
+        indptr.append(len(indices))
+    X = scipy.sparse.csr_matrix(
+            (np.array(data, dtype=np.int64), np.array(indices, dtype=np.int32),
+             np.array(indptr, dtype=np.int64)),
+            shape=(len(documents), len(vocabulary)))
+    return list(vocabulary.keys()), X
+#-----------------------------------
+
+def _transformChunk(vectorizer, documents):
+    return vectorizer.transform(documents)
+#-----------------------------------
+
+class ParallelCountVectorizer (CountVectorizer):
+    """
+    IS:   a CountVectorizer that tokenizes in parallel processes
+    HAS:  the CountVectorizer params +
+            n_jobs - number of processes. None means 1, -1 means all cores
+    Note: a fixed vocabulary or max_features falls back to CountVectorizer
+            for fitting.
+    """
+    def __init__(self, *, input='content', encoding='utf-8',
+                decode_error='strict', strip_accents=None, lowercase=True,
+                preprocessor=None, tokenizer=None, stop_words=None,
+                token_pattern=r'(?u)\b\w\w+\b', ngram_range=(1, 1),
+                analyzer='word', max_df=1.0, min_df=1, max_features=None,
+                vocabulary=None, binary=False, dtype=np.int64,
+                n_jobs=None,
+                ):
+        super().__init__(input=input, encoding=encoding,
+                decode_error=decode_error, strip_accents=strip_accents,
+                lowercase=lowercase, preprocessor=preprocessor,
+                tokenizer=tokenizer, stop_words=stop_words,
+                token_pattern=token_pattern, ngram_range=ngram_range,
+                analyzer=analyzer, max_df=max_df, min_df=min_df,
+                max_features=max_features, vocabulary=vocabulary,
+                binary=binary, dtype=dtype)
+        self.n_jobs = n_jobs
+    #-----------------------------------
+
+    def _getChunks(self, documents):
+        """ Split the documents into one chunk per job """
+        nJobs = min(effective_n_jobs(self.n_jobs), max(len(documents), 1))
+        size = (len(documents) + nJobs -1) // nJobs
+        return [documents[i:i+size] for i in range(0, len(documents), size)]
+
+    def _getCountVectorizer(self, **params):
+        """ Return a plain CountVectorizer w/ our params to send to workers """
+        p = self.get_params()
+        del p['n_jobs']
+        p.update(params)
+        return CountVectorizer(**p)
+    #-----------------------------------
+
+    def fit(self, raw_documents, y=None):
+        self.fit_transform(raw_documents)
+        return self
+
+    def fit_transform(self, raw_documents, y=None):
+        if isinstance(raw_documents, str):
+            raise ValueError("Iterable over raw text documents expected, " +
+                                                    "string object received.")
+        if self.vocabulary is not None or self.max_features is not None \
+                                    or effective_n_jobs(self.n_jobs) == 1:
+            return super().fit_transform(raw_documents, y)
+
+        documents = list(raw_documents)
+        nDocs = len(documents)
+        vectorizer = self._getCountVectorizer()
+        shards = Parallel(n_jobs=self.n_jobs)(delayed(_countChunk)(vectorizer,
+                                    chunk) for chunk in self._getChunks(documents))
+
+        # merge the shards' document frequencies into a global vocabulary
+        termIndex = {}                  # termIndex[term] = global index
+        localToGlobal = []              # index maps, one per shard
+        for terms, X in shards:
+            localToGlobal.append(np.array([termIndex.setdefault(t,
+                                len(termIndex)) for t in terms], dtype=np.int64))
+        df = np.zeros(len(termIndex), dtype=np.int64)
+        for (terms, X), m in zip(shards, localToGlobal):
+            df[m] += np.bincount(X.indices, minlength=len(terms))
+
+        # same pruning as CountVectorizer
+        maxDocCount = self.max_df if isinstance(self.max_df, numbers.Integral)\
+                                                    else self.max_df * nDocs
+        minDocCount = self.min_df if isinstance(self.min_df, numbers.Integral)\
+                                                    else self.min_df * nDocs
+        if maxDocCount < minDocCount:
+            raise ValueError("max_df corresponds to < documents than min_df")
+        if len(termIndex) == 0:
+            raise ValueError("empty vocabulary; perhaps the documents only " +
+                                                        "contain stop words")
+        keep = (df <= maxDocCount) & (df >= minDocCount)
+        if not keep.any():
+            raise ValueError("After pruning, no terms remain. Try a lower " +
+                                                "min_df or a higher max_df.")
+        allTerms = list(termIndex.keys())
+        kept = sorted([allTerms[i] for i in np.flatnonzero(keep)])
+        self.stop_words_ = set([allTerms[i] for i in np.flatnonzero(~keep)])
+        self.vocabulary_ = { t: i for i, t in enumerate(kept) }
+        self.fixed_vocabulary_ = False
+
+        # remap each shard's columns to the final vocabulary, dropping pruned
+        globalToFinal = np.full(len(termIndex), -1, dtype=np.int64)
+        globalToFinal[[termIndex[t] for t in kept]] = np.arange(len(kept))
+        blocks = []
+        for (terms, X), m in zip(shards, localToGlobal):
+            cols = globalToFinal[m][X.indices]
+            rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+            ok = cols >= 0
+            data = X.data[ok]
+            if self.binary:
+                data = np.ones_like(data)
+            blocks.append(scipy.sparse.csr_matrix((data.astype(self.dtype),
+                                        (rows[ok], cols[ok])),
+                                        shape=(X.shape[0], len(kept))))
+        X = scipy.sparse.vstack(blocks, format='csr', dtype=self.dtype)
+        X.sort_indices()
+        return X
+    #-----------------------------------
+
+    def transform(self, raw_documents):
+        if isinstance(raw_documents, str):
+            raise ValueError("Iterable over raw text documents expected, " +
+                                                    "string object received.")
+        documents = list(raw_documents)
+        if effective_n_jobs(self.n_jobs) == 1 or len(documents) < 2:
+            return super().transform(documents)
+        vectorizer = self._getCountVectorizer(vocabulary=self.vocabulary_)
+        blocks = Parallel(n_jobs=self.n_jobs)(delayed(_transformChunk)(
+                    vectorizer, chunk) for chunk in self._getChunks(documents))
+        return scipy.sparse.vstack(blocks, format='csr', dtype=self.dtype)
+# end class ParallelCountVectorizer -----------------------------------
+
+MAX_TERM_MEMO = 2**18      # max terms to remember the hash buckets of in fit()
+
+class HashingDfVectorizer (TransformerMixin, BaseEstimator):
+    """
+    IS:   a vectorizer that hashes terms into buckets, w/ min_df/max_df
+            pruning of the buckets
+    HAS:  the CountVectorizer params (except vocabulary & max_features) +
+            n_features - number of hash buckets
+            chunkSize  - number of documents to hash at a time in fit()
+          After fit():
+            buckets_      - the surviving bucket of each output feature
+            vocabulary_   - {feature name: feature index}
+            bucketTerms_  - for each output feature, [(term, df), ...] of the
+                            terms seen in its bucket, most frequent first
+    Note: terms that collide in a bucket count as one feature. A feature
+            name is its bucket's terms that would pass min_df on their own,
+            joined by '|', or the most frequent term if none would.
+    """
+    def __init__(self, *, input='content', encoding='utf-8',
+                decode_error='strict', strip_accents=None, lowercase=True,
+                preprocessor=None, tokenizer=None, stop_words=None,
+                token_pattern=r'(?u)\b\w\w+\b', ngram_range=(1, 1),
+                analyzer='word', max_df=1.0, min_df=1, binary=False,
+                dtype=np.int64, n_features=2**20, chunkSize=2000,
+                ):
+        self.input = input
+        self.encoding = encoding
+        self.decode_error = decode_error
+        self.strip_accents = strip_accents
+        self.lowercase = lowercase
+        self.preprocessor = preprocessor
+        self.tokenizer = tokenizer
+        self.stop_words = stop_words
+        self.token_pattern = token_pattern
+        self.ngram_range = ngram_range
+        self.analyzer = analyzer
+        self.max_df = max_df
+        self.min_df = min_df
+        self.binary = binary
+        self.dtype = dtype
+        self.n_features = n_features
+        self.chunkSize = chunkSize
+    #-----------------------------------
+
+    def _getHasher(self):
+        return HashingVectorizer(input=self.input, encoding=self.encoding,
+                decode_error=self.decode_error,
+                strip_accents=self.strip_accents, lowercase=self.lowercase,
+                preprocessor=self.preprocessor, tokenizer=self.tokenizer,
+                stop_words=self.stop_words, token_pattern=self.token_pattern,
+                ngram_range=self.ngram_range, analyzer=self.analyzer,
+                n_features=self.n_features, binary=self.binary, norm=None,
+                alternate_sign=False, dtype=self.dtype)
+
+    def _getBucket(self, term):
+        """ Return the hash bucket of a term, same as HashingVectorizer """
+        h = murmurhash3_32(term, positive=False)
+        if h == -2147483648:
+            return (2147483647 - (self.n_features - 1)) % self.n_features
+        return abs(h) % self.n_features
+
+    def _getChunks(self, documents):
+        for i in range(0, len(documents), self.chunkSize):
+            yield documents[i:i+self.chunkSize]
+    #-----------------------------------
+
+    def fit(self, raw_documents, y=None):
+        if isinstance(raw_documents, str):
+            raise ValueError("Iterable over raw text documents expected, " +
+                                                    "string object received.")
+        documents = list(raw_documents)
+        nDocs = len(documents)
+        hasher = self._getHasher()
+
+        # pass 1: document frequency of each bucket
+        df = np.zeros(self.n_features, dtype=np.int64)
+        for chunk in self._getChunks(documents):
+            X = hasher.transform(chunk)
+            df += np.bincount(X.indices, minlength=self.n_features)
+
+        maxDocCount = self.max_df if isinstance(self.max_df, numbers.Integral)\
+                                                    else self.max_df * nDocs
+        minDocCount = self.min_df if isinstance(self.min_df, numbers.Integral)\
+                                                    else self.min_df * nDocs
+        if maxDocCount < minDocCount:
+            raise ValueError("max_df corresponds to < documents than min_df")
+        keep = (df <= maxDocCount) & (df >= minDocCount) & (df > 0)
+        if not keep.any():
+            raise ValueError("After pruning, no terms remain. Try a lower " +
+                                                "min_df or a higher max_df.")
+        surviving = set(np.flatnonzero(keep).tolist())
+
+        # pass 2: reverse map for the surviving buckets only
+        termDf = {}             # termDf[bucket] = {term: df}
+        termBuckets = {}        # bounded memo of term -> bucket
+        analyze = hasher.build_analyzer()
+        for doc in documents:
+            for term in set(analyze(doc)):
+                b = termBuckets.get(term)
+                if b is None:
+                    if len(termBuckets) >= MAX_TERM_MEMO:
+                        termBuckets.clear()
+                    b = termBuckets[term] = self._getBucket(term)
+                if b in surviving:
+                    counts = termDf.setdefault(b, {})
+                    counts[term] = counts.get(term, 0) + 1
+
+        names = {}
+        bucketTerms = {}
+        for b in surviving:
+            terms = sorted(termDf[b].items(), key=lambda t: (-t[1], t[0]))
+            bucketTerms[b] = terms
+            common = sorted([t for t, n in terms if n >= minDocCount])
+            names[b] = '|'.join(common) if common else terms[0][0]
+
+        self.buckets_ = np.array(sorted(surviving, key=lambda b: names[b]),
+                                                            dtype=np.int64)
+        self.vocabulary_ = { names[b]: i for i, b in enumerate(self.buckets_) }
+        self.bucketTerms_ = [bucketTerms[b] for b in self.buckets_]
+        return self
+    #-----------------------------------
+
+    def transform(self, raw_documents):
+        if isinstance(raw_documents, str):
+            raise ValueError("Iterable over raw text documents expected, " +
+                                                    "string object received.")
+        documents = list(raw_documents)
+        hasher = self._getHasher()
+        blocks = [hasher.transform(chunk)[:, self.buckets_] \
+                                    for chunk in self._getChunks(documents)]
+        if not blocks:
+            return scipy.sparse.csr_matrix((0, len(self.buckets_)),
+                                                            dtype=self.dtype)
+        return scipy.sparse.vstack(blocks, format='csr', dtype=self.dtype)
+
+    def fit_transform(self, raw_documents, y=None):
+        documents = list(raw_documents)
+        return self.fit(documents).transform(documents)
+
+    def get_feature_names_out(self, input_features=None):
+        names = [None] * len(self.vocabulary_)
+        for name, i in self.vocabulary_.items():
+            names[i] = name
+        return np.asarray(names, dtype=object)
+# end class HashingDfVectorizer -----------------------------------
+
+def getProductionParams():
+    """ Return the gxdhtclassifier.py vectorizer params """
+    return dict(stop_words='english', binary=True, min_df=0.02, max_df=0.75,
+                ngram_range=(1,2), token_pattern=r'\b([a-z_]\w+)\b')
+#-----------------------------------
+
+def benchmark(sampleFile, jobs=[1,2,4], replicate=1):
+    """ Time CountVectorizer and ParallelCountVectorizer fit_transform().
+        Return report text.
+    """
+    import htMLsample
+    sampleSet = htMLsample.readSampleFile(sampleFile, columnar=True)
+    docs = sampleSet.getDocuments() * replicate
+
+    startTime = time.time()
+    cv = CountVectorizer(**getProductionParams())
+    Xcv = cv.fit_transform(docs)
+    cvTime = time.time() - startTime
+    text = "fit_transform: %d documents, %d features\n" % \
+                                                (len(docs), Xcv.shape[1])
+    text += "CountVectorizer            %8.2f seconds\n" % cvTime
+
+    for n in jobs:
+        pcv = ParallelCountVectorizer(n_jobs=n, **getProductionParams())
+        startTime = time.time()
+        X = pcv.fit_transform(docs)
+        elapsed = time.time() - startTime
+        same = pcv.vocabulary_ == cv.vocabulary_ and \
+                pcv.stop_words_ == cv.stop_words_ and (X != Xcv).nnz == 0
+        text += "ParallelCountVectorizer %2d %8.2f seconds  speedup %5.2f" \
+                            % (n, elapsed, cvTime/elapsed) + \
+                "  identical: %s\n" % same
+    return text
+#-----------------------------------
+
+def compareHashing(sampleFile, replicate=1, numCV=5):
+    """ Compare fit memory and cross validated F2, P, R, NPV of the production
+        pipeline w/ CountVectorizer and HashingDfVectorizer.
+        Return report text.
+    """
+    import htMLsample
+    from sklearn.base import clone
+    from sklearn.model_selection import cross_val_predict, StratifiedKFold
+    from sklearn.metrics import fbeta_score, precision_score, recall_score
+    import gxdhtclassifier
+    import gxdhtclassifier_hashing
+
+    sampleSet = htMLsample.readSampleFile(sampleFile, columnar=True)
+    docs = sampleSet.getDocuments()
+    y = np.array(sampleSet.getKnownYvalues())
+    bigDocs = docs * replicate
+
+    text = "Vectorizer fit memory: %d documents\n" % len(bigDocs)
+    models = [('CountVectorizer', gxdhtclassifier.pipeline),
+              ('HashingDfVectorizer', gxdhtclassifier_hashing.pipeline)]
+    for name, pipeline in models:
+        vectorizer = clone(pipeline.named_steps['vectorizer'])
+        if hasattr(vectorizer, 'cacheDir'):
+            vectorizer.set_params(cacheDir=None)
+        startTime = time.time()
+        X = vectorizer.fit_transform(bigDocs)
+        elapsed = time.time() - startTime
+        tracemalloc.start()             # slows it down, so not timed
+        vectorizer.fit_transform(bigDocs)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        text += "%-20s %8.2f seconds  peak %7.1f MB  %d features\n" % \
+                            (name, elapsed, peak/1024.0**2, X.shape[1])
+
+    text += "\n%d fold cross validation: %d documents\n" % (numCV, len(docs))
+    folds = StratifiedKFold(n_splits=numCV, shuffle=True, random_state=1)
+    for name, pipeline in models:
+        pipeline = clone(pipeline)
+        pipeline.set_params(classifier__random_state=1, classifier__verbose=0)
+        pred = cross_val_predict(pipeline, docs, y, cv=folds)
+        text += "%-20s F2: %5.4f    P: %5.4f    R: %5.4f    NPV: %5.4f\n" % \
+                    (name, fbeta_score(y, pred, beta=2),
+                     precision_score(y, pred), recall_score(y, pred),
+                     precision_score(y, pred, pos_label=0))
+    return text
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Benchmark vectorizers on a sample file')
+
+    parser.add_argument('command', choices=['benchmark', 'hashing'],
+        help='benchmark: time CountVectorizer & ParallelCountVectorizer. ' +
+             'hashing: memory & accuracy of CountVectorizer vs. ' +
+             'HashingDfVectorizer')
+
+    parser.add_argument('sampleFile', help='preprocessed sample file')
+
+    parser.add_argument('--jobs', dest='jobs', default='1,2,4',
+        help='comma separated numbers of jobs to time. Default: 1,2,4')
+
+    parser.add_argument('--replicate', dest='replicate', type=int, default=1,
+        help='repeat the samples n times for a bigger corpus')
+
+    return parser.parse_args()
+#-----------------------------------
+
+if __name__ == "__main__":
+    args = getArgs()
+    if args.command == 'benchmark':
+        jobs = [int(n) for n in args.jobs.split(',')]
+        print(benchmark(args.sampleFile, jobs, args.replicate))
+    elif args.command == 'hashing':
+        print(compareHashing(args.sampleFile, args.replicate))
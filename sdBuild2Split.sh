@@ -24,15 +24,12 @@ ENDTEXT
 baseDir=`dirname $0`
 . $baseDir/Configuration
 
-splitCmd="$PYTHON $MLtextTools/splitSamples.py $sampleDataLibParam"
-preprocessCmd="$PYTHON $MLtextTools/preprocessSamples.py $sampleDataLibParam"
+splitCmd="$PYTHON $GXDhtClassifierHome/sdSplitSamples.py"
 
 splitTestLog=splitSamples.log   # where to write log to
 
 testFraction="0.15"		# 15% of GEO expmts for test set
-valFraction="0.235"		# want 20% of GEO expmts for validation set
-				#  since we are pulling from test leftovers
-				#  this is 20%/(1-15%) = .235 of test leftovers
+valFraction="0.20"		# 20% of GEO expmts for validation set
 #######################################
 # cmdline options
 #######################################
@@ -51,7 +48,7 @@ done
 if [ "$dataDir" == "" ]; then
     Usage
 fi
-splitCmd="$splitCmd $seedParam"         # add optional seed
+splitCmd="$splitCmd $seedParam --test $testFraction --val $valFraction"
 
 #######################################
 # Input file names
@@ -66,25 +63,16 @@ pathsToSplit=""
 for f in $filesToSplit; do
     pathsToSplit="$pathsToSplit $dataDir/$f"
 done
-otherPaths=""
+otherParams=""
 for f in $otherFiles; do
-    otherPaths="$otherPaths $dataDir/$f"
+    otherParams="$otherParams --other $dataDir/$f"
 done
 #######################################
 # from raw files, pull out testSet.txt, valSet.txt, trainSet.txt
+#  (one pass: stratified by class, other files appended to trainSet.txt)
 #######################################
 date >$splitTestLog
-echo "### randomly selecting test set" | tee -a $splitTestLog
+echo "### randomly selecting test, validation, training sets" | tee -a $splitTestLog
 set -x
-# random test set + leftovers
-$splitCmd -f $testFraction --retainedfile testSet.txt  --leftoverfile LeftoversTest.txt $pathsToSplit >>$splitTestLog 2>&1
-
-# random validation set from test set leftovers
-echo "### randomly selecting validation set" | tee -a $splitTestLog
-$splitCmd -f $valFraction --retainedfile valSet.txt  --leftoverfile LeftoversVal.txt LeftoversTest.txt >>$splitTestLog 2>&1
-
-# trainSet is valSet leftovers + $before
-# (preprocess w/ no preprocessing steps just intelligently concats files)
-echo "### concatenating leftovers to  training set" | tee -a $splitTestLog
-$preprocessCmd LeftoversVal.txt $otherPaths > trainSet.txt 2>> $splitTestLog
+$splitCmd $otherParams $pathsToSplit >>$splitTestLog 2>&1
 set +x
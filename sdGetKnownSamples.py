@@ -20,7 +20,7 @@ import unittest
 import db
 import htMLsample as mlSampleLib
 import htRawSampleTextManager
-from utilsLib import removeNonAscii, TextMapping, TextTransformer
+import htDbSampleLib
 #-----------------------------------
 
 sampleObjType = mlSampleLib.ClassifiedHtSample
@@ -51,37 +51,9 @@ def getArgs():
     parser.add_argument('-q', '--quiet', dest='verbose', action='store_false',
         required=False, help="skip helpful messages to stderr")
 
-    defaultHost = os.environ.get('PG_DBSERVER', 'bhmgidevdb01')
-    defaultDatabase = os.environ.get('PG_DBNAME', 'prod')
-
-    parser.add_argument('-s', '--server', dest='server', action='store',
-        required=False, default=defaultHost,
-        help='db server. Shortcuts:  adhoc, prod, dev, test. (Default %s)' %
-                defaultHost)
-
-    parser.add_argument('-d', '--database', dest='database', action='store',
-        required=False, default=defaultDatabase,
-        help='which database. Example: mgd (Default %s)' % defaultDatabase)
-
-    args =  parser.parse_args()
-
-    if args.server == 'adhoc':
-        args.host = 'mgi-adhoc.jax.org'
-        args.db = 'mgd'
-    elif args.server == 'prod':
-        args.host = 'bhmgidb01.jax.org'
-        args.db = 'prod'
-    elif args.server == 'dev':
-        args.host = 'mgi-testdb4.jax.org'
-        args.db = 'jak'
-    elif args.server == 'test':
-        args.host = 'bhmgidevdb01.jax.org'
-        args.db = 'prod'
-    else:
-        args.host = args.server
-        args.db = args.database
+    htDbSampleLib.addDbArgs(parser)
 
-    return args
+    return htDbSampleLib.setDbArgs(parser.parse_args())
 #-----------------------------------
 
 args = getArgs()
@@ -287,7 +259,8 @@ def doSamples():
             else:
                 rawSampleText = ''
 
-            sample = sqlRecord2ClassifiedSample(r, rawSampleText)
+            sample = htDbSampleLib.sqlRecord2ClassifiedSample(r,
+                            rawSampleText, maxTextLength=args.maxTextLength)
             outputSampleSet.addSample(sample)
         except:         # if some error, try to report which record
             sys.stderr.write("Error on record %d:\n%s\n" % (i, str(r)))
@@ -306,54 +279,6 @@ def doSamples():
     return
 #-----------------------------------
 
-def sqlRecord2ClassifiedSample(r,               # sql Result record
-                               rawSampleText,   # text from raw sample metadata 
-    ):
-    """
-    Encapsulates knowledge of ClassifiedSample.setFields() field names
-    """
-    newR = {}
-    newSample = sampleObjType()
-
-    if len(rawSampleText) > 0:          # add separator to mark beginning
-        rawSampleText = " .. " + rawSampleText
-
-    ## populate the Sample fields
-    newR['knownClassName']    = str(r['knownclassname'])
-    newR['ID']                = str(r['id'])
-    newR['curationState']     = str(r['curationstate'])
-    newR['studytype']         = str(r['studytype'])
-    newR['experimenttype']    = str(r['experimenttype'])
-    newR['modification_date'] = str(r['modification_date'])
-    newR['titleLength']       = str(r['titlelength'])
-    newR['descriptionLength'] = str(r['descriptionlength'])
-    newR['title']             = cleanUpTextField(r,'title')
-    newR['description']       = cleanUpTextField(r,'description') +rawSampleText
-
-    return newSample.setFields(newR)
-#-----------------------------------
-
-def cleanUpTextField(rcd,
-                    textFieldName,
-    ):
-    text = rcd[textFieldName]
-    if text == None:
-        text = ''
-
-    if args.maxTextLength:	# handy for debugging
-        text = text[:args.maxTextLength]
-        text = text.replace('\n', ' ')
-
-    text = removeNonAscii(cleanDelimiters(text))
-    return text
-#-----------------------------------
-
-def cleanDelimiters(text):
-    """ remove RECORDEND and FIELDSEPs from text (replace w/ ' ')
-    """
-    return text.replace(RECORDEND,' ').replace(FIELDSEP,' ')
-#-----------------------------------
-
 def verbose(text):
     if args.verbose:
         sys.stderr.write(text)
@@ -361,10 +286,7 @@ def verbose(text):
 #-----------------------------------
 
 def main():
-    db.set_sqlServer  (args.host)
-    db.set_sqlDatabase(args.db)
-    db.set_sqlUser    ("mgd_public")
-    db.set_sqlPassword("mgdpub")
+    htDbSampleLib.connectDb(db, args)
 
     loadTmpTables()
 
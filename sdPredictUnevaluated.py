@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Predict unevaluated GEO experiments straight from the database
+           using a trained gxdhtclassifier model. There are no sample file,
+           preprocessed file, or predict.py steps in between.
+
+           Selects the gxd_htexperiment records that are not evaluated yet
+           (same columns and cleanup as sdGetKnownSamples.py, plus the
+           raw sample text from RawSampleTextManager), and streams them in
+           chunks of experiments through three overlapping stages:
+                fetch       thread: sql for a chunk of experiment keys and
+                                    their raw sample text ->
+                                    ClassifiedHtSamples
+                preprocess  thread: the preprocessors (default: standard)
+                                    -> documents
+                score       main:   pipeline.predict_proba() -> preds lines
+           connected by small bounded queues, so the next chunk is fetched
+           and preprocessed while the current one is scored.
+
+  Outputs:      preds file to stdout:
+                ID|Pred Class|Confidence|Abs Value|evaluationState|extraInfo...
+                Confidence and Abs Value are the same as in predict.py preds
+                files.
+'''
+import sys
+import os
+import time
+import queue
+import pickle
+import argparse
+import threading
+import db
+import htMLsample as mlSampleLib
+import htRawSampleTextManager
+import htDbSampleLib
+from htPredictServer import getConfidence
+#-----------------------------------
+
+sampleObjType = mlSampleLib.ClassifiedHtSample
+
+# for the Sample output file
+RECORDEND    = sampleObjType.getRecordEnd()
+FIELDSEP     = sampleObjType.getFieldSep()
+
+QUEUE_SIZE   = 2        # chunks waiting between stages
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Predict unevaluated GEO experiments from the db, ' +
+                    'write preds to stdout')
+
+    parser.add_argument('-m', '--model', dest='modelFile',
+        default='gxdhtclassifier.pkl',
+        help='trained model pkl. Default: gxdhtclassifier.pkl')
+
+    parser.add_argument('-p', '--preprocessor', dest='preprocessors',
+        action='append', default=None,
+        help='preprocessor to run on each sample. Default: standard')
+
+    parser.add_argument('--chunksize', dest='chunkSize', type=int,
+        default=500,
+        help='experiments per db fetch/predict chunk. Default: 500')
+
+    parser.add_argument('-l', '--limit', dest='nResults',
+        required=False, type=int, default=0, 		# 0 means ALL
+        help="limit results to n experiments. Default is no limit")
+
+    parser.add_argument('-q', '--quiet', dest='verbose', action='store_false',
+        required=False, help="skip helpful messages to stderr")
+
+    htDbSampleLib.addDbArgs(parser)
+
+    return htDbSampleLib.setDbArgs(parser.parse_args())
+#-----------------------------------
+
+args = getArgs()
+
+#-----------------------------------
+UNEVAL_TMPTBL = 'tmp_unevalexp'
+
+def loadTmpTable():
+    '''
+    Select the unevaluated GEO experiments into UNEVAL_TMPTBL.
+    Same columns as the sdGetKnownSamples.py tmp tables, but
+        evaluationState instead of knownClassName.
+    '''
+    q = ["""
+        create temporary table %s as
+        select e._experiment_key, a.accid as ID,
+            t.term as evaluationState,
+            t2.term as curationState,
+            t3.term as studytype,
+            t4.term as experimenttype,
+            to_char(e.modification_date, 'YYYY-MM-DD') as modification_date,
+            length(e.name) as titleLength,
+            length(e.description) as descriptionLength,
+            e.name as title, e.description
+        from gxd_htexperiment e
+            join voc_term t on (e._evaluationstate_key = t._term_key)
+            join voc_term t2 on (e._curationstate_key  = t2._term_key)
+            join voc_term t3 on (e._studytype_key      = t3._term_key)
+            join voc_term t4 on (e._experimenttype_key = t4._term_key)
+            join acc_accession a on
+                (a._object_key = e._experiment_key and a._mgitype_key = 42
+                and a._logicaldb_key = 190) -- GEO series
+        where
+        t.term = 'Not Evaluated'
+        """ % (UNEVAL_TMPTBL),
+        """
+        create index tmp_idx3 on %s(_experiment_key)
+        """ % (UNEVAL_TMPTBL),
+        ]
+    results = db.sql(q, 'auto')
+#-----------------------------------
+
+def getExperimentKeys():
+    q = """select _experiment_key from %s order by _experiment_key\n""" % \
+                                                                (UNEVAL_TMPTBL)
+    if args.nResults != 0:
+        q += 'limit %d\n' % args.nResults
+    return [r['_experiment_key'] for r in db.sql(q, 'auto')]
+#-----------------------------------
+
+def fetchChunks(expKeys, outQueue):
+    ''' Fetch stage: put lists of samples for chunks of expKeys on outQueue,
+        then None. Return the last chunk's RawSampleTextManager, whose
+        getReport() covers all the chunks (its text mappings are shared).
+    '''
+    rstm = None
+    negClassName = sampleObjType.sampleClassNames[sampleObjType.y_negative]
+    for start in range(0, len(expKeys), args.chunkSize):
+        keys = expKeys[start:start+args.chunkSize]
+        rstm = htRawSampleTextManager.RawSampleTextManager(db, expKeys=keys)
+        q = """select * from %s where _experiment_key in (%s)
+            order by _experiment_key
+            """ % (UNEVAL_TMPTBL, ','.join([str(k) for k in keys]))
+        samples = []
+        for r in db.sql(q, 'auto'):
+            rawSampleText = rstm.getRawSampleText(r['_experiment_key'])
+            # not evaluated: knownClassName is not used
+            sample = htDbSampleLib.sqlRecord2ClassifiedSample(r,
+                                        rawSampleText, negClassName)
+            samples.append((sample, str(r['evaluationstate'])))
+        outQueue.put(samples)
+    outQueue.put(None)
+    return rstm
+#-----------------------------------
+
+def preprocessChunks(preprocessors, inQueue, outQueue):
+    ''' Preprocess stage: put (samples, documents) for each chunk from
+        inQueue on outQueue, then None.
+    '''
+    while True:
+        samples = inQueue.get()
+        if samples is None:
+            break
+        docs = []
+        for sample, evalState in samples:
+            for p in preprocessors:
+                getattr(sample, p)()
+            docs.append(sample.constructDoc())
+        outQueue.put((samples, docs))
+    outQueue.put(None)
+#-----------------------------------
+
+class StageThread (threading.Thread):
+    """ A thread that runs a stage function, and puts None on its output
+        queue if the stage fails, so the next stage does not wait forever.
+    """
+    def __init__(self, target, args, outQueue):
+        threading.Thread.__init__(self, daemon=True)
+        self.stage = target
+        self.stageArgs = args
+        self.outQueue = outQueue
+        self.error = None
+        self.result = None
+
+    def run(self):
+        try:
+            self.result = self.stage(*self.stageArgs)
+        except Exception as e:
+            self.error = e
+            self.outQueue.put(None)
+#-----------------------------------
+
+def doPredictions():
+    ''' Write preds for the unevaluated experiments to stdout.
+    '''
+    startTime = time.time()
+    verbose("%s\nHitting database %s %s as mgd_public\n" % \
+                                        (time.ctime(), args.host, args.db,))
+    with open(args.modelFile, 'rb') as fp:
+        pipeline = pickle.load(fp)
+    pipeline.steps[-1][1].set_params(verbose=0)
+    classes = pipeline.steps[-1][1].classes_
+    preprocessors = args.preprocessors or ['standard']
+
+    loadTmpTable()
+    expKeys = getExperimentKeys()
+    verbose("%d unevaluated experiments, %.3f seconds\n" % \
+                                        (len(expKeys), time.time()-startTime))
+
+    sampleQueue = queue.Queue(maxsize=QUEUE_SIZE)
+    docQueue    = queue.Queue(maxsize=QUEUE_SIZE)
+    stages = [StageThread(fetchChunks, (expKeys, sampleQueue), sampleQueue),
+              StageThread(preprocessChunks,
+                            (preprocessors, sampleQueue, docQueue), docQueue),
+              ]
+    for s in stages:
+        s.start()
+
+    sys.stdout.write('|'.join(['ID', 'Pred Class', 'Confidence', 'Abs Value',
+                    'evaluationState'] +
+                    sampleObjType.getExtraInfoFieldNames()) + '\n')
+    numSamples = 0
+    while True:
+        item = docQueue.get()
+        if item is None:
+            break
+        samples, docs = item
+        for (sample, evalState), proba in zip(samples,
+                                            pipeline.predict_proba(docs)):
+            predClass, confidence, absValue = getConfidence(proba, classes)
+            sys.stdout.write('|'.join([sample.getID(), predClass,
+                        '%5.3f' % confidence, '%5.3f' % absValue, evalState] +
+                        sample.getExtraInfo()) + '\n')
+        numSamples += len(samples)
+        verbose("%d experiments predicted, %.3f seconds\n" % \
+                                        (numSamples, time.time()-startTime))
+
+    for s in stages:            # stage errors are set before the None
+        if s.error is not None:
+            raise s.error
+    for s in stages:
+        s.join()
+    sys.stdout.flush()
+    verbose("wrote %d predictions\n" % numSamples)
+    if stages[0].result is not None:            # the raw sample text rstm
+        verbose(stages[0].result.getReport())
+    verbose("%8.3f seconds\n\n" %  (time.time()-startTime))
+#-----------------------------------
+
+def verbose(text):
+    if args.verbose:
+        sys.stderr.write(text)
+        sys.stderr.flush()
+#-----------------------------------
+
+def main():
+    htDbSampleLib.connectDb(db, args)
+
+    doPredictions()
+#-----------------------------------
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+'''
+  Purpose:
+           Split GEO known samples into random test, validation, and training
+           sets in one pass.
+           The split is stratified by knownClassName so each output file gets
+           the same Yes/No proportions as the input, and it is reproducible
+           for a given --seed.
+           "Other" sample files (e.g., nongeo) are appended to the training
+           set and never put into the test or validation sets.
+
+           Records are never parsed into sample objects. We only look at the
+           knownClassName field of each record, and each record is written out
+           exactly as it was read.
+
+  Inputs:   sample files written by sdGetKnownSamples.py (geo, nongeo)
+
+  Outputs:  testSet.txt, valSet.txt, trainSet.txt in the output directory,
+            summary report to stdout
+'''
+import sys
+import os
+import time
+import random
+import argparse
+import htMLsample as mlSampleLib
+#-----------------------------------
+
+sampleObjType = mlSampleLib.ClassifiedHtSample
+
+RECORDEND    = sampleObjType.getRecordEnd()
+FIELDSEP     = sampleObjType.getFieldSep()
+
+TEST_FILE  = 'testSet.txt'
+VAL_FILE   = 'valSet.txt'
+TRAIN_FILE = 'trainSet.txt'
+#-----------------------------------
+
+def getArgs():
+
+    parser = argparse.ArgumentParser( \
+        description='Split sample files into stratified random test, ' +
+                    'validation, and training sets')
+
+    parser.add_argument('inputFiles', nargs='+',
+        help='sample files to split into test, validation, training sets')
+
+    parser.add_argument('--other', dest='otherFiles', action='append',
+        required=False, default=[],
+        help='sample file to append to the training set only. ' +
+             'Repeat for multiple files.')
+
+    parser.add_argument('--test', dest='testFraction', type=float,
+        required=False, default=0.15,
+        help='fraction of input samples for the test set. Default: 0.15')
+
+    parser.add_argument('--val', dest='valFraction', type=float,
+        required=False, default=0.20,
+        help='fraction of input samples for the validation set. ' +
+             'Default: 0.20')
+
+    parser.add_argument('--seed', dest='seed', type=int,
+        required=False, default=None,
+        help='integer random seed for the split. Default is time based.')
+
+    parser.add_argument('--outdir', dest='outDir', action='store',
+        required=False, default='.',
+        help='directory to write output files to. Default: .')
+
+    parser.add_argument('-q', '--quiet', dest='verbose', action='store_false',
+        required=False, help="skip helpful messages to stderr")
+
+    args =  parser.parse_args()
+
+    if args.testFraction + args.valFraction >= 1.0:
+        parser.error('test + validation fractions must be less than 1')
+    if args.seed is None:
+        args.seed = int(time.time()) % 10000
+
+    return args
+#-----------------------------------
+
+class SampleFileRecords (object):
+    """
+    IS:  the raw text records from a sample file, not parsed into Samples
+    HAS: the #meta line, the header line, list of record strings (w/o the
+            RECORDEND)
+    DOES: getKnownClassNames() - the knownClassName field from each record
+    """
+    def __init__(self, fileName):
+        self.fileName = fileName
+        with open(fileName, 'r') as fp:
+            text = fp.read()
+
+        # #meta line always ends in '\n', then header + records
+        self.metaLine, text = text.split('\n', 1)
+        if not self.metaLine.startswith('#meta'):
+            raise ValueError("%s: missing #meta line" % fileName)
+
+        records = text.split(RECORDEND)
+        self.header = records[0]
+        if self.header != FIELDSEP.join(sampleObjType.getFieldNames()):
+            raise ValueError("%s: header line does not match %s fields" % \
+                                        (fileName, sampleObjType.__name__))
+        self.records = [r for r in records[1:] if r != '']
+
+        nSeps = len(sampleObjType.getFieldNames()) -1
+        for i, r in enumerate(self.records):
+            if r.count(FIELDSEP) != nSeps:
+                raise ValueError("%s: record %d has %d fields, expected %d" % \
+                        (fileName, i+1, r.count(FIELDSEP)+1, nSeps+1))
+    #-----------------------------------
+
+    def getKnownClassNames(self):
+        i = sampleObjType.getFieldNames().index('knownClassName')
+        return [r.split(FIELDSEP, i+1)[i] for r in self.records]
+# end class SampleFileRecords -----------------------------------
+
+def stratifiedSplit(classNames,     # list of knownClassNames, one per record
+                    testFraction,
+                    valFraction,
+                    seed,
+    ):
+    """
+    Return a list of 'test', 'val', or 'train', one per record, so that each
+    class is split by the given fractions.
+    Only depends on the list of class names and the seed, so the same input
+    and seed always give the same split.
+    """
+    rng = random.Random(seed)
+    byClass = {}                # byClass[className] = [record indexes]
+    for i, c in enumerate(classNames):
+        byClass.setdefault(c, []).append(i)
+
+    assignment = ['train'] * len(classNames)
+    for c in sorted(byClass.keys()):
+        indexes = byClass[c]
+        rng.shuffle(indexes)
+        nTest = int(round(len(indexes) * testFraction))
+        nVal  = int(round(len(indexes) * valFraction))
+        for i in indexes[:nTest]:
+            assignment[i] = 'test'
+        for i in indexes[nTest:nTest+nVal]:
+            assignment[i] = 'val'
+    return assignment
+#-----------------------------------
+
+def classCountsText(classNames):
+    """ Return 'n samples: n positive (%) n negative (%)' text
+    """
+    positiveName = sampleObjType.sampleClassNames[sampleObjType.y_positive]
+    num = len(classNames)
+    numPos = classNames.count(positiveName)
+    numNeg = num - numPos
+    if num == 0: num = 1            # avoid div by 0 in the percentages
+    return "%d samples: %d positive (%4.1f%%) %d negative (%4.1f%%)\n" % \
+        (len(classNames), numPos, 100.0*numPos/num, numNeg, 100.0*numNeg/num)
+#-----------------------------------
+
+def main():
+    args = getArgs()
+    startTime = time.time()
+
+    toSplit = []
+    for fn in args.inputFiles:
+        verbose(args, "Reading %s\n" % fn)
+        toSplit.append(SampleFileRecords(fn))
+
+    # class names for all records across the input files, in input order
+    classNames = []
+    for f in toSplit:
+        classNames += f.getKnownClassNames()
+
+    assignment = stratifiedSplit(classNames, args.testFraction,
+                                                args.valFraction, args.seed)
+    outFiles = { 'test' : os.path.join(args.outDir, TEST_FILE),
+                 'val'  : os.path.join(args.outDir, VAL_FILE),
+                 'train': os.path.join(args.outDir, TRAIN_FILE),
+               }
+    outFps = { k: open(fn, 'w') for k, fn in outFiles.items() }
+    for fp in outFps.values():
+        fp.write(toSplit[0].metaLine + '\n')
+        fp.write(toSplit[0].header + RECORDEND)
+
+    # one pass over the records, each goes to its assigned file
+    outClassNames = { 'test': [], 'val': [], 'train': [] }
+    i = 0
+    for f in toSplit:
+        for r in f.records:
+            outFps[assignment[i]].write(r + RECORDEND)
+            outClassNames[assignment[i]].append(classNames[i])
+            i += 1
+
+    # other files go to the training set
+    for fn in args.otherFiles:
+        verbose(args, "Reading %s\n" % fn)
+        other = SampleFileRecords(fn)
+        for r in other.records:
+            outFps['train'].write(r + RECORDEND)
+        outClassNames['train'] += other.getKnownClassNames()
+
+    for fp in outFps.values():
+        fp.close()
+
+    # summary report
+    out = sys.stdout
+    out.write("\nSummary:  Stratified split into test, validation, training\n")
+    out.write(time.ctime() + '\n')
+    out.write("Test fraction: %5.3f   Validation fraction: %5.3f   Seed: %d" \
+                % (args.testFraction, args.valFraction, args.seed) + \
+                "   Sample type: %s\n" % sampleObjType.__name__)
+    out.write("Input files: %s\n" % str(args.inputFiles))
+    out.write("Training only files: %s\n" % str(args.otherFiles))
+    out.write("\nInput Totals:\n")
+    out.write(classCountsText(classNames))
+    for k in ['test', 'val', 'train']:
+        pct = 100.0 * assignment.count(k) / max(len(classNames), 1)
+        out.write("\n%s file '%s': (%6.3f%% of inputs)\n" % \
+                                        (k.capitalize(), outFiles[k], pct))
+        out.write(classCountsText(outClassNames[k]))
+    verbose(args, "Total time: %8.3f seconds\n" % (time.time()-startTime))
+#-----------------------------------
+
+def verbose(args, text):
+    if args.verbose:
+        sys.stderr.write(text)
+        sys.stderr.flush()
+#-----------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+"""
+Shared toy corpus and pipeline factories for the automated unit tests.
+
+    docs, yValues   - 8 (preprocessed looking) documents, Yes=1 / No=0
+    getVectorizer() - a CountVectorizer w/ the gxdhtclassifier.py params
+                        that matter for the tests
+    getPipeline()   - [preprocessor,] vectorizer, [featureSelector,]
+                        [packer,] classifier
+"""
+
+from sklearn.pipeline import Pipeline
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.ensemble import RandomForestClassifier
+from htBinaryFeatures import BinaryFeaturePacker, PackedRandomForestClassifier
+from htFeatureSelection import BinaryFeatureSelector
+from htPipelineSteps import SamplePreprocessor
+
+#######################################
+
+docs = [
+    'expression profiling of the developing mouse heart at e10.5',
+    'rna-seq of adult mice liver, livers from knockout mice',
+    'knockdown of pax6 in the embryonic eye, embryonic eyes at e12.5',
+    'human cell lines treated with drug for 24 hours',
+    'embryonic mouse brain development at e14.5 and p0',
+    'yeast stress response time course',
+    'mouse embryonic heart and liver at e12.5',
+    'human liver cell line',
+    ]
+yValues = [1, 0, 1, 0, 1, 0, 1, 0]
+
+def getVectorizer():
+    return CountVectorizer(stop_words='english', binary=True,
+                        ngram_range=(1,2), token_pattern=r'\b([a-z_]\w+)\b')
+
+def getPipeline(packed=True,        # packer + PackedRandomForestClassifier
+                k=None,             # BinaryFeatureSelector(k), None: no step
+                preprocessor=False, # start w/ a SamplePreprocessor step
+                n_estimators=10,
+    ):
+    steps = []
+    if preprocessor:
+        steps.append(('preprocessor', SamplePreprocessor()))
+    steps.append(('vectorizer', getVectorizer()))
+    if k is not None:
+        steps.append(('featureSelector', BinaryFeatureSelector(k=k)))
+    if packed:
+        steps += [('packer', BinaryFeaturePacker()),
+                  ('classifier', PackedRandomForestClassifier(
+                            n_estimators=n_estimators, random_state=1))]
+    else:
+        steps.append(('classifier', RandomForestClassifier(
+                            n_estimators=n_estimators, random_state=1)))
+    return Pipeline(steps)
+#-----------------------------------
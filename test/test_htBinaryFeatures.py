@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htBinaryFeatures.py
+
+usage:  python test_htBinaryFeatures.py [-v]
+"""
+
+import sys
+import unittest
+import numpy as np
+import scipy.sparse
+from sklearn.ensemble import RandomForestClassifier
+import htBinaryFeatures
+from htBinaryFeatures import PackedBinaryMatrix, PackedRandomForestClassifier
+
+#######################################
+
+class PackedBinaryMatrix_tests(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        self.X = scipy.sparse.csr_matrix((rng.rand(50, 21) < 0.2)
+                                                            .astype(np.int64))
+        self.y = rng.randint(0, 2, 50)
+
+    def test_roundTrip(self):
+        packed = PackedBinaryMatrix.fromSparse(self.X)
+        self.assertEqual(packed.shape, (50, 21))
+        self.assertEqual(packed.bits.shape, (50, 3))
+        X = packed.toCsc()
+        self.assertEqual((X.format, X.dtype, X.indices.dtype),
+                                            ('csc', np.float32, np.int32))
+        self.assertEqual((X != self.X).nnz, 0)
+        self.assertTrue(np.array_equal(packed[10:20].getDenseRows(),
+                                                    self.X[10:20].toarray()))
+
+    def test_csrRows(self):
+        packed = PackedBinaryMatrix.fromSparse(self.X)
+        saveBatchSize = htBinaryFeatures.PACK_BATCH_SIZE
+        htBinaryFeatures.PACK_BATCH_SIZE = 7        # several blocks
+        try:
+            for start, end in [(0, None), (10, 20), (45, 60), (30, 30)]:
+                X = packed.getCsrRows(start, end)
+                self.assertEqual(X.shape, self.X[start:end].shape)
+                self.assertEqual((X != self.X[start:end]).nnz, 0)
+                self.assertTrue(X.has_canonical_format)
+        finally:
+            htBinaryFeatures.PACK_BATCH_SIZE = saveBatchSize
+
+    def test_sameBitsAsPackbits(self):
+        X = self.X.copy()
+        X.data[::5] = 0                             # explicit zeros
+        packed = PackedBinaryMatrix.fromSparse(X)
+        self.assertTrue(np.array_equal(packed.bits,
+                                    np.packbits(X.toarray() != 0, axis=1)))
+        # duplicate entries (not canonical CSR) and no rows
+        X = scipy.sparse.csr_matrix(([1, 1, 1], [3, 3, 9], [0, 3, 3]),
+                                                                shape=(2, 12))
+        self.assertTrue(np.array_equal(PackedBinaryMatrix.fromSparse(X)
+                            .getDenseRows(), (X.toarray() != 0)))
+        empty = PackedBinaryMatrix.fromSparse(scipy.sparse.csr_matrix((0, 12)))
+        self.assertEqual(empty.bits.shape, (0, 2))
+
+    def test_samePredictions(self):
+        packed = PackedBinaryMatrix.fromSparse(self.X)
+        rf = RandomForestClassifier(n_estimators=10, random_state=1)
+        rf.fit(self.X, self.y)
+        prf = PackedRandomForestClassifier(n_estimators=10, random_state=1)
+        prf.fit(packed, self.y)
+
+        saveBatchSize = htBinaryFeatures.PREDICT_BATCH_SIZE
+        htBinaryFeatures.PREDICT_BATCH_SIZE = 7     # several batches
+        try:
+            self.assertTrue(np.array_equal(rf.predict_proba(self.X),
+                                            prf.predict_proba(packed)))
+            self.assertTrue(np.array_equal(rf.predict(self.X),
+                                            prf.predict(packed)))
+        finally:
+            htBinaryFeatures.PREDICT_BATCH_SIZE = saveBatchSize
+# end PackedBinaryMatrix_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htCompiledForest.py
+
+usage:  python test_htCompiledForest.py [-v]
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+import numpy as np
+import scipy.sparse
+from sklearn.ensemble import RandomForestClassifier
+from htCompiledForest import CompiledForest
+
+#######################################
+
+class CompiledForest_tests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.RandomState(1)
+        cls.X = scipy.sparse.csr_matrix((rng.rand(200, 30) < 0.3)
+                                                            .astype(np.int64))
+        cls.y = (cls.X[:, 0].toarray().ravel() + rng.randint(0, 2, 200)) > 0
+        cls.forest = RandomForestClassifier(n_estimators=15,
+                        class_weight='balanced', random_state=1, n_jobs=1)
+        cls.forest.fit(cls.X, cls.y)
+
+    def test_sameAsSklearn(self):
+        compiled = CompiledForest.fromForest(self.forest)
+        for X in [self.X, self.X.toarray(), self.X[:1]]:
+            self.assertTrue(np.array_equal(self.forest.predict_proba(X),
+                                            compiled.predict_proba(X)))
+            self.assertTrue(np.array_equal(self.forest.predict(X),
+                                            compiled.predict(X)))
+
+    def test_counts(self):
+        # counts above 255 must not wrap around as they would in uint8
+        rng = np.random.RandomState(2)
+        X = scipy.sparse.csr_matrix(rng.randint(0, 600, (200, 5)) *
+                                            (rng.rand(200, 5) < 0.5))
+        y = X[:, 0].toarray().ravel() > 300
+        forest = RandomForestClassifier(n_estimators=5, random_state=1,
+                                                    n_jobs=1).fit(X, y)
+        compiled = CompiledForest.fromForest(forest)
+        self.assertTrue(np.array_equal(forest.predict_proba(X),
+                                            compiled.predict_proba(X)))
+
+    def test_saveLoad(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            fileName = os.path.join(tmpDir, 'forest.arrays')
+            CompiledForest.fromForest(self.forest).save(fileName)
+            compiled = CompiledForest.load(fileName)
+            self.assertTrue(np.array_equal(self.forest.predict_proba(self.X),
+                                            compiled.predict_proba(self.X)))
+            self.assertEqual(list(compiled.classes_),
+                                            list(self.forest.classes_))
+            del compiled
+# end CompiledForest_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
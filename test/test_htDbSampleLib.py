@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htDbSampleLib.py
+
+usage:  python test_htDbSampleLib.py [-v]
+"""
+
+import sys
+import os
+import argparse
+import unittest
+import htDbSampleLib
+from htDbSampleLib import sqlRecord2ClassifiedSample, cleanUpTextField
+
+#######################################
+
+def getRecord(**kwargs):
+    r = {'id': 'GSE1', 'knownclassname': 'Yes', 'curationstate': 'Done',
+         'studytype': 'Baseline', 'experimenttype': 'RNA-Seq',
+         'modification_date': '2021-01-01', 'titlelength': 5,
+         'descriptionlength': 11, 'title': 'title', 'description': 'a|desc\n.'}
+    r.update(kwargs)
+    return r
+
+class DbArgs_tests(unittest.TestCase):
+
+    def getArgs(self, argv):
+        parser = argparse.ArgumentParser()
+        htDbSampleLib.addDbArgs(parser)
+        return htDbSampleLib.setDbArgs(parser.parse_args(argv))
+
+    def test_shortcut(self):
+        args = self.getArgs(['-s', 'dev', '-d', 'ignored'])
+        self.assertEqual((args.host, args.db), ('mgi-testdb4.jax.org', 'jak'))
+
+    def test_server(self):
+        args = self.getArgs(['-s', 'myhost', '-d', 'mgd'])
+        self.assertEqual((args.host, args.db), ('myhost', 'mgd'))
+# end DbArgs_tests ------------------------
+
+class SqlRecord_tests(unittest.TestCase):
+
+    def test_knownClassName(self):
+        s = sqlRecord2ClassifiedSample(getRecord(), '')
+        self.assertEqual(s.getKnownClassName(), 'Yes')
+        s = sqlRecord2ClassifiedSample(getRecord(), '', knownClassName='No')
+        self.assertEqual(s.getKnownClassName(), 'No')
+
+    def test_rawSampleText(self):
+        s = sqlRecord2ClassifiedSample(getRecord(), 'raw text')
+        self.assertTrue(s.getDescription().endswith(' .. raw text'))
+        s = sqlRecord2ClassifiedSample(getRecord(), '')
+        self.assertNotIn(' .. ', s.getDescription())
+
+    def test_cleanUpTextField(self):
+        r = getRecord(title=None)
+        self.assertEqual(cleanUpTextField(r, 'title'), '')
+        text = cleanUpTextField(r, 'description')
+        self.assertNotIn('|', text)
+        self.assertEqual(cleanUpTextField(r, 'description', maxTextLength=3),
+                                                                        'a d')
+# end SqlRecord_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
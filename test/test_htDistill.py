@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htDistill.py
+
+usage:  python test_htDistill.py [-v]
+"""
+
+import sys
+import unittest
+import numpy as np
+from htTestLib import docs, yValues, getPipeline
+from htDistill import DistilledLinearClassifier, DistilledForestClassifier, \
+                        distill, getMetricsText
+
+#######################################
+
+def getTeacher():
+    return getPipeline(packed=False).fit(docs, yValues)
+
+class Distill_tests(unittest.TestCase):
+
+    def test_linearStudent(self):
+        teacher = getTeacher()
+        student = distill(teacher, docs, 'linear')
+        proba = student.predict_proba(docs)
+        self.assertEqual(proba.shape, (len(docs), 2))
+        self.assertTrue(np.allclose(proba.sum(axis=1), 1.0))
+        self.assertEqual(list(student.predict(docs)),
+                                            list(teacher.predict(docs)))
+        self.assertEqual(student.named_steps['vectorizer'].vocabulary_,
+                            teacher.named_steps['vectorizer'].vocabulary_)
+        self.assertFalse(hasattr(student.named_steps['vectorizer'],
+                                                            'stop_words_'))
+
+    def test_forestStudent(self):
+        teacher = getTeacher()
+        student = distill(teacher, docs,
+                DistilledForestClassifier(n_estimators=10, min_samples_leaf=1,
+                                                        random_state=1))
+        self.assertEqual(list(student.predict(docs)),
+                                            list(teacher.predict(docs)))
+        self.assertEqual(list(student.steps[-1][1].classes_), [0, 1])
+
+    def test_featureSelector(self):
+        teacher = getPipeline(k=5).fit(docs, yValues)
+        student = distill(teacher, docs, 'linear')
+        self.assertEqual([name for name, step in student.steps],
+                            ['vectorizer', 'featureSelector', 'classifier'])
+        self.assertEqual(list(student.named_steps['featureSelector']
+                                                                .selected_),
+                    list(teacher.named_steps['featureSelector'].selected_))
+        self.assertEqual(student.steps[-1][1].model_.coef_.shape, (1, 5))
+        self.assertEqual(list(student.predict(docs)),
+                                            list(teacher.predict(docs)))
+
+    def test_softTargets(self):
+        X = np.array([[1, 0], [0, 1], [1, 1]])
+        student = DistilledLinearClassifier(C=100.0).fit(X, [0.9, 0.1, 0.5])
+        proba = student.predict_proba(X)[:, 1]
+        self.assertTrue(proba[0] > 0.5 > proba[1])
+        self.assertRaises(ValueError, DistilledLinearClassifier().fit, X,
+                                                            [0, 2, 1])
+
+    def test_metricsText(self):
+        self.assertEqual(getMetricsText('Valid', [1, 1, 0, 0], [1, 0, 0, 0]),
+                    'Valid (Yes) F2: 0.5556    P: 1.0000    R: 0.5000    ' +
+                    'NPV: 0.6667')
+# end Distill_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htFeatureCache.py
+
+usage:  python test_htFeatureCache.py [-v]
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+import numpy as np
+import scipy.sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from htFeatureCache import FeatureMatrixCache, CachedCountVectorizer
+import htTestLib
+
+#######################################
+
+docs = htTestLib.docs[:4]
+params = {'binary': True, 'ngram_range': (1,2), 'stop_words': 'english'}
+
+class FeatureMatrixCache_tests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.cache = FeatureMatrixCache(self.tmpDir.name)
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_keyStability(self):
+        key = FeatureMatrixCache.getKey('fit', params, docs)
+        self.assertEqual(key, FeatureMatrixCache.getKey('fit',
+                                dict(reversed(list(params.items()))), docs))
+        self.assertNotEqual(key, FeatureMatrixCache.getKey('transform',
+                                                            params, docs))
+        self.assertNotEqual(key, FeatureMatrixCache.getKey('fit',
+                                dict(params, binary=False), docs))
+        self.assertNotEqual(key, FeatureMatrixCache.getKey('fit', params,
+                                                            docs[:-1]))
+        # document boundaries are part of the key
+        self.assertNotEqual(FeatureMatrixCache.getKey('fit', params,
+                                                                ['ab', 'c']),
+                        FeatureMatrixCache.getKey('fit', params, ['a', 'bc']))
+
+    def test_transformKeyHasVocabulary(self):
+        a = FeatureMatrixCache.getKey('transform', params, docs, ['a', 'b'])
+        b = FeatureMatrixCache.getKey('transform', params, docs, ['a', 'c'])
+        self.assertNotEqual(a, b)
+        self.assertNotEqual(a, FeatureMatrixCache.getKey('transform', params,
+                                                                        docs))
+
+    def test_hitMiss(self):
+        key = FeatureMatrixCache.getKey('fit', params, docs)
+        self.assertIsNone(self.cache.load(key))
+        X = scipy.sparse.csr_matrix(np.array([[1, 0], [0, 1]]))
+        self.cache.save(key, X, ['a', 'b'])
+        hitX, featureNames = self.cache.load(key)
+        self.assertEqual((hitX != X).nnz, 0)
+        self.assertEqual(featureNames, ['a', 'b'])
+
+        key2 = FeatureMatrixCache.getKey('transform', params, docs, ['a'])
+        self.cache.save(key2, X)
+        self.assertIsNone(self.cache.load(key2)[1])
+
+    def test_lruEviction(self):
+        X = scipy.sparse.csr_matrix(np.eye(50))
+        keys = ['k%d' % i for i in range(3)]
+        for i, key in enumerate(keys):
+            self.cache.save(key, X, ['f%d' % j for j in range(50)])
+            for suffix in ['.npz', '.vocab.json']:
+                os.utime(os.path.join(self.tmpDir.name, key + suffix),
+                                                    (1000 + i, 1000 + i))
+        entryBytes = sum([os.path.getsize(os.path.join(self.tmpDir.name,
+                                'k0' + suffix)) for suffix in ['.npz',
+                                                            '.vocab.json']])
+        self.cache.load('k0')           # now k0 is the most recently used
+        self.cache.maxBytes = 2 * entryBytes
+        self.cache.evict()
+        self.assertIsNotNone(self.cache.load('k0'))
+        self.assertIsNone(self.cache.load('k1'))
+        self.assertIsNotNone(self.cache.load('k2'))
+
+    def test_tmpFiles(self):
+        old = [os.path.join(self.tmpDir.name, 'k0' + suffix) \
+                                for suffix in ['.tmp.npz', '.vocab.json.tmp']]
+        new = os.path.join(self.tmpDir.name, 'k1.tmp.npz')
+        for fn in old + [new]:
+            with open(fn, 'wb') as fp:
+                fp.write(b'x' * 1000)
+        for fn in old:
+            os.utime(fn, (1000, 1000))
+        self.cache.maxBytes = 10
+        self.cache.evict()
+        self.assertEqual(os.listdir(self.tmpDir.name), ['k1.tmp.npz'])
+
+    def test_sklearnVersionInKey(self):
+        import htFeatureCache
+        key = FeatureMatrixCache.getKey('fit', params, docs)
+        saveVersion = htFeatureCache.sklearn.__version__
+        try:
+            htFeatureCache.sklearn.__version__ = '0.0.1'
+            self.assertNotEqual(key, FeatureMatrixCache.getKey('fit', params,
+                                                                        docs))
+        finally:
+            htFeatureCache.sklearn.__version__ = saveVersion
+# end FeatureMatrixCache_tests ------------------------
+
+class CachedCountVectorizer_tests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_sameAsCountVectorizer(self):
+        plain = CountVectorizer(**params)
+        expected = plain.fit_transform(docs)
+        newDocs = docs[:2] + ['mouse heart and liver']
+        expectedNew = plain.transform(newDocs)
+
+        for run in ['miss', 'hit']:
+            cached = CachedCountVectorizer(cacheDir=self.tmpDir.name, **params)
+            X = cached.fit_transform(docs)
+            self.assertEqual((X != expected).nnz, 0, run)
+            self.assertEqual(cached.vocabulary_, plain.vocabulary_, run)
+            self.assertEqual((cached.transform(newDocs) != expectedNew).nnz,
+                                                                    0, run)
+        self.assertEqual(len([f for f in os.listdir(self.tmpDir.name) \
+                                            if f.endswith('.npz')]), 2)
+
+    def test_noCacheDir(self):
+        os.environ.pop('GXDHT_FEATURE_CACHE', None)
+        cached = CachedCountVectorizer(**params)
+        X = cached.fit_transform(docs)
+        self.assertEqual((X != CountVectorizer(**params).fit_transform(docs))
+                                                                    .nnz, 0)
+        self.assertEqual(os.listdir(self.tmpDir.name), [])
+# end CachedCountVectorizer_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htFeatureSelection.py
+
+usage:  python test_htFeatureSelection.py [-v]
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+import numpy as np
+import scipy.sparse
+from sklearn.feature_selection import chi2
+from sklearn.metrics import mutual_info_score
+from htFeatureSelection import getBinaryFeatureScores, BinaryFeatureSelector,\
+                                foldFeatureSelector, splitAtVectorizer
+from htPruneModel import pruneModel
+from htModelArtifact import writeModelArtifact, ModelArtifact
+from htTestLib import docs, yValues, getPipeline
+
+#######################################
+
+class BinaryFeatureScores_tests(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.X = (rng.rand(200, 30) < 0.2).astype(np.int64)
+        self.X[:, 5] = 0                # never present
+        self.X[:, 6] = 1                # always present
+        self.y = rng.randint(0, 2, 200)
+
+    def test_chi2(self):
+        scores = getBinaryFeatureScores(scipy.sparse.csr_matrix(self.X),
+                                                                self.y, 'chi2')
+        expected = np.nan_to_num(chi2(self.X, self.y)[0])
+        self.assertTrue(np.allclose(scores, expected))
+
+    def test_mutualInfo(self):
+        scores = getBinaryFeatureScores(self.X, self.y, 'mutual_info')
+        expected = [mutual_info_score(self.X[:, j], self.y) \
+                                                for j in range(self.X.shape[1])]
+        self.assertTrue(np.allclose(scores, expected))
+
+    def test_unknownScore(self):
+        self.assertRaises(ValueError, getBinaryFeatureScores, self.X, self.y,
+                                                                    'anova')
+# end BinaryFeatureScores_tests ------------------------
+
+class BinaryFeatureSelector_tests(unittest.TestCase):
+
+    def test_selectK(self):
+        X = scipy.sparse.csr_matrix(np.array([[1, 1, 0, 1],
+                                              [1, 0, 0, 1],
+                                              [0, 1, 1, 1],
+                                              [0, 0, 1, 1]]))
+        y = [1, 1, 0, 0]
+        selector = BinaryFeatureSelector(k=2).fit(X, y)
+        self.assertEqual(list(selector.selected_), [0, 2])
+        self.assertEqual(selector.transform(X).toarray().tolist(),
+                                        [[1, 0], [1, 0], [0, 1], [0, 1]])
+        self.assertEqual(list(selector.get_support()),
+                                                [True, False, True, False])
+        selector = BinaryFeatureSelector(k='all').fit(X, y)
+        self.assertEqual((selector.transform(X) != X).nnz, 0)
+
+    def test_foldFeatureSelector(self):
+        pipeline = getPipeline(k=10).fit(docs, yValues)
+        folded = foldFeatureSelector(pipeline)
+        self.assertNotIn('featureSelector', folded.named_steps)
+        self.assertIn('featureSelector', pipeline.named_steps)
+        self.assertEqual(len(folded.named_steps['vectorizer'].vocabulary_), 10)
+        newDocs = docs + ['unknown words only', 'mouse liver at e12.5']
+        self.assertTrue(np.array_equal(pipeline.predict_proba(newDocs),
+                                            folded.predict_proba(newDocs)))
+        self.assertIs(foldFeatureSelector(folded), folded)
+
+    def test_pruneAndArtifact(self):
+        pipeline = getPipeline(k=10).fit(docs, yValues)
+        newDocs = docs + ['unknown words only', 'mouse liver at e12.5']
+        expected = pipeline.predict_proba(newDocs)
+        pruned = pruneModel(pipeline)
+        self.assertTrue(np.array_equal(expected,
+                                            pruned.predict_proba(newDocs)))
+        with tempfile.TemporaryDirectory() as tmpDir:
+            fileName = os.path.join(tmpDir, 'model.artifact')
+            writeModelArtifact(pipeline, fileName)
+            model = ModelArtifact.load(fileName)
+            self.assertTrue(np.array_equal(expected,
+                                                model.predict_proba(newDocs)))
+            del model
+
+    def test_splitAtVectorizer(self):
+        pipeline = getPipeline(packed=False, k=5, preprocessor=True)
+        featurizer, rest = splitAtVectorizer(pipeline)
+        self.assertEqual([name for name, step in featurizer.steps],
+                                            ['preprocessor', 'vectorizer'])
+        self.assertEqual([name for name, step in rest], ['classifier'])
+# end BinaryFeatureSelector_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htFeaturizer.py
+
+usage:  python test_htFeaturizer.py [-v]
+"""
+
+import sys
+import unittest
+from sklearn.feature_extraction.text import CountVectorizer
+import htMLsample as mlSampleLib
+from htFeaturizer import Featurizer
+
+#######################################
+
+titles = [
+    'Expression profiling of the developing mouse heart at E10.5',
+    'RNA-seq of adult mice liver, see https://example.org/x for details',
+    'Knockdown of Pax6 in the embryonic eye',
+    'The the of and',
+    ]
+descriptions = [
+    'Hearts were collected from embryos; the expression was profiled.',
+    'Livers from wild type and knockout mice were sequenced',
+    'Embryonic eyes at E12.5 were dissected, RNA was profiled',
+    '',
+    ]
+
+class Featurizer_tests(unittest.TestCase):
+
+    def getTwoStage(self, vectorizer):
+        docs = []
+        for t, d in zip(titles, descriptions):
+            s = mlSampleLib.HtSample()
+            s.setTitle(t)
+            s.setDescription(d)
+            docs.append(s.standard().constructDoc())
+        return vectorizer.fit_transform(docs)
+
+    def test_sameAsTwoStage(self):
+        for binary in [True, False]:
+            vectorizer = CountVectorizer(stop_words='english', binary=binary,
+                        ngram_range=(1,2), token_pattern=r'\b([a-z_]\w+)\b')
+            X = self.getTwoStage(vectorizer)
+            Xf = Featurizer(vectorizer).featurize(titles, descriptions)
+            self.assertEqual(X.shape, Xf.shape)
+            self.assertEqual((X != Xf).nnz, 0)
+
+    def test_bigramAcrossTitleAndDescription(self):
+        vectorizer = CountVectorizer(stop_words='english', binary=True,
+                        ngram_range=(1,2), token_pattern=r'\b([a-z_]\w+)\b')
+        self.getTwoStage(vectorizer)        # has 'pax6 embryon' w/o 'in the'
+        featurizer = Featurizer(vectorizer)
+        X = featurizer.featurize(['knockdown of pax6'], ['embryonic eye'])
+        f = vectorizer.vocabulary_['pax6 embryon']
+        self.assertEqual(X[0, f], 1)
+# end Featurizer_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
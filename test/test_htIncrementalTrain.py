@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htIncrementalTrain.py
+
+usage:  python test_htIncrementalTrain.py [-v]
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+import numpy as np
+import htTestLib
+from htTestLib import getPipeline
+from htIncrementalTrain import TrainingMatrix, incrementalFit, getFeaturizer
+
+#######################################
+
+docs = htTestLib.docs[:6]
+yValues = htTestLib.yValues[:6]
+ids = ['GSE1', 'GSE2', 'GSE3', 'GSE4', 'GSE5', 'GSE6']
+
+newDocs = htTestLib.docs[6:] + ['yeast heat shock time course']
+newYValues = [1, 0, 0]
+newIds = ['GSE7', 'GSE8', 'GSE6']        # GSE6 is re-curated
+
+class TrainingMatrix_tests(unittest.TestCase):
+
+    def setUp(self):
+        self.pipeline = getPipeline().fit(docs, yValues)
+        self.vectorizer = self.pipeline.named_steps['vectorizer']
+
+    def test_appendReplacesIDs(self):
+        matrix = TrainingMatrix(self.vectorizer.transform(docs), yValues, ids)
+        numReplaced = matrix.append(TrainingMatrix(
+                self.vectorizer.transform(newDocs), newYValues, newIds))
+        self.assertEqual(numReplaced, 1)
+        self.assertEqual(list(matrix.ids),
+                    ['GSE1', 'GSE2', 'GSE3', 'GSE4', 'GSE5'] + newIds)
+        self.assertEqual(list(matrix.y), yValues[:5] + newYValues)
+        expected = self.vectorizer.transform(docs[:5] + newDocs)
+        self.assertEqual((matrix.X != expected).nnz, 0)
+
+    def test_saveLoad(self):
+        matrix = TrainingMatrix(self.vectorizer.transform(docs), yValues, ids)
+        with tempfile.TemporaryDirectory() as tmpDir:
+            fileName = os.path.join(tmpDir, 'matrix')
+            matrix.save(fileName)
+            loaded = TrainingMatrix.load(fileName)
+        self.assertEqual((matrix.X != loaded.X).nnz, 0)
+        self.assertEqual(matrix.X.shape, loaded.X.shape)
+        self.assertEqual(list(matrix.y), list(loaded.y))
+        self.assertEqual(list(matrix.ids), list(loaded.ids))
+# end TrainingMatrix_tests ------------------------
+
+class IncrementalFit_tests(unittest.TestCase):
+
+    def setUp(self):
+        self.pipeline = getPipeline().fit(docs, yValues)
+        vectorizer = self.pipeline.named_steps['vectorizer']
+        self.matrix = TrainingMatrix(vectorizer.transform(docs), yValues, ids)
+        self.matrix.append(TrainingMatrix(vectorizer.transform(newDocs),
+                                                        newYValues, newIds))
+
+    def test_replaceOldestTrees(self):
+        forest = self.pipeline.named_steps['classifier']
+        oldTrees = list(forest.estimators_)
+        vocabulary = dict(self.pipeline.named_steps['vectorizer'].vocabulary_)
+        incrementalFit(self.pipeline, self.matrix, 0.3)
+
+        self.assertEqual(len(forest.estimators_), 10)
+        self.assertEqual(forest.estimators_[:7], oldTrees[3:])
+        for tree in forest.estimators_[7:]:
+            self.assertNotIn(tree, oldTrees)
+        self.assertEqual(forest.warm_start, False)
+        self.assertEqual(forest.random_state, 1)
+        self.assertEqual(self.pipeline.named_steps['vectorizer'].vocabulary_,
+                                                                    vocabulary)
+        self.assertEqual(self.pipeline.predict_proba(docs).shape, (6, 2))
+
+    def test_newSeedsEachUpdate(self):
+        forest = self.pipeline.named_steps['classifier']
+        incrementalFit(self.pipeline, self.matrix, 0.2)
+        incrementalFit(self.pipeline, self.matrix, 0.2)
+        seeds = [tree.random_state for tree in forest.estimators_]
+        self.assertEqual(len(set(seeds)), 10)
+
+    def test_preprocessorStep(self):
+        pipeline = getPipeline(preprocessor=True).fit(docs, yValues)
+        featurizer = getFeaturizer(pipeline)
+        self.assertEqual([name for name, step in featurizer.steps],
+                                                ['preprocessor', 'vectorizer'])
+        matrix = TrainingMatrix(featurizer.transform(docs), yValues, ids)
+        matrix.append(TrainingMatrix(featurizer.transform(newDocs),
+                                                        newYValues, newIds))
+        incrementalFit(pipeline, matrix, 0.5)
+        forest = pipeline.named_steps['classifier']
+        self.assertEqual(len(forest.estimators_), 10)
+        self.assertEqual(pipeline.predict_proba(newDocs).shape, (3, 2))
+
+    def test_replaceNone(self):
+        forest = self.pipeline.named_steps['classifier']
+        oldTrees = list(forest.estimators_)
+        incrementalFit(self.pipeline, self.matrix, 0.0)
+        self.assertEqual(forest.estimators_, oldTrees)
+# end IncrementalFit_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
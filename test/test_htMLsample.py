@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htMLsample.py
+
+usage:  python test_htMLsample.py [-v]
+"""
+
+import sys
+import os
+import io
+import tempfile
+import unittest
+import htMLsample as mlSampleLib
+from htMLsample import ClassifiedHtSample, readSampleFile
+
+#######################################
+
+def buildSampleFileText(records):
+    """ Return text of a ClassifiedHtSample file with the given records
+        records = list of lists of field values
+    """
+    text = '#meta  sampleObjType=ClassifiedHtSample moduleName=htMLsample\n'
+    text += '|'.join(ClassifiedHtSample.fieldNames) + '\n'
+    for r in records:
+        text += '|'.join(r) + '\n'
+    return text
+
+def buildRecord(knownClassName, ID, title, description):
+    return [knownClassName, ID, 'Done', 'Baseline', 'RNA-Seq', '2021-01-01',
+            str(len(title)), str(len(description)), title, description]
+
+records = [
+    buildRecord('Yes', 'GSE1', 'title one', 'description one'),
+    buildRecord('No',  'GSE2', 'title two', 'description two'),
+    buildRecord('No',  'E-MEXP-3', 'title three', ''),
+    ]
+
+class ReadSampleFile_tests(unittest.TestCase):
+
+    def test_columnar(self):
+        cols = readSampleFile(io.StringIO(buildSampleFileText(records)),
+                                                            columnar=True)
+        self.assertEqual(cols.getNumSamples(), 3)
+        self.assertEqual(cols.getSampleIDs(), ['GSE1', 'GSE2', 'E-MEXP-3'])
+        self.assertEqual(cols.getKnownClassNames(), ['Yes', 'No', 'No'])
+        self.assertEqual(cols.getKnownYvalues(), [1, 0, 0])
+        self.assertEqual(cols.getTitles()[2], 'title three')
+        self.assertEqual(cols.getDocuments()[0], 'title one\ndescription one')
+        self.assertEqual(cols.getColumn('studytype'), ['Baseline']*3)
+        self.assertEqual(cols.getMetaItem('moduleName'), 'htMLsample')
+
+    def test_samples(self):
+        sampleSet = readSampleFile(io.StringIO(buildSampleFileText(records)))
+        samples = sampleSet.getSamples()
+        self.assertEqual(len(samples), 3)
+        self.assertEqual(samples[1].getTitle(), 'title two')
+        self.assertEqual(samples[2].getDescription(), '')
+        self.assertEqual(samples[0].constructDoc(), 'title one\ndescription one')
+
+    def test_empty(self):
+        cols = readSampleFile(io.StringIO(buildSampleFileText([])),
+                                                            columnar=True)
+        self.assertEqual(cols.getNumSamples(), 0)
+        self.assertEqual(cols.getDocuments(), [])
+
+    def test_measureMemoryEmpty(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            fileName = os.path.join(tmpDir, 'empty.txt')
+            with open(fileName, 'w') as fp:
+                fp.write(buildSampleFileText([]))
+            text = mlSampleLib.measureMemory(fileName)
+        self.assertEqual(text.count('no samples'), 2)
+
+    def test_badFieldCount(self):
+        bad = records + [['Yes', 'GSE4', 'too few fields']]
+        with self.assertRaises(ValueError):
+            readSampleFile(io.StringIO(buildSampleFileText(bad)))
+
+    def test_badHeader(self):
+        text = buildSampleFileText(records).replace('knownClassName|', '')
+        with self.assertRaises(ValueError):
+            readSampleFile(io.StringIO(text), columnar=True)
+# end ReadSampleFile_tests ------------------------
+
+class SampleColumnsRowView_tests(unittest.TestCase):
+
+    def setUp(self):
+        self.cols = readSampleFile(io.StringIO(buildSampleFileText(records)),
+                                                            columnar=True)
+    def test_getters(self):
+        sample = self.cols.getSample(1)
+        self.assertIsInstance(sample, ClassifiedHtSample)
+        self.assertEqual(sample.getID(), 'GSE2')
+        self.assertEqual(sample.getTitle(), 'title two')
+        self.assertEqual(sample.getKnownClassName(), 'No')
+        self.assertEqual(sample.getExtraInfo()[0], 'Done')
+        self.assertEqual(sample.constructDoc(), 'title two\ndescription two')
+        self.assertFalse(hasattr(sample, '__dict__') and sample.__dict__)
+
+    def test_settersWriteColumns(self):
+        sample = self.cols.getSample(0)
+        sample.setTitle('new title')
+        self.assertEqual(self.cols.getTitles()[0], 'new title')
+        self.assertEqual(self.cols.getSample(0).getTitle(), 'new title')
+
+    def test_preprocess(self):
+        self.cols.preprocess(['truncateText'])
+        self.assertEqual(self.cols.getTitles(), ['title one', 'title two',
+                                                            'title thre'])
+        self.assertEqual(self.cols.getDescriptions()[0], 'description one')
+
+    def test_sharedValues(self):
+        studytypes = self.cols.getColumn('studytype')
+        self.assertIs(studytypes[0], studytypes[2])
+# end SampleColumnsRowView_tests ------------------------
+
+class CompactNgrams_tests(unittest.TestCase):
+
+    def getFeatures(self, docs):
+        from sklearn.feature_extraction.text import CountVectorizer
+        vectorizer = CountVectorizer(stop_words='english', binary=True,
+                ngram_range=(1,2), token_pattern=r'\b([a-z_]\w+)\b')
+        X = vectorizer.fit_transform(docs)
+        return vectorizer, X
+
+    def test_sameFeatures(self):
+        recs = [
+            buildRecord('Yes', 'GSE1', 'Pax6 mouse embryo',
+                'pax6 in the mouse embryo. Sample: mouse embryo E10.5 eye; ' +
+                'sample: mouse embryo E10.5 eye; sample: mouse lens E12.5 eye'),
+            buildRecord('No', 'GSE2', 'Liver of adult mice',
+                'adult liver adult liver adult liver of the adult mice, ' +
+                'liver liver adult'),
+            buildRecord('No', 'GSE3', '', 'the cell line; cell line cell'),
+            buildRecord('No', 'GSE4', 'only a title', ''),
+            ]
+        cols = readSampleFile(io.StringIO(buildSampleFileText(recs)),
+                                                            columnar=True)
+        docs = cols.getDocuments()
+        vectorizer, X = self.getFeatures(docs)
+        cols.preprocess(['compactNgrams'])
+        compacted = cols.getDocuments()
+        self.assertEqual((X != vectorizer.transform(compacted)).nnz, 0)
+        self.assertEqual(cols.getTitles()[0], 'Pax6 mouse embryo')
+        self.assertLess(len(cols.getDescriptions()[0]), len(recs[0][-1]))
+        self.assertEqual(cols.getDescriptions()[1],
+                                        'adult liver adult mice liver liver')
+# end CompactNgrams_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
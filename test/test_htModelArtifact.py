@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htModelArtifact.py
+
+usage:  python test_htModelArtifact.py [-v]
+"""
+
+import sys
+import os
+import tempfile
+import unittest
+import numpy as np
+from htModelArtifact import writeModelArtifact, ModelArtifact
+from htTestLib import docs, yValues, getPipeline
+
+#######################################
+
+class ModelArtifact_tests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.fileName = os.path.join(self.tmpDir.name, 'model.artifact')
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_samePredictions(self):
+        pipeline = getPipeline().fit(docs, yValues)
+        writeModelArtifact(pipeline, self.fileName)
+        model = ModelArtifact.load(self.fileName)
+
+        newDocs = docs + ['unknown words only', '', 'mouse mouse heart heart']
+        X = pipeline.named_steps['vectorizer'].transform(newDocs)
+        self.assertEqual((X != model.transform(newDocs)).nnz, 0)
+        self.assertTrue(np.array_equal(pipeline.predict_proba(newDocs),
+                                            model.predict_proba(newDocs)))
+        self.assertEqual(list(model.predict(newDocs)),
+                                            list(pipeline.predict(newDocs)))
+
+    def test_preprocessorStep(self):
+        rawDocs = ['Heart of the mouse embryo\nsee https://example.org',
+                   'Human cells\nHeLa cells treated']
+        pipeline = getPipeline(packed=False, preprocessor=True,
+                                    n_estimators=5).fit(rawDocs, [1, 0])
+        writeModelArtifact(pipeline, self.fileName)
+        model = ModelArtifact.load(self.fileName)
+        self.assertEqual(model.preprocessors, ['standard'])
+        self.assertTrue(np.array_equal(pipeline.predict_proba(rawDocs),
+                                            model.predict_proba(rawDocs)))
+# end ModelArtifact_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
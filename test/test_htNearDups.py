@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htNearDups.py
+
+usage:  python test_htNearDups.py [-v]
+"""
+
+import sys
+import unittest
+import numpy as np
+from htNearDups import getShingles, MinHashIndex, getDocClusters, \
+                        predictDeduplicated, getMultiClusters, getMixedClusters
+
+#######################################
+
+base = ' '.join(['transcript profil of __mice embryon heart at e10.5',
+        'rna was isol from wild type and mutant heart at sever stage',
+        'and hybrid to affymetrix mous genom arrays'])
+docs = [
+    base,
+    'yeast stress respons time cours in rich and poor media over two days',
+    base + ' seri',                                 # near-duplicate of 0
+    'human cell line treat with drug for 24 hour and rna seq profil',
+    base.replace('sever stage', 'two stage'),       # near-duplicate of 0
+    '',
+    '',
+    ]
+
+class MinHash_tests(unittest.TestCase):
+
+    def test_shingles(self):
+        self.assertEqual(len(getShingles('a b c d')), 2)
+        self.assertEqual(len(getShingles('a b')), 1)
+        self.assertEqual(len(getShingles('a b c a b c')), 3)
+        self.assertEqual(len(getShingles('   ')), 0)
+
+    def test_similarity(self):
+        index = MinHashIndex()
+        self.assertEqual(index.add(docs[:3]), [0, 1, 2])
+        self.assertEqual(index.add(docs[3:5]), [3, 4])
+        self.assertEqual(index.getSimilarity(0, 0), 1.0)
+        self.assertGreater(index.getSimilarity(0, 2), 0.8)
+        self.assertLess(index.getSimilarity(0, 1), 0.2)
+
+    def test_clusters(self):
+        reps = getDocClusters(docs, threshold=0.6)
+        self.assertEqual(list(reps), [0, 1, 0, 3, 0, 5, 6])
+        self.assertEqual(getMultiClusters(reps), [[0, 2, 4]])
+        self.assertEqual(getMixedClusters(['Yes','No','Yes','No','No','No',
+                                            'No'], reps), [[0, 2, 4]])
+        self.assertEqual(getMixedClusters(['Yes','No','Yes','No','Yes','No',
+                                            'No'], reps), [])
+
+    def test_predictDeduplicated(self):
+        class FakeModel (object):
+            def __init__(self): self.numScored = 0
+            def predict_proba(self, docs):
+                self.numScored += len(docs)
+                return np.array([[len(d), 1.0] for d in docs])
+        model = FakeModel()
+        proba, reps = predictDeduplicated(model, docs, threshold=0.6)
+        self.assertEqual(model.numScored, 5)
+        self.assertEqual(list(proba[:, 0]),
+                            [len(docs[r]) for r in [0, 1, 0, 3, 0, 5, 6]])
+# end MinHash_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
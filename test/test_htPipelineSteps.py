@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htPipelineSteps.py
+
+usage:  python test_htPipelineSteps.py [-v]
+"""
+
+import sys
+import pickle
+import unittest
+from sklearn.pipeline import Pipeline
+from sklearn.feature_extraction.text import CountVectorizer
+import htMLsample as mlSampleLib
+from htPipelineSteps import SamplePreprocessor
+
+#######################################
+
+rawDocs = [
+    'Expression profiling of the developing mouse heart at E10.5\n' +
+        'Hearts were collected from embryos; see https://example.org/x',
+    'RNA-seq of adult mice liver\nLivers from knockout mice were sequenced',
+    'Knockdown of Pax6 in the embryonic eye\n',
+    'Human cell lines\nHeLa cells treated with drug\nfor 24 hours',
+    ]
+
+def getPreprocessed(docs):
+    results = []
+    for doc in docs:
+        title, description = doc.split('\n', 1)
+        s = mlSampleLib.HtSample()
+        s.setFields({'ID': '', 'title': title, 'description': description})
+        results.append(s.standard().constructDoc())
+    return results
+
+class SamplePreprocessor_tests(unittest.TestCase):
+
+    def test_sameAsPreprocessing(self):
+        expected = getPreprocessed(rawDocs)
+        self.assertEqual(SamplePreprocessor().fit_transform(rawDocs), expected)
+        parallel = SamplePreprocessor(n_jobs=2, batchSize=1)
+        self.assertEqual(parallel.fit_transform(rawDocs), expected)
+
+    def test_inPipeline(self):
+        pipeline = Pipeline([('preprocessor', SamplePreprocessor()),
+                             ('vectorizer', CountVectorizer(binary=True))])
+        X = pickle.loads(pickle.dumps(pipeline.fit(rawDocs))).transform(rawDocs)
+        vectorizer = CountVectorizer(binary=True)
+        expected = vectorizer.fit_transform(getPreprocessed(rawDocs))
+        self.assertEqual((X != expected).nnz, 0)
+
+    def test_badPreprocessor(self):
+        with self.assertRaises(ValueError):
+            SamplePreprocessor(preprocessors=('noSuchThing',)).fit(rawDocs)
+# end SamplePreprocessor_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htPredictCache.py
+
+usage:  python test_htPredictCache.py [-v]
+"""
+
+import sys
+import os
+import io
+import pickle
+import tempfile
+import unittest
+from sklearn.pipeline import Pipeline
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.ensemble import RandomForestClassifier
+from htMLsample import ClassifiedHtSample, HtSample
+from htPredictCache import predictFile, getModelHash, PredictionCache, \
+                            getPipelineStepSourceFiles
+
+#######################################
+
+def buildSampleFileText(records):
+    text = '#meta  sampleObjType=ClassifiedHtSample moduleName=htMLsample\n'
+    text += '|'.join(ClassifiedHtSample.fieldNames) + '\n'
+    for r in records:
+        text += '|'.join(r) + '\n'
+    return text
+
+def buildRecord(knownClassName, ID, title, description):
+    return [knownClassName, ID, 'Done', 'Baseline', 'RNA-Seq', '2021-01-01',
+            str(len(title)), str(len(description)), title, description]
+
+records = [
+    buildRecord('Yes', 'GSE1', 'Developing mouse heart', 'embryos at E10.5'),
+    buildRecord('No',  'GSE2', 'Human cell line', 'HeLa cells treated'),
+    buildRecord('Yes', 'GSE3', 'Mouse embryonic eye', 'Pax6 knockdown'),
+    buildRecord('No',  'GSE4', 'Yeast stress response', 'heat shock'),
+    ]
+
+class PredictCache_tests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.sampleFile = self.getFileName('samples.txt')
+        self.modelFile  = self.getFileName('model.pkl')
+        self.cacheFile  = self.getFileName('cache.db')
+        self.writeSamples(records)
+
+        pipeline = Pipeline([('vectorizer', CountVectorizer(binary=True)),
+                    ('classifier', RandomForestClassifier(n_estimators=10,
+                                                        random_state=1))])
+        pipeline.fit([r[-2] + '\n' + r[-1] for r in records], [1, 0, 1, 0])
+        with open(self.modelFile, 'wb') as fp:
+            pickle.dump(pipeline, fp)
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def getFileName(self, name):
+        return os.path.join(self.tmpDir.name, name)
+
+    def writeSamples(self, records):
+        with open(self.sampleFile, 'w') as fp:
+            fp.write(buildSampleFileText(records))
+
+    def predict(self, preprocessors=['standard']):
+        out = io.StringIO()
+        counts = predictFile(self.sampleFile, out, self.modelFile,
+                                            self.cacheFile, preprocessors)
+        return counts, out.getvalue()
+
+    def test_onlyMissesScored(self):
+        (n, misses), preds = self.predict()
+        self.assertEqual((n, misses), (4, 4))
+        lines = preds.splitlines()
+        self.assertTrue(lines[0].startswith('ID|Pred Class|Confidence|'))
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(lines[1].split('|')[0], 'GSE1')
+
+        (n, misses), cachedPreds = self.predict()
+        self.assertEqual(misses, 0)
+        self.assertEqual(cachedPreds, preds)
+
+        changed = list(records)
+        changed[1] = buildRecord('No', 'GSE2', 'Human cell line', 'new text')
+        self.writeSamples(changed)
+        (n, misses), preds = self.predict()
+        self.assertEqual(misses, 1)
+
+    def test_unclassifiedSamples(self):
+        with open(self.sampleFile, 'w') as fp:
+            fp.write('#meta  sampleObjType=HtSample moduleName=htMLsample\n')
+            fp.write('|'.join(HtSample.fieldNames) + '\n')
+            for r in records:
+                fp.write('|'.join([r[1], r[-2], r[-1]]) + '\n')
+        (n, misses), preds = self.predict()
+        self.assertEqual((n, misses), (4, 4))
+        lines = preds.splitlines()
+        self.assertEqual(lines[0], 'ID|Pred Class|Confidence|Abs Value')
+        self.assertEqual([len(l.split('|')) for l in lines[1:]], [4] * 4)
+
+    def test_modelHash(self):
+        h = getModelHash(self.modelFile, ['standard'])
+        self.assertNotEqual(h, getModelHash(self.modelFile, ['removeURLs']))
+        self.predict()
+        (n, misses), preds = self.predict(['removeURLs'])
+        self.assertEqual(misses, 4)
+
+        cache = PredictionCache(self.cacheFile)
+        self.assertEqual(cache.purge(h), 4)
+        self.assertEqual(len(cache.getCounts()), 1)
+        cache.close()
+
+    def test_modelHashSklearnVersion(self):
+        import sklearn
+        h = getModelHash(self.modelFile, ['standard'])
+        version = sklearn.__version__
+        try:
+            sklearn.__version__ = version + '.post1'
+            self.assertNotEqual(h, getModelHash(self.modelFile, ['standard']))
+        finally:
+            sklearn.__version__ = version
+        self.assertEqual(h, getModelHash(self.modelFile, ['standard']))
+
+    def test_pipelineStepSources(self):
+        names = [os.path.basename(f) for f in getPipelineStepSourceFiles()]
+        for name in ['htBinaryFeatures.py', 'htFeatureCache.py',
+                                                        'htPipelineSteps.py']:
+            self.assertIn(name, names)
+# end PredictCache_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
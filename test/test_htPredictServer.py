@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htPredictServer.py
+
+usage:  python test_htPredictServer.py [-v]
+"""
+
+import sys
+import io
+import json
+import threading
+import unittest
+from sklearn.pipeline import Pipeline
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.ensemble import RandomForestClassifier
+import htMLsample as mlSampleLib
+from htPredictServer import PredictServer, getConfidence
+
+#######################################
+
+titles = [
+    'Expression profiling of the developing mouse heart at E10.5',
+    'RNA-seq of adult mice liver',
+    'Knockdown of Pax6 in the embryonic eye',
+    'Human cell line treated with drug',
+    'Embryonic mouse brain development',
+    'Yeast stress response time course',
+    ]
+descriptions = [
+    'Hearts were collected from embryos',
+    'Livers from wild type and knockout mice were sequenced',
+    'Embryonic eyes at E12.5 were dissected',
+    'HeLa cells, 24 hours',
+    'Brains at E14.5 and P0',
+    'Yeast cultures were heat shocked',
+    ]
+yValues = [1, 0, 1, 0, 1, 0]
+
+def getDocs(titles, descriptions):
+    docs = []
+    for t, d in zip(titles, descriptions):
+        s = mlSampleLib.HtSample()
+        s.setFields({'ID': 'x', 'title': t, 'description': d})
+        docs.append(s.standard().constructDoc())
+    return docs
+
+class PredictServer_tests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pipeline = Pipeline([('vectorizer', CountVectorizer(binary=True)),
+                    ('classifier', RandomForestClassifier(n_estimators=10,
+                                                        random_state=1))])
+        cls.pipeline.fit(getDocs(titles, descriptions), yValues)
+        cls.server = PredictServer(cls.pipeline, maxWaitMs=20)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_sameAsPipeline(self):
+        requests = ''.join([json.dumps({'ID': 'GSE%d' % i, 'title': t,
+                                        'description': d}) + '\n' \
+                    for i, (t, d) in enumerate(zip(titles, descriptions))])
+        out = io.StringIO()
+        self.server.serveStream(io.StringIO(requests), out)
+        replies = [json.loads(l) for l in out.getvalue().splitlines()]
+
+        probas = self.pipeline.predict_proba(getDocs(titles, descriptions))
+        self.assertEqual([r['ID'] for r in replies],
+                                    ['GSE%d' % i for i in range(len(titles))])
+        for reply, proba in zip(replies, probas):
+            predClass, confidence, absValue = getConfidence(proba,
+                                                    self.pipeline.classes_)
+            self.assertEqual(reply['predClass'], predClass)
+            self.assertEqual(reply['confidence'], round(confidence, 3))
+            self.assertGreaterEqual(reply['totalMs'], reply['scoreMs'])
+        self.assertGreater(max([r['batchSize'] for r in replies]), 1)
+
+    def test_badRequests(self):
+        requests = 'not json\n{"title": "no ID"}\n' + \
+                   '{"ID": "GSE1", "title": "mouse"}\n{"command": "stats"}\n'
+        out = io.StringIO()
+        self.server.serveStream(io.StringIO(requests), out)
+        replies = [json.loads(l) for l in out.getvalue().splitlines()]
+        self.assertEqual(len(replies), 4)
+        self.assertIn('error', replies[0])
+        self.assertIn('error', replies[1])
+        self.assertIn(replies[2]['predClass'], ['Yes', 'No'])
+        self.assertIn('meanBatchSize', replies[3])
+
+    def test_writerThread(self):
+        server = self.server
+        class Out (io.StringIO):
+            threads = set()
+            def write(self, text):
+                self.threads.add(threading.current_thread())
+                return super().write(text)
+        requests = ''.join([json.dumps({'ID': 'GSE%d' % i, 'title': t}) + \
+                                        '\n' for i, t in enumerate(titles)])
+        out = Out()
+        self.assertTrue(server.serveStream(io.StringIO(requests), out))
+        self.assertEqual(len(out.getvalue().splitlines()), len(titles))
+        self.assertNotIn(server.thread, Out.threads)
+        self.assertNotIn(threading.current_thread(), Out.threads)
+
+    def test_brokenPipe(self):
+        class Closed (io.StringIO):
+            def write(self, text):
+                raise BrokenPipeError(32, 'Broken pipe')
+        requests = ''.join([json.dumps({'ID': 'GSE%d' % i, 'title': t}) + \
+                                        '\n' for i, t in enumerate(titles)])
+        self.assertFalse(self.server.serveStream(io.StringIO(requests),
+                                                                    Closed()))
+        out = io.StringIO()         # the server still serves other streams
+        self.assertTrue(self.server.serveStream(io.StringIO(requests), out))
+        self.assertEqual(len(out.getvalue().splitlines()), len(titles))
+
+    def test_confidence(self):
+        self.assertEqual(getConfidence([0.25, 0.75], [0, 1]),
+                                                        ('Yes', 0.75, 0.75))
+        self.assertEqual(getConfidence([0.6, 0.4], [0, 1]),
+                                                        ('No', -0.6, 0.6))
+# end PredictServer_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htPruneModel.py
+
+usage:  python test_htPruneModel.py [-v]
+"""
+
+import sys
+import pickle
+import unittest
+import numpy as np
+from sklearn.pipeline import Pipeline
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.ensemble import RandomForestClassifier
+from htPruneModel import pruneModel, getUsedFeatures
+
+#######################################
+
+words = ['mouse', 'embryo', 'heart', 'liver', 'human', 'cell', 'line',
+         'knockdown', 'rna', 'seq', 'brain', 'kidney', 'adult', 'tissue']
+
+class PruneModel_tests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.RandomState(1)
+        cls.docs = [' '.join(rng.choice(words, 6)) for i in range(80)]
+        y = [int('mouse' in d and 'embryo' in d) for d in cls.docs]
+        cls.pipeline = Pipeline([
+            ('vectorizer', CountVectorizer(binary=True, ngram_range=(1,2),
+                                                                min_df=2)),
+            ('classifier', RandomForestClassifier(n_estimators=5,
+                                    min_samples_split=20, random_state=1)),
+            ])
+        cls.pipeline.fit(cls.docs, y)
+
+    def test_samePredictions(self):
+        pruned = pruneModel(self.pipeline)
+        numUsed = len(getUsedFeatures(self.pipeline.named_steps['classifier']))
+        self.assertEqual(len(pruned.named_steps['vectorizer'].vocabulary_),
+                                                                    numUsed)
+        self.assertLess(numUsed,
+                    len(self.pipeline.named_steps['vectorizer'].vocabulary_))
+        self.assertFalse(hasattr(pruned.named_steps['vectorizer'],
+                                                            'stop_words_'))
+        newDocs = self.docs + ['mouse embryo heart', 'unknown words only']
+        self.assertTrue(np.array_equal(self.pipeline.predict_proba(newDocs),
+                                                pruned.predict_proba(newDocs)))
+
+    def test_pickles(self):
+        pruned = pickle.loads(pickle.dumps(pruneModel(self.pipeline)))
+        self.assertTrue(np.array_equal(self.pipeline.predict_proba(self.docs),
+                                            pruned.predict_proba(self.docs)))
+# end PruneModel_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
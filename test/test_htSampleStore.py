@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htSampleStore.py
+
+usage:  python test_htSampleStore.py [-v]
+"""
+
+import sys
+import os
+import io
+import tempfile
+import unittest
+import htMLsample as mlSampleLib
+from htSampleStore import writeSampleStore, SampleStore, storeToSampleFile
+
+#######################################
+
+sampleFileText = '\n'.join([
+    '#meta  sampleObjType=ClassifiedHtSample moduleName=htMLsample',
+    '|'.join(mlSampleLib.ClassifiedHtSample.fieldNames),
+    'Yes|GSE20|Done|Baseline|RNA-Seq|2021-01-01|5|4|title|desc',
+    'No|E-MEXP-1|Done|Baseline|RNA-Seq|2021-01-02|6|11|title2|café unicode',
+    'No|GSE3|Done|Baseline|RNA-Seq|2021-01-03|6|0|title3|',
+    ]) + '\n'
+
+class SampleStore_tests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpDir = tempfile.TemporaryDirectory()
+        cls.storeFile = os.path.join(cls.tmpDir.name, 'samples.store')
+        cols = mlSampleLib.readSampleFile(io.StringIO(sampleFileText),
+                                                            columnar=True)
+        writeSampleStore(cols, cls.storeFile)
+        cls.store = SampleStore(cls.storeFile)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.store.close()
+        cls.tmpDir.cleanup()
+
+    def test_columns(self):
+        self.assertEqual(self.store.getNumSamples(), 3)
+        self.assertEqual(self.store.getColumn('knownClassName'),
+                                                        ['Yes', 'No', 'No'])
+        self.assertEqual(self.store.getValue('description', 1),
+                                                        'café unicode')
+        self.assertEqual(self.store.getValue('description', 2), '')
+
+    def test_lookupByID(self):
+        self.assertEqual(self.store.getRowByID('GSE3'), 2)
+        self.assertEqual(self.store.getRowByID('E-MEXP-1'), 1)
+        self.assertIsNone(self.store.getRowByID('GSE4'))
+        self.assertIsNone(self.store.getRowByID('AAA'))
+        sample = self.store.getSampleByID('GSE20')
+        self.assertEqual(sample.getTitle(), 'title')
+
+    def test_roundTrip(self):
+        out = io.StringIO()
+        storeToSampleFile(self.storeFile, out)
+        self.assertEqual(out.getvalue(), sampleFileText)
+
+    def test_roundTripFileName(self):
+        fileName = os.path.join(self.tmpDir.name, 'samples.txt')
+        self.assertEqual(storeToSampleFile(self.storeFile, fileName), 3)
+        with open(fileName, 'r') as fp:
+            self.assertEqual(fp.read(), sampleFileText)
+# end SampleStore_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htScoringRuntime.py
+
+usage:  python test_htScoringRuntime.py [-v]
+"""
+
+import sys
+import os
+import subprocess
+import tempfile
+import unittest
+import numpy as np
+from htTestLib import docs, yValues, getPipeline
+from htModelArtifact import writeModelArtifact
+from htScoringRuntime import ScoringRuntime, readDocuments
+
+#######################################
+
+class ScoringRuntime_tests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.fileName = os.path.join(self.tmpDir.name, 'model.artifact')
+        self.pipeline = getPipeline(packed=False)
+        self.pipeline.fit(docs, yValues)
+        writeModelArtifact(self.pipeline, self.fileName)
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_samePredictions(self):
+        model = ScoringRuntime.load(self.fileName)
+        newDocs = docs + ['mouse heart\nembryos', 'unknown words only', '']
+        self.assertTrue(np.array_equal(self.pipeline.predict_proba(newDocs),
+                                            model.predict_proba(newDocs)))
+        predClass, confidence, absValue = model.getConfidences(docs[:1])[0]
+        self.assertEqual(predClass, 'Yes')
+        self.assertEqual(confidence, absValue)
+
+    def test_counts(self):
+        # counts above 255 must not wrap around
+        pipeline = getPipeline(packed=False)
+        pipeline.set_params(vectorizer__binary=False)
+        countDocs = docs + [' '.join(['mouse'] * (300 + i)) for i in range(8)]
+        pipeline.fit(countDocs, yValues + [1, 0] * 4)
+        fileName = os.path.join(self.tmpDir.name, 'counts.artifact')
+        writeModelArtifact(pipeline, fileName)
+        model = ScoringRuntime.load(fileName)
+        newDocs = countDocs + [' '.join(['mouse'] * 258)]
+        self.assertEqual(model.getDenseFeatures(newDocs[-1:]).max(), 258)
+        self.assertTrue(np.array_equal(pipeline.predict_proba(newDocs),
+                                            model.predict_proba(newDocs)))
+
+    def runScoring(self, fileName, printExpr):
+        """ In a new python process, load fileName, score a doc and
+            print(printExpr). Return the output.
+        """
+        code = 'import sys, htScoringRuntime\n' + \
+            'm = htScoringRuntime.ScoringRuntime.load(%r)\n' % fileName + \
+            'm.predict_proba(["mouse heart"])\n' + \
+            'print(%s)\n' % printExpr
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        return subprocess.run([sys.executable, '-c', code], env=env,
+                            capture_output=True, text=True, check=True).stdout
+
+    def test_numpyOnly(self):
+        out = self.runScoring(self.fileName,
+                        '"sklearn" in sys.modules, "scipy" in sys.modules')
+        self.assertEqual(out.split(), ['False', 'False'])
+
+    def test_preprocessorNotPipelineSteps(self):
+        fileName = os.path.join(self.tmpDir.name, 'preproc.artifact')
+        writeModelArtifact(getPipeline(packed=False, preprocessor=True)
+                                            .fit(docs, yValues), fileName)
+        out = self.runScoring(fileName, '"htPipelineSteps" in sys.modules')
+        self.assertEqual(out.split(), ['False'])
+
+    def test_readDocuments(self):
+        sampleFile = os.path.join(self.tmpDir.name, 'samples.txt')
+        with open(sampleFile, 'w') as fp:
+            fp.write('#meta x=y\nknownClassName|ID|title|description\n' +
+                     'Yes|GSE1|mouse heart|embryos\nNo|GSE2|yeast|\n')
+        self.assertEqual(readDocuments(sampleFile),
+                (['GSE1', 'GSE2'], ['mouse heart\nembryos', 'yeast\n']))
+# end ScoringRuntime_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
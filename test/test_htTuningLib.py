@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htTuningLib.py
+
+usage:  python test_htTuningLib.py [-v]
+"""
+
+import sys
+import os
+import copy
+import types
+import tempfile
+import unittest
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.experimental import enable_halving_search_cv
+from sklearn.model_selection import HalvingGridSearchCV, HalvingRandomSearchCV
+from htTuningLib import memoizePipeline, getNumTransformerFits, \
+                        getBenchmarkPipeline, getSearchConfig, getHalvingGrid, \
+                        getHalvingSearch, getRoundsMinResources, setSearchMode
+from htFeatureSelection import BinaryFeatureSelector
+
+#######################################
+
+class MemoizePipeline_tests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def test_classifierParamsVary(self):
+        pipeline, parameters = getBenchmarkPipeline('RF')
+        self.assertEqual(getNumTransformerFits(pipeline, parameters), (4, 1))
+        memoizePipeline(pipeline, parameters, self.tmpDir.name, verbose=False)
+        self.assertEqual(pipeline.memory.location, self.tmpDir.name)
+
+    def test_onlyTransformerParamsVary(self):
+        pipeline, parameters = getBenchmarkPipeline('RF')
+        parameters['vectorizer__min_df'] = [0.01, 0.02, 0.05, 0.1]
+        parameters['classifier__min_samples_split'] = [100]
+        self.assertEqual(getNumTransformerFits(pipeline, parameters), (4, 4))
+        memoizePipeline(pipeline, parameters, self.tmpDir.name, verbose=False)
+        self.assertIsNone(pipeline.memory)
+
+    def test_bothVary(self):
+        pipeline, parameters = getBenchmarkPipeline('RF')
+        parameters['vectorizer__min_df'] = [0.01, 0.02, 0.05, 0.1]
+        self.assertEqual(getNumTransformerFits(pipeline, parameters), (16, 4))
+        memoizePipeline(pipeline, parameters, self.tmpDir.name, verbose=False)
+        self.assertIsNotNone(pipeline.memory)
+
+    def test_downstreamParamsVary(self):
+        pipeline, parameters = getBenchmarkPipeline('RF')
+        pipeline.steps.insert(1, ('featureSelector', BinaryFeatureSelector()))
+        parameters['featureSelector__k'] = [100, 200, 400, 'all']
+        parameters['classifier__min_samples_split'] = [100]
+        # vectorizer fit once, featureSelector once per k
+        self.assertEqual(getNumTransformerFits(pipeline, parameters), (8, 5))
+        memoizePipeline(pipeline, parameters, self.tmpDir.name, verbose=False)
+        self.assertIsNotNone(pipeline.memory)
+
+        # nothing after the vectorizer varies more than it does
+        del parameters['featureSelector__k']
+        parameters['vectorizer__min_df'] = [0.01, 0.02, 0.05, 0.1]
+        self.assertEqual(getNumTransformerFits(pipeline, parameters), (8, 8))
+
+    def test_singleGridPoint(self):
+        pipeline, parameters = getBenchmarkPipeline('RF')
+        parameters['classifier__min_samples_split'] = [100]
+        memoizePipeline(pipeline, parameters, self.tmpDir.name, verbose=False)
+        self.assertIsNone(pipeline.memory)
+# end MemoizePipeline_tests ------------------------
+
+class SearchMode_tests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.pipeline, self.parameters = getBenchmarkPipeline('GB')
+
+    def tearDown(self):
+        self.tmpDir.cleanup()
+
+    def getConfig(self, **params):
+        """ Write a tuning.cfg w/ the params set, return its name """
+        fileName = os.path.join(self.tmpDir.name, 'tuning.cfg')
+        with open(fileName, 'w') as fp:
+            fp.write('[MODEL_TUNING]\n')
+            for name, value in params.items():
+                fp.write('%s: %s\n' % (name, value))
+        return fileName
+
+    def test_getSearchConfig(self):
+        config = getSearchConfig(self.getConfig(SEARCH_MODE='halving',
+                                                HALVING_MIN_RESOURCES=400))
+        self.assertEqual(config['HALVING_MIN_RESOURCES'], 400)
+        self.assertEqual(config['HALVING_MAX_RESOURCES'], 'auto')
+        self.assertEqual(config['HALVING_ROUNDS'], 'auto')
+        self.assertEqual(getSearchConfig(self.getConfig(HALVING_ROUNDS=2))
+                                                    ['HALVING_ROUNDS'], 2)
+        self.assertRaises(ValueError, getSearchConfig,
+                                    self.getConfig(SEARCH_MODE='random'))
+
+    def test_halvingGrid(self):
+        config = getSearchConfig(self.getConfig(SEARCH_MODE='halving'))
+        saved = copy.deepcopy(self.parameters)
+        grid, maxResources = getHalvingGrid(config, self.parameters)
+        self.assertEqual(self.parameters, saved)
+        self.assertNotIn('classifier__n_estimators', grid)
+        self.assertEqual(maxResources, 200)
+
+        config['HALVING_RESOURCE'] = 'n_samples'
+        self.assertEqual(getHalvingGrid(config, self.parameters),
+                                                    (self.parameters, 'auto'))
+
+        config['HALVING_RESOURCE'] = 'classifier__max_depth'
+        self.assertRaises(ValueError, getHalvingGrid, config, self.parameters)
+        config['HALVING_MAX_RESOURCES'] = 6
+        self.assertEqual(getHalvingGrid(config, self.parameters)[1], 6)
+
+    def test_halvingSearch(self):
+        config = getSearchConfig(self.getConfig(SEARCH_MODE='halving'))
+        saved = copy.deepcopy(self.parameters)
+        gs = getHalvingSearch(config, randomSeed=1)(self.pipeline,
+                                                self.parameters, cv=3)
+        self.assertIsInstance(gs, HalvingGridSearchCV)
+        self.assertNotIn('classifier__n_estimators', gs.param_grid)
+        self.assertEqual((gs.resource, gs.max_resources, gs.factor),
+                                    ('classifier__n_estimators', 200, 3))
+        self.assertEqual((gs.cv, gs.random_state), (3, 1))
+        self.assertEqual(self.parameters, saved)
+
+        config['SEARCH_MODE'] = 'halvingrandom'
+        config['HALVING_CANDIDATES'] = 10
+        gs = getHalvingSearch(config)(self.pipeline, self.parameters)
+        self.assertIsInstance(gs, HalvingRandomSearchCV)
+        self.assertEqual(gs.n_candidates, 10)
+
+    def test_halvingRounds(self):
+        self.assertEqual(getRoundsMinResources(1560, 4, 2), 390)
+        self.assertEqual(getRoundsMinResources(7000, 4, 2), 1750)
+        self.assertEqual(getRoundsMinResources(7000, 4, 3), 437)
+        self.assertEqual(getRoundsMinResources(10, 4, 3), 1)
+
+        config = getSearchConfig(self.getConfig(SEARCH_MODE='halving',
+                                HALVING_RESOURCE='n_samples', HALVING_FACTOR=2,
+                                HALVING_MIN_RESOURCES=2, HALVING_ROUNDS=2))
+        X = np.array([[i % 2, i % 3] for i in range(40)])
+        y = np.array([i % 2 for i in range(40)])
+        gs = getHalvingSearch(config, randomSeed=1)(
+                        RandomForestClassifier(n_estimators=5, random_state=1),
+                        {'max_depth': [1, 2, 3, 4]}, cv=2)
+        gs.fit(X, y)
+        self.assertEqual(gs.n_resources_, [20, 40])
+        self.assertEqual(gs.n_candidates_, [4, 2])
+
+    def test_setSearchMode(self):
+        tuningLib = types.ModuleType('fakeTuningLib')
+        tuningLib.GridSearchCV = 'GridSearchCV'
+        saved = copy.deepcopy(self.parameters)
+
+        self.assertEqual(setSearchMode(tuningLib, self.parameters,
+                                self.getConfig(), verbose=False), 'grid')
+        self.assertEqual(tuningLib.GridSearchCV, 'GridSearchCV')
+
+        configFile = self.getConfig(SEARCH_MODE='halving',
+                                    HALVING_RESOURCE='n_samples')
+        self.assertEqual(setSearchMode(tuningLib, self.parameters, configFile,
+                                            verbose=False), 'halving')
+        gs = tuningLib.GridSearchCV(self.pipeline, self.parameters)
+        self.assertIsInstance(gs, HalvingGridSearchCV)
+        self.assertEqual(gs.resource, 'n_samples')
+        self.assertEqual(self.parameters, saved)
+
+        del tuningLib.GridSearchCV
+        self.assertRaises(AttributeError, setSearchMode, tuningLib,
+                                self.parameters, configFile, verbose=False)
+# end SearchMode_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for htVectorizers.py
+
+usage:  python test_htVectorizers.py [-v]
+"""
+
+import sys
+import unittest
+from sklearn.feature_extraction.text import CountVectorizer
+from htVectorizers import ParallelCountVectorizer, HashingDfVectorizer
+
+#######################################
+
+documents = [
+    'mouse embryo rna seq of the developing heart',
+    'the developing heart in mouse embryo',
+    'liver tissue from adult mice, mouse rna seq',
+    'human cell line knockdown',
+    'embryo heart and liver expression in mouse',
+    'the the the',
+    '',
+    'heart heart heart embryo',
+    ]
+params = dict(stop_words='english', binary=True, min_df=2, max_df=0.75,
+                ngram_range=(1,2), token_pattern=r'\b([a-z_]\w+)\b')
+
+class ParallelCountVectorizer_tests(unittest.TestCase):
+
+    def assertSameResults(self, cv, X, pcv, Xp):
+        self.assertEqual(cv.vocabulary_, pcv.vocabulary_)
+        self.assertEqual(cv.stop_words_, pcv.stop_words_)
+        self.assertEqual(X.shape, Xp.shape)
+        self.assertEqual((X != Xp).nnz, 0)
+
+    def test_fitTransform(self):
+        for binary in [True, False]:
+            p = dict(params, binary=binary)
+            cv = CountVectorizer(**p)
+            X = cv.fit_transform(documents)
+            pcv = ParallelCountVectorizer(n_jobs=3, **p)
+            Xp = pcv.fit_transform(documents)
+            self.assertSameResults(cv, X, pcv, Xp)
+            self.assertEqual(Xp.dtype, X.dtype)
+
+    def test_transform(self):
+        cv = CountVectorizer(**params).fit(documents)
+        pcv = ParallelCountVectorizer(n_jobs=2, **params).fit(documents)
+        newDocs = ['mouse heart', 'nothing known here', 'embryo rna seq']
+        self.assertEqual((cv.transform(newDocs) != pcv.transform(newDocs)).nnz,
+                                                                            0)
+
+    def test_noTermsRemain(self):
+        pcv = ParallelCountVectorizer(n_jobs=2, min_df=8)
+        self.assertRaises(ValueError, pcv.fit_transform, documents)
+# end ParallelCountVectorizer_tests ------------------------
+#-----------------------------------
+
+class HashingDfVectorizer_tests(unittest.TestCase):
+
+    def test_sameAsCountVectorizerWithoutCollisions(self):
+        # these few terms do not collide in 2**20 buckets
+        cv = CountVectorizer(**params)
+        X = cv.fit_transform(documents)
+        hv = HashingDfVectorizer(chunkSize=3, **params)
+        Xh = hv.fit_transform(documents)
+        self.assertEqual(cv.vocabulary_, hv.vocabulary_)
+        self.assertEqual(list(cv.get_feature_names_out()),
+                                            list(hv.get_feature_names_out()))
+        self.assertEqual((X != Xh).nnz, 0)
+        newDocs = ['mouse heart', 'nothing known here']
+        self.assertEqual((cv.transform(newDocs) != hv.transform(newDocs)).nnz,
+                                                                            0)
+
+    def test_collisionsShareAFeature(self):
+        hv = HashingDfVectorizer(n_features=1, min_df=2)
+        X = hv.fit_transform(['mouse heart', 'liver', 'mouse'])
+        self.assertEqual(X.shape, (3, 1))
+        self.assertEqual(list(hv.get_feature_names_out()), ['mouse'])
+        self.assertEqual(hv.bucketTerms_[0][0], ('mouse', 2))
+# end HashingDfVectorizer_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()
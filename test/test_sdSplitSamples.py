@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""
+Automated unit tests for sdSplitSamples.py
+
+usage:  python test_sdSplitSamples.py [-v]
+"""
+
+import sys
+import os
+import tempfile
+import subprocess
+import unittest
+import htMLsample as mlSampleLib
+from sdSplitSamples import stratifiedSplit, SampleFileRecords
+
+#######################################
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(
+                                os.path.abspath(__file__))), 'sdSplitSamples.py')
+
+def getSampleFileText(idPrefix, classNames):
+    lines = ['#meta  sampleObjType=ClassifiedHtSample moduleName=htMLsample',
+             '|'.join(mlSampleLib.ClassifiedHtSample.fieldNames)]
+    for i, c in enumerate(classNames):
+        lines.append('%s|%s%d|Done|Baseline|RNA-Seq|2021-01-01|5|4|title|desc'\
+                                                        % (c, idPrefix, i))
+    return '\n'.join(lines) + '\n'
+
+class StratifiedSplit_tests(unittest.TestCase):
+
+    def setUp(self):
+        self.classNames = ['Yes'] * 100 + ['No'] * 300
+
+    def test_reproducible(self):
+        a = stratifiedSplit(self.classNames, 0.15, 0.20, 42)
+        self.assertEqual(a, stratifiedSplit(self.classNames, 0.15, 0.20, 42))
+        self.assertNotEqual(a, stratifiedSplit(self.classNames, 0.15,0.20,43))
+
+    def test_classProportions(self):
+        a = stratifiedSplit(self.classNames, 0.15, 0.20, 1)
+        for c, n in [('Yes', 100), ('No', 300)]:
+            assigned = [s for s, cn in zip(a, self.classNames) if cn == c]
+            self.assertEqual(assigned.count('test'), round(n * 0.15))
+            self.assertEqual(assigned.count('val'), round(n * 0.20))
+            self.assertEqual(assigned.count('train'),
+                                        n - round(n*0.15) - round(n*0.20))
+
+    def test_allTrain(self):
+        self.assertEqual(stratifiedSplit(['Yes', 'No'], 0.0, 0.0, 1),
+                                                        ['train', 'train'])
+# end StratifiedSplit_tests ------------------------
+
+class SplitScript_tests(unittest.TestCase):
+
+    def test_otherFilesOnlyInTrain(self):
+        with tempfile.TemporaryDirectory() as tmpDir:
+            geoFile = os.path.join(tmpDir, 'geo.txt')
+            otherFile = os.path.join(tmpDir, 'nongeo.txt')
+            with open(geoFile, 'w') as fp:
+                fp.write(getSampleFileText('GSE', ['Yes']*20 + ['No']*40))
+            with open(otherFile, 'w') as fp:
+                fp.write(getSampleFileText('E-MEXP-', ['Yes']*5 + ['No']*5))
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+            subprocess.run([sys.executable, SCRIPT, geoFile, '--other',
+                            otherFile, '--seed', '7', '--outdir', tmpDir,
+                            '-q'], check=True, env=env, capture_output=True)
+
+            ids = {}
+            for name in ['testSet.txt', 'valSet.txt', 'trainSet.txt']:
+                records = SampleFileRecords(os.path.join(tmpDir, name))
+                ids[name] = [r.split('|')[1] for r in records.records]
+        others = ['E-MEXP-%d' % i for i in range(10)]
+        self.assertEqual(ids['trainSet.txt'][-10:], others)
+        for name in ['testSet.txt', 'valSet.txt']:
+            self.assertFalse([i for i in ids[name] if i.startswith('E-MEXP')])
+        self.assertEqual(sum([len(v) for v in ids.values()]), 70)
+# end SplitScript_tests ------------------------
+#-----------------------------------
+
+if __name__ == '__main__':
+    unittest.main()